@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+"""
+WattNode Scraper Benchmark
+Measures scraper throughput and latency against a local fixture HTTP server.
+
+The fixture server runs in a separate process and serves a corpus of realistic
+pages: varied sizes, non-UTF-8 encodings, gzip compression, slow-drip bodies,
+redirect chains, JSON and error responses. The scraper is driven at several
+concurrency levels and each run reports:
+
+- pages/s           completed requests per wall-clock second
+- p50 / p99         request latency (ms)
+- CPU per page      scraper-process CPU time per request (ms)
+- peak RSS          scraper-process peak resident set size (MB, high-water mark)
+
+Usage:
+    python benchmarks/scraper_bench.py                          # default mix, c=1,4,16
+    python benchmarks/scraper_bench.py -c 8 -n 400              # single level
+    python benchmarks/scraper_bench.py --pages large.html,gzip.html --format text
+    python benchmarks/scraper_bench.py --json out.json          # save results
+    python benchmarks/scraper_bench.py --baseline out.json      # fail on regression
+
+Version: 1.0.0
+"""
+
+import os
+import sys
+import json
+import gzip
+import time
+import random
+import logging
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.scraper import local_scrape, set_parse_pool, ScraperException  # noqa: E402
+from services.parse_pool import ParsePool  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# =============================================================================
+# CONFIG
+# =============================================================================
+
+DEFAULT_CONCURRENCY = [1, 4, 16]
+DEFAULT_REQUESTS = 200
+DEFAULT_TOLERANCE = 0.15        # 15% slack before --baseline flags a regression
+
+SLOW_DRIP_CHUNKS = 10
+SLOW_DRIP_DELAY = 0.05          # seconds between chunks
+
+# Default request mix: (path, format, weight)
+DEFAULT_MIX = [
+    ("small.html", "text", 30),
+    ("medium.html", "text", 20),
+    ("large.html", "text", 5),
+    ("latin1.html", "text", 10),
+    ("gzip.html", "text", 10),
+    ("slow.html", "text", 5),
+    ("redirect/2", "text", 5),
+    ("medium.html", "html", 5),
+    ("medium.html", "structured", 5),
+    ("data.json", "json", 5),
+    ("status/404", "text", 3),
+    ("status/503", "text", 2),
+    ("flaky/503", "text", 2),
+]
+
+
+# =============================================================================
+# FIXTURE CORPUS
+# =============================================================================
+
+_WORDS = (
+    "watt node energy network agent scrape inference token ledger stake reward "
+    "validator block swarm latency throughput request response payload market "
+    "café naïve résumé über straße"
+).split()
+
+
+def _paragraphs(rng, count):
+    return "\n".join(
+        "<p>" + " ".join(rng.choice(_WORDS) for _ in range(rng.randint(40, 120))) + "</p>"
+        for _ in range(count)
+    )
+
+
+def _html_page(rng, title, paragraphs, links=40):
+    """Build an HTML page shaped like a typical article: chrome, scripts, body, links."""
+    nav = "".join(f'<a href="/page/{i}">Section {i}</a>' for i in range(12))
+    body_links = "".join(
+        f'<li><a href="/article/{rng.randint(1, 5000)}?ref=bench#top">Related {i}</a></li>'
+        for i in range(links)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="{{charset}}">
+<title>{title}</title>
+<meta name="description" content="Benchmark fixture page: {title}">
+<meta property="og:title" content="{title}">
+<link rel="canonical" href="/canonical/{title.lower().replace(' ', '-')}">
+<style>body {{ font-family: sans-serif; }} .ad {{ display: none; }}</style>
+<script>window.dataLayer = [{{"event": "pageview", "id": {rng.randint(1, 10 ** 6)}}}];</script>
+<script type="application/ld+json">{{"@context": "https://schema.org", "@type": "Article", "headline": "{title}"}}</script>
+</head>
+<body>
+<header><h1>{title}</h1></header>
+<nav>{nav}</nav>
+<main><article>{_paragraphs(rng, paragraphs)}</article><ul>{body_links}</ul></main>
+<footer>Footer text &copy; WattCoin</footer>
+</body>
+</html>
+"""
+
+
+def build_corpus(seed=1337):
+    """
+    Build the fixture corpus.
+    Returns dict path -> {"body": bytes, "content_type": str, ...options}.
+    """
+    rng = random.Random(seed)
+
+    def page(title, paragraphs, charset="utf-8", **options):
+        html = _html_page(rng, title, paragraphs).replace("{charset}", charset)
+        return {
+            "body": html.encode(charset, errors="xmlcharrefreplace"),
+            "content_type": f"text/html; charset={charset}",
+            **options,
+        }
+
+    corpus = {
+        "small.html": page("Small Page", 3),
+        "medium.html": page("Medium Page", 120),
+        "large.html": page("Large Page", 1800),
+        "latin1.html": page("Latin One Page", 60, charset="iso-8859-1"),
+        "gzip.html": page("Gzip Page", 200, gzip=True),
+        "slow.html": page("Slow Page", 40, drip=True),
+        "toolarge.html": page("Too Large Page", 5000),
+    }
+
+    items = [
+        {"id": i, "name": f"item-{i}", "price": round(rng.uniform(1, 500), 2),
+         "tags": rng.sample(_WORDS, 3), "active": rng.random() > 0.3}
+        for i in range(4000)
+    ]
+    corpus["data.json"] = {
+        "body": json.dumps({"count": len(items), "items": items}).encode("utf-8"),
+        "content_type": "application/json",
+    }
+
+    return corpus
+
+
+# =============================================================================
+# FIXTURE SERVER
+# =============================================================================
+
+def _make_handler(corpus):
+    flaky_lock = threading.Lock()
+    flaky_count = [0]
+
+    class FixtureHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body=b"", content_type="text/html; charset=utf-8", extra=None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (extra or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            return body
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0].lstrip("/")
+
+            # /redirect/<n> -> chain of n hops ending at small.html
+            if path.startswith("redirect/"):
+                hops = int(path.split("/", 1)[1] or 0)
+                target = f"/redirect/{hops - 1}" if hops > 1 else "/small.html"
+                self._send(302, extra={"Location": target})
+                return
+
+            # /flaky/<code> -> every other request fails with <code> (exercises retries)
+            if path.startswith("flaky/"):
+                with flaky_lock:
+                    flaky_count[0] += 1
+                    fail = flaky_count[0] % 2 == 1
+                if fail:
+                    code = int(path.split("/", 1)[1])
+                    self.wfile.write(self._send(code, b"try again", extra={"Retry-After": "0"}))
+                    return
+                path = "small.html"
+
+            # /status/<code> -> bare error response
+            if path.startswith("status/"):
+                code = int(path.split("/", 1)[1])
+                body = f"<html><body>Error {code}</body></html>".encode()
+                self.wfile.write(self._send(code, body))
+                return
+
+            spec = corpus.get(path)
+            if spec is None:
+                self.wfile.write(self._send(404, b"not found"))
+                return
+
+            body = spec["body"]
+            extra = {}
+            if spec.get("gzip"):
+                body = gzip.compress(body, compresslevel=6)
+                extra["Content-Encoding"] = "gzip"
+
+            if spec.get("drip"):
+                self._send(200, body, spec["content_type"], extra)
+                step = max(1, len(body) // SLOW_DRIP_CHUNKS)
+                for i in range(0, len(body), step):
+                    self.wfile.write(body[i:i + step])
+                    self.wfile.flush()
+                    time.sleep(SLOW_DRIP_DELAY)
+                return
+
+            self.wfile.write(self._send(200, body, spec["content_type"], extra))
+
+    return FixtureHandler
+
+
+def _serve(port_queue, seed):
+    """Fixture server process entry point."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _make_handler(build_corpus(seed)))
+    server.daemon_threads = True
+    # Clients abort oversized bodies mid-transfer; resets are expected noise
+    server.handle_error = lambda request, client_address: None
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def start_fixture_server(seed=1337):
+    """Start the fixture server in a child process. Returns (process, base_url)."""
+    port_queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_serve, args=(port_queue, seed), daemon=True)
+    proc.start()
+    port = port_queue.get(timeout=30)
+    return proc, f"http://127.0.0.1:{port}"
+
+
+# =============================================================================
+# BENCH TARGETS
+# =============================================================================
+
+# name -> callable(url, fmt). Batch/async scraper variants register here.
+TARGETS = {
+    "local_scrape": lambda url, fmt: local_scrape(url, fmt),
+}
+
+
+# =============================================================================
+# RUNNER
+# =============================================================================
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _build_plan(base_url, mix, requests_count, seed):
+    rng = random.Random(seed)
+    population = [(path, fmt) for path, fmt, _ in mix]
+    weights = [weight for _, _, weight in mix]
+    return [
+        (f"{base_url}/{path}", fmt)
+        for path, fmt in rng.choices(population, weights=weights, k=requests_count)
+    ]
+
+
+def run_level(target, plan, concurrency):
+    """Run one concurrency level. Returns a result dict."""
+    latencies = []
+    errors = {}
+    lock = threading.Lock()
+
+    def one(item):
+        url, fmt = item
+        start = time.perf_counter()
+        code = None
+        try:
+            target(url, fmt)
+        except ScraperException as e:
+            code = e.error_code
+        except Exception as e:
+            code = type(e).__name__
+        elapsed = (time.perf_counter() - start) * 1000
+        with lock:
+            latencies.append(elapsed)
+            if code:
+                errors[code] = errors.get(code, 0) + 1
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, plan))
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    latencies.sort()
+    pages = len(latencies)
+    return {
+        "concurrency": concurrency,
+        "requests": pages,
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "pages_per_second": round(pages / wall, 2) if wall else 0.0,
+        "p50_ms": round(_percentile(latencies, 50), 2),
+        "p99_ms": round(_percentile(latencies, 99), 2),
+        "cpu_ms_per_page": round(cpu * 1000 / pages, 3) if pages else 0.0,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Return a list of regression messages (empty if none)."""
+    regressions = []
+    base_index = {(r["target"], r["concurrency"]): r for r in baseline.get("results", [])}
+    for r in results:
+        base = base_index.get((r["target"], r["concurrency"]))
+        if not base:
+            continue
+        label = f"{r['target']} c={r['concurrency']}"
+        if r["pages_per_second"] < base["pages_per_second"] * (1 - tolerance):
+            regressions.append(
+                f"{label}: pages/s {r['pages_per_second']} < baseline {base['pages_per_second']}")
+        if r["p99_ms"] > base["p99_ms"] * (1 + tolerance):
+            regressions.append(f"{label}: p99 {r['p99_ms']}ms > baseline {base['p99_ms']}ms")
+        if r["cpu_ms_per_page"] > base["cpu_ms_per_page"] * (1 + tolerance):
+            regressions.append(
+                f"{label}: CPU/page {r['cpu_ms_per_page']}ms > baseline {base['cpu_ms_per_page']}ms")
+    return regressions
+
+
+def _print_table(results):
+    header = f"{'target':<16}{'conc':>6}{'pages/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'CPU ms/pg':>11}{'RSS MB':>9}  errors"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        errors = ", ".join(f"{k}={v}" for k, v in sorted(r["errors"].items())) or "-"
+        print(f"{r['target']:<16}{r['concurrency']:>6}{r['pages_per_second']:>10}"
+              f"{r['p50_ms']:>10}{r['p99_ms']:>10}{r['cpu_ms_per_page']:>11}"
+              f"{str(r['peak_rss_mb']):>9}  {errors}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="WattNode scraper benchmark")
+    parser.add_argument("-c", "--concurrency", default=",".join(map(str, DEFAULT_CONCURRENCY)),
+                        help="Comma-separated concurrency levels (default: 1,4,16)")
+    parser.add_argument("-n", "--requests", type=int, default=DEFAULT_REQUESTS,
+                        help=f"Requests per level (default: {DEFAULT_REQUESTS})")
+    parser.add_argument("--targets", default=",".join(TARGETS),
+                        help=f"Comma-separated targets (available: {', '.join(TARGETS)})")
+    parser.add_argument("--pages", default=None,
+                        help="Comma-separated corpus paths to use instead of the default mix")
+    parser.add_argument("--format", default="text", help="Format used with --pages (default: text)")
+    parser.add_argument("--seed", type=int, default=1337, help="Corpus/plan random seed")
+    parser.add_argument("--warmup", type=int, default=10, help="Warmup requests per target")
+    parser.add_argument("--json", dest="json_out", default=None, help="Write results to JSON file")
+    parser.add_argument("--baseline", default=None, help="Compare against a previous --json output (same mix)")
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="Parse text/structured in a process pool of N workers "
+                             "(worker CPU is not counted in cpu_ms)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show scraper log output")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed regression fraction vs baseline (default: 0.15)")
+    args = parser.parse_args()
+
+    # Expected fixture errors (404/503) would otherwise flood stderr
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    for name in targets:
+        if name not in TARGETS:
+            parser.error(f"Unknown target: {name}")
+
+    if args.pages:
+        mix = [(p.strip(), args.format, 1) for p in args.pages.split(",") if p.strip()]
+    else:
+        mix = DEFAULT_MIX
+
+    if args.parse_workers:
+        set_parse_pool(ParsePool(args.parse_workers))
+
+    proc, base_url = start_fixture_server(args.seed)
+    print(f"Fixture server: {base_url} (pid {proc.pid})")
+
+    results = []
+    try:
+        for name in targets:
+            target = TARGETS[name]
+            run_level(target, _build_plan(base_url, mix, args.warmup, args.seed), 1)
+            for level in levels:
+                plan = _build_plan(base_url, mix, args.requests, args.seed + level)
+                result = run_level(target, plan, level)
+                result["target"] = name
+                results.append(result)
+    finally:
+        proc.terminate()
+        proc.join(timeout=5)
+
+    print()
+    _print_table(results)
+
+    if args.json_out:
+        with open(args.json_out, "w") as f:
+            json.dump({"mix": mix, "requests": args.requests, "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json_out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Regressions vs baseline:")
+            for line in regressions:
+                print(f"   {line}")
+            sys.exit(1)
+        print("\n✅ No regressions vs baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@ import yaml
 from typing import Dict, Any
 
 REQUIRED_FIELDS = ["wallet"]
-VALID_CAPABILITIES = ["scrape", "inference"]
+VALID_CAPABILITIES = ["scrape", "crawl", "inference", "embed"]
 
 def load_config(config_path: str = "config.yaml") -> Dict[str, Any]:
     """
@@ -38,6 +38,9 @@ def load_config(config_path: str = "config.yaml") -> Dict[str, Any]:
     if os.environ.get("WATT_NODE_ID"):
         config["node_id"] = os.environ["WATT_NODE_ID"]
     
+    if os.environ.get("WATT_SCRAPER_PROXIES"):
+        config.setdefault("scraper", {})["proxies"] = os.environ["WATT_SCRAPER_PROXIES"].split(",")
+    
     # Defaults
     if "capabilities" not in config:
         config["capabilities"] = ["scrape"]
@@ -77,12 +80,60 @@ def validate_config(config: Dict[str, Any]) -> bool:
     # Validate capabilities
     capabilities = config.get("capabilities", [])
     if not capabilities:
-        raise ValueError("At least one capability required (scrape, inference)")
+        raise ValueError("At least one capability required (scrape, crawl, inference)")
     
     for cap in capabilities:
         if cap not in VALID_CAPABILITIES:
             raise ValueError(f"Invalid capability: {cap}. Valid: {VALID_CAPABILITIES}")
     
+    # Validate scraper proxies
+    proxies = (config.get("scraper") or {}).get("proxies") or []
+    for proxy in proxies:
+        if not str(proxy).lower().startswith(("http://", "https://")):
+            raise ValueError(f"Invalid scraper proxy URL: {proxy}")
+    
+    budget_mb = (config.get("scraper") or {}).get("memory_budget_mb")
+    if budget_mb is not None:
+        if not isinstance(budget_mb, (int, float)) or budget_mb < 0:
+            raise ValueError(f"Invalid scraper.memory_budget_mb: {budget_mb} (use 0 to disable)")
+    
+    cache_mb = (config.get("scraper") or {}).get("result_cache_mb")
+    if cache_mb is not None:
+        if not isinstance(cache_mb, (int, float)) or cache_mb < 0:
+            raise ValueError(f"Invalid scraper.result_cache_mb: {cache_mb} (use 0 to disable)")
+    
+    cpu_allocation = config.get("cpu_allocation")
+    if cpu_allocation is not None:
+        if not isinstance(cpu_allocation, (int, float)) or not 0 < cpu_allocation <= 100:
+            raise ValueError(f"Invalid cpu_allocation: {cpu_allocation} (percent, 1-100)")
+    
+    workers = (config.get("scraper") or {}).get("parse_workers")
+    if workers is not None:
+        if not isinstance(workers, int) or workers < 0:
+            raise ValueError(f"Invalid scraper.parse_workers: {workers} (use 0 to parse inline)")
+    
+    retry = (config.get("scraper") or {}).get("retry")
+    if retry is not None:
+        if not isinstance(retry, dict):
+            raise ValueError("scraper.retry must be a mapping")
+        allowed = {"max_attempts", "base_delay", "max_delay", "budget", "retry_statuses"}
+        unknown = set(retry) - allowed
+        if unknown:
+            raise ValueError(f"Unknown scraper.retry option(s): {sorted(unknown)}. Valid: {sorted(allowed)}")
+    
+    ollama_budget = (config.get("ollama") or {}).get("memory_budget_mb")
+    if ollama_budget is not None:
+        if not isinstance(ollama_budget, (int, float)) or ollama_budget < 0:
+            raise ValueError(f"Invalid ollama.memory_budget_mb: {ollama_budget} (use 0 for no budget)")
+    
+    warm_models = (config.get("ollama") or {}).get("warm_models")
+    if warm_models is not None and not isinstance(warm_models, list):
+        raise ValueError("ollama.warm_models must be a list of model names")
+    
+    policy = config.get("inference_token_policy")
+    if policy is not None and policy not in ("reject", "trim", "off"):
+        raise ValueError(f"Invalid inference_token_policy: {policy}. Valid: ['reject', 'trim', 'off']")
+    
     # Warn if inference enabled but no Ollama config
     if "inference" in capabilities:
         ollama = config.get("ollama", {})
@@ -108,7 +159,9 @@ name: "my-wattnode"
 # Capabilities - what jobs this node can handle
 capabilities:
   - scrape        # Web scraping jobs
+  # - crawl       # Multi-page crawl jobs
   # - inference   # LLM inference (requires Ollama)
+  # - embed       # Text embeddings (Ollama embedding model, e.g. nomic-embed-text)
 
 # Ollama settings (if inference enabled)
 ollama:
@@ -0,0 +1,183 @@
+"""
+WattNode Crawler Service
+Runs multi-page crawl jobs: a seed URL expanded breadth-first through a
+bounded, deduplicated frontier, fetched concurrently on the node.
+
+Each page is fetched with local_scrape(format="structured"), so the links
+used to grow the frontier come from the same parse as the page content.
+Results are yielded in batches so the caller can stream them to the backend
+while the crawl is still running.
+
+Job payload:
+    {
+        "url": "https://docs.example.com/",   # seed (required)
+        "max_depth": 2,                       # link hops from the seed
+        "max_pages": 50,                      # pages fetched, including failures
+        "same_origin": true,                  # stay on the seed's scheme://host:port
+        "path_prefix": "/docs/",              # optional extra restriction
+        "format": "text",                     # "text" or "structured" per page
+        "concurrency": 4,
+        "batch_size": 10
+    }
+"""
+
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+
+from services.scraper import local_scrape, normalize_link, ScraperException, InvalidURLError
+
+logger = logging.getLogger("wattnode.crawler")
+
+# =============================================================================
+# CONFIG
+# =============================================================================
+
+DEFAULT_MAX_DEPTH = 2
+MAX_DEPTH_LIMIT = 5
+DEFAULT_MAX_PAGES = 50
+MAX_PAGES_LIMIT = 500
+DEFAULT_CONCURRENCY = 4
+MAX_CONCURRENCY = 16
+DEFAULT_BATCH_SIZE = 10
+CRAWL_FORMATS = ("text", "structured")
+
+
+def _origin(url):
+    parts = urlsplit(url)
+    return (parts.scheme, parts.netloc)
+
+
+def _clamp(value, default, low, high):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(low, min(high, value))
+
+
+def _page_record(url, depth, result, content_hash, format):
+    if format == "structured":
+        record = dict(result)
+        record["url"] = url
+    else:
+        record = {"url": url, "title": result.get("title", ""), "text": result.get("text", "")}
+    record["depth"] = depth
+    record["content_hash"] = content_hash
+    record["success"] = True
+    return record
+
+
+def iter_crawl(seed_url, max_depth=DEFAULT_MAX_DEPTH, max_pages=DEFAULT_MAX_PAGES,
+               same_origin=True, path_prefix=None, format="text",
+               concurrency=DEFAULT_CONCURRENCY, batch_size=DEFAULT_BATCH_SIZE,
+               stop_event=None):
+    """
+    Crawl from *seed_url* and yield lists of page records (at most *batch_size* each).
+
+    Every scheduled URL produces exactly one record; failures are reported as
+    {"url", "depth", "success": False, "error", "message"} and still count
+    against *max_pages*. Setting *stop_event* stops scheduling new fetches.
+
+    Raises:
+        InvalidURLError: seed URL is missing or malformed
+        ValueError:      unsupported format
+    """
+    seed = normalize_link(seed_url or "", seed_url or "")
+    if not seed:
+        raise InvalidURLError()
+    if format not in CRAWL_FORMATS:
+        raise ValueError(f"Invalid crawl format: {format}. Valid: {list(CRAWL_FORMATS)}")
+
+    max_depth = _clamp(max_depth, DEFAULT_MAX_DEPTH, 0, MAX_DEPTH_LIMIT)
+    max_pages = _clamp(max_pages, DEFAULT_MAX_PAGES, 1, MAX_PAGES_LIMIT)
+    concurrency = _clamp(concurrency, DEFAULT_CONCURRENCY, 1, MAX_CONCURRENCY)
+    batch_size = _clamp(batch_size, DEFAULT_BATCH_SIZE, 1, MAX_PAGES_LIMIT)
+    origins = {_origin(seed)}
+
+    def in_scope(link):
+        if same_origin and _origin(link) not in origins:
+            return False
+        if path_prefix and not urlsplit(link).path.startswith(path_prefix):
+            return False
+        return True
+
+    frontier = deque([(seed, 0)])
+    seen = {seed}
+    scheduled = 0
+    in_flight = {}      # future -> (url, depth)
+    batch = []
+
+    logger.info("crawl started | seed=%.120s depth=%d pages=%d concurrency=%d",
+                seed, max_depth, max_pages, concurrency)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="crawl") as pool:
+        while frontier or in_flight:
+            # Fill free fetch slots from the frontier
+            while (frontier and len(in_flight) < concurrency and scheduled < max_pages
+                   and not (stop_event and stop_event.is_set())):
+                url, depth = frontier.popleft()
+                in_flight[pool.submit(local_scrape, url, "structured", with_hash=True)] = (url, depth)
+                scheduled += 1
+
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, depth = in_flight.pop(future)
+                try:
+                    result, content_hash = future.result()
+                except ScraperException as e:
+                    batch.append({"url": url, "depth": depth, "success": False,
+                                  "error": e.error_code, "message": str(e)})
+                except Exception as e:
+                    logger.error("crawl page error | url=%.120s type=%s", url, type(e).__name__)
+                    batch.append({"url": url, "depth": depth, "success": False,
+                                  "error": "crawl_error", "message": str(e)})
+                else:
+                    batch.append(_page_record(url, depth, result, content_hash, format))
+                    if depth == 0:
+                        # Seed redirects (http -> https, bare -> www) define the origin too
+                        final = normalize_link(result.get("url") or "", url)
+                        if final:
+                            origins.add(_origin(final))
+                    if depth < max_depth:
+                        for link in result.get("links", []):
+                            if link not in seen and in_scope(link):
+                                seen.add(link)
+                                frontier.append((link, depth + 1))
+
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+
+            # Drop the unreachable tail once the page budget is spent
+            if scheduled >= max_pages:
+                frontier.clear()
+
+    if batch:
+        yield batch
+
+    logger.info("crawl finished | seed=%.120s pages=%d discovered=%d", seed, scheduled, len(seen))
+
+
+def local_crawl(seed_url, **options):
+    """Run a crawl to completion and return all page records in one list."""
+    pages = []
+    for batch in iter_crawl(seed_url, **options):
+        pages.extend(batch)
+    return pages
+
+
+if __name__ == "__main__":
+    # Quick smoke test
+    import sys
+    import json
+    logging.basicConfig(level=logging.INFO)
+    target = sys.argv[1] if len(sys.argv) > 1 else "https://example.com"
+    for i, chunk in enumerate(iter_crawl(target, max_depth=1, max_pages=10, batch_size=5)):
+        print(f"--- batch {i}: {len(chunk)} pages")
+        for page in chunk:
+            print(json.dumps({k: page.get(k) for k in ("url", "depth", "success", "title", "error")}))
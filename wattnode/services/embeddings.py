@@ -0,0 +1,173 @@
+"""
+WattNode Embeddings
+Batched embedding jobs with request coalescing and a compact vector encoding.
+
+Embedding one text costs far less than the HTTP round trip and per-call
+overhead around it, so throughput comes from batching. EmbedBatcher collects
+texts from concurrent callers for the same (backend, model) for up to
+*delay* seconds (or until *max_batch* texts are waiting), sends them as one
+services.inference.embed() call, and hands each caller its own slice.
+
+Vectors travel as little-endian float32, base64-encoded:
+
+    {"encoding": "f32le", "dims": 768, "count": 3, "data": "<base64>"}
+
+which is about a quarter of the size of the same vectors as JSON numbers.
+
+Job payload:
+    {"texts": ["...", "..."], "model": "nomic-embed-text"}   # model optional
+
+Usage:
+    from services.embeddings import embed, encode_vectors
+    result = embed(["first text", "second text"])
+    if result["success"]:
+        payload = encode_vectors(result["embeddings"])
+"""
+
+import sys
+import base64
+import logging
+import threading
+from array import array
+from concurrent.futures import Future
+
+from services import inference
+
+logger = logging.getLogger("wattnode.embeddings")
+
+EMBED_DELAY = 0.01          # seconds to wait for more texts before a batch is sent
+EMBED_MAX_BATCH = 256       # texts that trigger an immediate send
+ENCODING = "f32le"
+
+
+def encode_vectors(vectors):
+    """Pack equal-length float vectors as base64 little-endian float32."""
+    dims = len(vectors[0]) if vectors else 0
+    packed = array("f")
+    for vector in vectors:
+        if len(vector) != dims:
+            raise ValueError(f"Vectors have different dimensions ({len(vector)} != {dims})")
+        packed.extend(vector)
+    if sys.byteorder != "little":
+        packed.byteswap()
+    return {
+        "encoding": ENCODING,
+        "dims": dims,
+        "count": len(vectors),
+        "data": base64.b64encode(packed.tobytes()).decode("ascii"),
+    }
+
+
+def decode_vectors(encoded):
+    """Inverse of encode_vectors(): a list of float lists."""
+    if encoded.get("encoding") != ENCODING:
+        raise ValueError(f"Unsupported vector encoding: {encoded.get('encoding')}")
+    packed = array("f")
+    packed.frombytes(base64.b64decode(encoded["data"]))
+    if sys.byteorder != "little":
+        packed.byteswap()
+    dims = encoded["dims"]
+    return [packed[i:i + dims].tolist() for i in range(0, len(packed), dims)] if dims else []
+
+
+class EmbedBatcher:
+    """
+    Coalesces concurrent embed requests per (backend, model) into one
+    backend call. Thread-safe; submit() never blocks on the backend.
+    """
+
+    def __init__(self, embed_fn=None, delay=EMBED_DELAY, max_batch=EMBED_MAX_BATCH):
+        self._embed = embed_fn or inference.embed
+        self.delay = delay
+        self.max_batch = max_batch
+        self._lock = threading.Lock()
+        self._pending = {}      # (backend, model) -> [(texts, future), ...]
+        self._timers = {}
+        self._stats = {"requests": 0, "texts": 0, "batches": 0, "failed_batches": 0}
+
+    def submit(self, texts, model=None, backend=None):
+        """Queue *texts*; the Future resolves to an embed() result for just these texts."""
+        future = Future()
+        key = (backend, model)
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["texts"] += len(texts)
+            pending = self._pending.setdefault(key, [])
+            pending.append((list(texts), future))
+            waiting = sum(len(t) for t, _ in pending)
+            if waiting >= self.max_batch:
+                timer = self._timers.pop(key, None)
+                if timer is not None:
+                    timer.cancel()
+                flush_now = True
+            else:
+                flush_now = False
+                if key not in self._timers:
+                    timer = self._timers[key] = threading.Timer(self.delay, self._flush, [key])
+                    timer.daemon = True
+                    timer.start()
+        if flush_now:
+            threading.Thread(target=self._flush, args=(key,), name="embed-batch", daemon=True).start()
+        return future
+
+    def embed(self, texts, model=None, backend=None):
+        """Blocking submit(): the embed() result for *texts*."""
+        return self.submit(texts, model, backend).result()
+
+    def _flush(self, key):
+        with self._lock:
+            self._timers.pop(key, None)
+            batch = self._pending.pop(key, [])
+        if not batch:
+            return
+        backend, model = key
+        texts = [text for item_texts, _ in batch for text in item_texts]
+        try:
+            result = self._embed(texts, model=model, backend=backend)
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+        with self._lock:
+            self._stats["batches"] += 1
+            if not result.get("success"):
+                self._stats["failed_batches"] += 1
+        logger.debug("embed batch | requests=%d texts=%d ok=%s", len(batch), len(texts), result.get("success"))
+
+        offset = 0
+        for item_texts, future in batch:
+            if result.get("success"):
+                vectors = result["embeddings"][offset:offset + len(item_texts)]
+                future.set_result(dict(result, embeddings=vectors, batch_size=len(texts)))
+            else:
+                future.set_result(dict(result))
+            offset += len(item_texts)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mean_batch_texts"] = round(stats["texts"] / stats["batches"], 1) if stats["batches"] else None
+        return stats
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher():
+    """The process-wide EmbedBatcher (created on first use)."""
+    global _batcher
+    with _batcher_lock:
+        if _batcher is None:
+            _batcher = EmbedBatcher()
+        return _batcher
+
+
+def embed(texts, model=None, backend=None):
+    """
+    Embed *texts* through the shared batcher.
+
+    Returns {"success", "embeddings": [[float, ...], ...], "model", "backend",
+    "batch_size"} or {"success": False, "error": ...}.
+    """
+    if not texts or not all(isinstance(t, str) for t in texts):
+        return {"success": False, "error": "texts must be a non-empty list of strings"}
+    return get_batcher().embed(texts, model, backend)
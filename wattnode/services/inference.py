@@ -6,14 +6,84 @@ Supports two backends:
 
 Backend selection via config or environment:
   INFERENCE_BACKEND=auto|ollama|distributed (default: auto)
-  Auto: tries distributed gateway first, falls back to Ollama.
+  Auto: routes each request to the healthy backend with the lowest expected
+  latency for the model (distributed preferred until measured), failing over
+  to the other one; INFERENCE_HEDGE=auto|<seconds> also hedges slow starts.
+
+Ollama pool:
+  OLLAMA_URL may list several Ollama servers (comma-separated). Requests go
+  to a healthy instance that already has the model loaded, else to the one
+  with the fewest outstanding requests; an instance that is down before the
+  first token hands the request to the next one.
+
+Health:
+  Each backend URL has a BackendHealth: a TTL-cached up/down state fed by
+  real request outcomes, with a circuit breaker that opens after
+  BREAKER_THRESHOLD consecutive failures and half-opens after
+  BREAKER_RESET_TIMEOUT to let one trial request through. Auto routing checks
+  it instead of probing the gateway before every request. A saturated gateway
+  (429/503) fails the request at once and is skipped for its Retry-After,
+  without tripping the breaker.
+
+Batches:
+  generate_many() runs many prompts concurrently, bounded per backend by
+  OLLAMA_PARALLEL / GATEWAY_PARALLEL in-flight requests, and returns results
+  in prompt order with per-item errors and aggregate stats.
+
+Residency:
+  With a ResidencyManager installed (set_residency_manager), Ollama requests
+  carry a usage-based keep_alive and cold models are evicted under a memory
+  budget before a new one loads (see services.ollama_residency).
+
+Sessions:
+  generate(..., session_id=...) keeps multi-turn state (Ollama context, or a
+  gateway-side swarm session) so follow-up turns only prefill the new
+  prompt; see services.inference_sessions.
+
+Token budget:
+  Before dispatch, prompt + max_tokens is checked against the model's
+  context window and rejected or trimmed per INFERENCE_TOKEN_POLICY (see
+  services.token_budget); in auto mode backends it does not fit are skipped.
+
+Telemetry:
+  Every backend request feeds rolling histograms of prompt-eval time, TTFT,
+  decode tokens/s and total latency per backend/model (get_telemetry(),
+  reported in the node heartbeat).
+
+Streaming:
+  Both backends expose generate_stream(), a generator of events:
+    {"token": "..."}                                   # as tokens arrive
+    {"done": True, "success": True, "response": ...,   # exactly once, last
+     "ttft_ms": ..., "tokens_per_second": ..., "latency_ms": ..., ...}
+  Failures are reported in the final event ({"done": True, "success": False,
+  "error": ...}) rather than raised. generate() collects the stream and
+  returns the final event. Setting *cancel_event* (or closing the generator)
+  stops the request and closes the connection, within CANCEL_POLL seconds
+  even while the backend has not sent anything yet.
 
 Version: 2.0.0
 """
 
 import os
+import json
+import time
+import socket
+import threading
 import requests
 import logging
+from contextlib import contextmanager
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from services.inference_cache import is_cacheable, cache_key
+from services.inference_router import Router
+from services.ollama_residency import normalize_model
+from services import token_budget
+from services.inference_telemetry import Telemetry
 
 logger = logging.getLogger("wattnode.inference")
 
@@ -23,16 +93,546 @@ logger = logging.getLogger("wattnode.inference")
 
 INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "auto")  # auto|ollama|distributed
 
-# Ollama
-OLLAMA_URL = os.environ.get("OLLAMA_URL", "http://localhost:11434")
+# Ollama (comma-separated URLs make a pool, e.g. one instance per GPU)
+OLLAMA_URLS = [u.strip().rstrip("/") for u in
+               os.environ.get("OLLAMA_URL", "http://localhost:11434").split(",") if u.strip()]
+OLLAMA_URL = OLLAMA_URLS[0]
 OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "llama2")
 OLLAMA_TIMEOUT = 120
+OLLAMA_EMBED_MODEL = os.environ.get("OLLAMA_EMBED_MODEL", "nomic-embed-text")
 
 # Distributed inference gateway (runs on seed node alongside inference server)
 DISTRIBUTED_GATEWAY_URL = os.environ.get("DISTRIBUTED_GATEWAY_URL", "http://localhost:8090")
 DISTRIBUTED_GATEWAY_KEY = os.environ.get("WSI_GATEWAY_KEY", "")
 DISTRIBUTED_MODEL = os.environ.get("DISTRIBUTED_MODEL", "meta-llama/Meta-Llama-3.1-8B-Instruct")
+DISTRIBUTED_EMBED_MODEL = os.environ.get("DISTRIBUTED_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
 DISTRIBUTED_TIMEOUT = 180  # Distributed inference can be slower
+CONNECT_TIMEOUT = 5  # Connect phase of inference requests; a dead host fails fast
+
+# Concurrent requests per backend (process-wide). Ollama serves
+# OLLAMA_NUM_PARALLEL requests at once; the gateway batches concurrent requests.
+OLLAMA_PARALLEL = int(os.environ.get("OLLAMA_NUM_PARALLEL", "4"))
+GATEWAY_PARALLEL = int(os.environ.get("WSI_GATEWAY_PARALLEL", "8"))
+
+# Texts per embeddings HTTP call (larger inputs are split)
+EMBED_CHUNK = 64
+
+# Backend health (auto routing)
+HEALTH_TTL = 30               # seconds a known up/down state is trusted without a probe
+BREAKER_THRESHOLD = 3         # consecutive failures that open the circuit
+BREAKER_RESET_TIMEOUT = 30    # seconds open before one trial request is let through
+BUSY_BACKOFF = 5              # seconds to skip a saturated backend that sent no Retry-After
+
+CANCEL_POLL = 0.1             # seconds between cancel checks while a request waits on the backend
+
+# Hedged requests in auto mode: "off", "auto" (after the primary's p95 time to
+# first token) or a number of seconds
+INFERENCE_HEDGE = os.environ.get("INFERENCE_HEDGE", "off")
+
+
+# =============================================================================
+# STREAM HELPERS
+# =============================================================================
+
+def _timing(started, first_token_at, tokens):
+    """Client-side time-to-first-token, decode rate and total latency for a finished stream."""
+    now = time.monotonic()
+    ttft_ms = int((first_token_at - started) * 1000) if first_token_at else None
+    decode_time = now - first_token_at if first_token_at else 0
+    # The first token ends the TTFT interval, so the rate covers the rest
+    tps = round((tokens - 1) / decode_time, 2) if tokens > 1 and decode_time > 0 else None
+    return {"ttft_ms": ttft_ms, "tokens_per_second": tps, "latency_ms": int((now - started) * 1000)}
+
+
+def _unavailable(error, parts=None, **extra):
+    """Failure caused by the backend itself (unreachable, timeout, 5xx): counts against its health."""
+    return _failed(error, parts, unavailable=True, **extra)
+
+
+def _busy(resp, where, parts=None):
+    """
+    429/503 from a saturated gateway: fail over now, and skip the backend for
+    its Retry-After instead of counting a failure against the circuit breaker.
+    """
+    try:
+        retry_after = float(resp.headers.get("Retry-After", BUSY_BACKOFF))
+    except ValueError:
+        retry_after = BUSY_BACKOFF
+    try:
+        error = resp.json().get("error")
+    except ValueError:
+        error = None
+    return _unavailable(f"{where} is busy ({resp.status_code}): {error or resp.reason}", parts,
+                        retry_after=retry_after)
+
+
+def _failed(error, parts=None, **extra):
+    event = {"done": True, "success": False, "error": error, **extra}
+    if parts:
+        event["response"] = "".join(parts)  # partial output, for callers that want it
+    return event
+
+
+def _error_event(exc, parts):
+    response = getattr(exc, "response", None)
+    if response is not None and response.status_code >= 500:
+        return _unavailable(str(exc), parts)
+    return _failed(str(exc), parts)
+
+
+def _cancelled(parts):
+    return _failed("Inference cancelled", parts, cancelled=True)
+
+
+def _unless_cancelled(cancel_event, parts, event):
+    """*event*, or a cancellation if the failure came from aborting the request."""
+    if cancel_event is not None and cancel_event.is_set():
+        return _cancelled(parts)
+    return event
+
+
+class _Abort:
+    """Sockets opened for one request; abort() shuts them down (also ones opened later)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._socks = []
+        self._aborted = False
+
+    def attach(self, sock):
+        with self._lock:
+            self._socks.append(sock)
+            aborted = self._aborted
+        if aborted:
+            self._shutdown(sock)
+
+    def abort(self):
+        with self._lock:
+            self._aborted = True
+            socks = list(self._socks)
+        for sock in socks:
+            self._shutdown(sock)
+
+    @staticmethod
+    def _shutdown(sock):
+        try:
+            sock.shutdown(socket.SHUT_RDWR)     # wakes a read blocked in another thread
+        except OSError:
+            pass
+
+
+class _AbortableHTTPConnection(HTTPConnection):
+    def __init__(self, *args, abort=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._abort = abort
+
+    def connect(self):
+        super().connect()
+        self._abort.attach(self.sock)
+
+
+class _AbortableHTTPSConnection(HTTPSConnection):
+    def __init__(self, *args, abort=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._abort = abort
+
+    def connect(self):
+        super().connect()
+        self._abort.attach(self.sock)
+
+
+class _AbortableHTTPPool(HTTPConnectionPool):
+    ConnectionCls = _AbortableHTTPConnection
+
+
+class _AbortableHTTPSPool(HTTPSConnectionPool):
+    ConnectionCls = _AbortableHTTPSConnection
+
+
+@contextmanager
+def _http(cancel_event):
+    """
+    A requests.Session for one backend request whose sockets are shut down
+    as soon as *cancel_event* is set. Checking the event between lines is not
+    enough: a backend still loading or prefilling sends nothing, and would
+    keep the connection, our slot and its own work until the first token.
+    Closing the socket also tells the backend to stop.
+    """
+    session = requests.Session()
+    if cancel_event is None:
+        with session:
+            yield session
+        return
+    abort = _Abort()
+    adapter = HTTPAdapter()
+    adapter.poolmanager.pool_classes_by_scheme = {
+        "http": partial(_AbortableHTTPPool, abort=abort),
+        "https": partial(_AbortableHTTPSPool, abort=abort),
+    }
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    finished = threading.Event()
+
+    def watch():
+        while not finished.wait(CANCEL_POLL):
+            if cancel_event.is_set():
+                abort.abort()
+                return
+
+    threading.Thread(target=watch, name="inference-cancel", daemon=True).start()
+    try:
+        with session:
+            yield session
+    finally:
+        finished.set()
+
+
+def _embed_chunks(backend, texts, post_chunk, where):
+    """
+    Embed *texts* EMBED_CHUNK at a time via post_chunk(chunk) -> list of vectors,
+    holding one of the backend's slots per call and feeding its health.
+    Returns {"success", "embeddings", ...} or a failure dict.
+    """
+    vectors = []
+    try:
+        for i in range(0, len(texts), EMBED_CHUNK):
+            with backend.slots:
+                vectors.extend(post_chunk(texts[i:i + EMBED_CHUNK]))
+    except requests.ConnectionError:
+        result = _unavailable(f"Cannot connect to {where}")
+    except requests.Timeout:
+        result = _unavailable("Embeddings request timed out")
+    except Exception as e:
+        result = _error_event(e, None)
+    else:
+        result = {"success": True, "embeddings": vectors}
+    backend.health.record(result)
+    result.pop("done", None)
+    return result
+
+
+def _iter_sse(resp):
+    """Yield JSON payloads of server-sent events ("data: {...}" blocks)."""
+    data_lines = []
+    for line in resp.iter_lines(decode_unicode=True):
+        if line:
+            if line.startswith("data:"):
+                data_lines.append(line[5:].lstrip())
+            continue
+        if data_lines:
+            yield json.loads("\n".join(data_lines))
+            data_lines = []
+    if data_lines:
+        yield json.loads("\n".join(data_lines))
+
+
+def _collect(events):
+    """Drain a generate_stream() generator and return its final event (minus "done")."""
+    final = None
+    for event in events:
+        if event.get("done"):
+            final = event
+    result = dict(final or _failed("Stream ended without a result"))
+    result.pop("done", None)
+    return result
+
+
+# =============================================================================
+# BACKEND HEALTH
+# =============================================================================
+
+class BackendHealth:
+    """
+    Cached availability and circuit breaker for one backend.
+
+    closed:    requests flow; state older than *ttl* is re-probed once
+    open:      requests are refused without any network I/O until
+               *reset_timeout* has passed
+    half_open: exactly one trial request is let through; its outcome closes
+               or re-opens the circuit
+
+    record(event) feeds the final event of every real request back in, so
+    under steady traffic no probe requests are needed. A "retry_after" event
+    (backend saturated, not down) only makes it unavailable for that long.
+    Thread-safe.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, probe, ttl=HEALTH_TTL, failure_threshold=BREAKER_THRESHOLD,
+                 reset_timeout=BREAKER_RESET_TIMEOUT, clock=time.monotonic):
+        self.probe = probe
+        self.ttl = ttl
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = self.CLOSED
+        self._up = True
+        self._checked_at = None         # when _up was last confirmed (probe or request)
+        self._opened_at = 0.0
+        self._trial_at = 0.0
+        self._consecutive_failures = 0
+        self._busy_until = 0.0
+        self._stats = {"probes": 0, "successes": 0, "failures": 0, "opened": 0, "rejected": 0,
+                       "busy": 0}
+
+    def available(self):
+        """Whether a request should be sent now (may probe if the cached state is stale)."""
+        with self._lock:
+            now = self._clock()
+            if now < self._busy_until:
+                self._stats["rejected"] += 1
+                return False
+            if self.state == self.OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    self._stats["rejected"] += 1
+                    return False
+                self.state = self.HALF_OPEN     # this caller carries the trial request
+                self._trial_at = now
+                return True
+            if self.state == self.HALF_OPEN:
+                if now - self._trial_at >= self.reset_timeout:
+                    self._trial_at = now        # trial never reported back; allow another
+                    return True
+                self._stats["rejected"] += 1
+                return False
+            if self._checked_at is not None and now - self._checked_at < self.ttl:
+                return self._up
+            self._stats["probes"] += 1
+
+        # Probe outside the lock; concurrent callers may probe too, which is harmless
+        up = bool(self.probe())
+        self._record(up)
+        return up
+
+    def record(self, event):
+        """Record the final event of a generate_stream() request."""
+        if event.get("success"):
+            self._record(True)
+        elif event.get("retry_after") is not None:
+            # Saturated, not broken: it answered, so the circuit stays closed
+            self._record(True)
+            with self._lock:
+                self._stats["busy"] += 1
+                self._busy_until = self._clock() + event["retry_after"]
+        elif event.get("unavailable"):
+            self._record(False)
+        elif self.state == self.HALF_OPEN:
+            # The trial reached the backend, so it is up even though the request failed
+            self._record(True)
+
+    def _record(self, ok):
+        with self._lock:
+            self._up = ok
+            self._checked_at = self._clock()
+            if ok:
+                self._stats["successes"] += 1
+                self._consecutive_failures = 0
+                if self.state != self.CLOSED:
+                    logger.info("inference backend recovered, circuit closed")
+                self.state = self.CLOSED
+                return
+            self._stats["failures"] += 1
+            self._consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self._stats["opened"] += 1
+                    logger.warning(f"inference backend circuit open for {self.reset_timeout}s "
+                                   f"after {self._consecutive_failures} failures")
+                self.state = self.OPEN
+                self._opened_at = self._checked_at
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._stats, state=self.state, up=self._up,
+                        consecutive_failures=self._consecutive_failures)
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def _health_for(kind, url, probe):
+    """Process-wide BackendHealth per backend URL (backend objects are cheap and short-lived)."""
+    with _health_lock:
+        health = _health.get((kind, url))
+        if health is None:
+            health = _health[(kind, url)] = BackendHealth(probe)
+        return health
+
+
+def get_health_stats():
+    """Health/breaker snapshot for every backend used so far, keyed by "kind url"."""
+    with _health_lock:
+        items = list(_health.items())
+    return {f"{kind} {url}": health.snapshot() for (kind, url), health in items}
+
+
+_telemetry = Telemetry()
+
+
+def get_telemetry():
+    """Rolling prompt-eval/TTFT/decode-rate/latency histograms per "backend model"."""
+    return _telemetry.snapshot()
+
+
+def _observed(health, events, backend=None, model=None):
+    """Pass events through, recording the final one against *health* and in telemetry."""
+    for event in events:
+        if event.get("done"):
+            health.record(event)
+            _telemetry.observe(event, backend, model)
+        yield event
+
+
+_slots = {}
+
+
+def _slots_for(kind, url, size):
+    """Process-wide in-flight request limit per backend URL."""
+    with _health_lock:
+        slots = _slots.get((kind, url))
+        if slots is None:
+            slots = _slots[(kind, url)] = threading.BoundedSemaphore(max(1, size))
+        return slots
+
+
+def _limited(slots, events):
+    """Hold one of *slots* while *events* streams (released on close, too)."""
+    with slots:
+        yield from events
+
+
+# =============================================================================
+# RESPONSE CACHE (optional)
+# =============================================================================
+
+_response_cache = None
+
+# Per-run measurements that do not describe a cached answer
+_UNCACHED_FIELDS = ("done", "ttft_ms", "tokens_per_second", "latency_ms", "prompt_eval_ms", "load_ms")
+
+
+def set_response_cache(cache):
+    """Reuse deterministic results via *cache* (a services.inference_cache.ResponseCache), or None."""
+    global _response_cache
+    _response_cache = cache
+
+
+def get_response_cache():
+    return _response_cache
+
+
+def _cached(backend, model, prompt, params, make_stream, seeded=False):
+    """Serve a deterministic request from the response cache, or run and store it."""
+    cache = _response_cache
+    if cache is None or not is_cacheable(params["temperature"], params.get("seed"), seeded):
+        yield from make_stream()
+        return
+
+    key = cache_key(backend, model, prompt, **params)
+    hit = cache.get(key)
+    if hit is not None:
+        if hit.get("response"):
+            yield {"token": hit["response"]}
+        yield dict(hit, done=True, cached=True)
+        return
+
+    for event in make_stream():
+        if event.get("done") and event.get("success"):
+            cache.put(key, {k: v for k, v in event.items() if k not in _UNCACHED_FIELDS})
+        yield event
+
+
+# =============================================================================
+# SESSIONS (optional)
+# =============================================================================
+
+_session_store = None
+
+
+def set_session_store(store):
+    """Keep multi-turn state via *store* (a services.inference_sessions.SessionStore), or None."""
+    global _session_store
+    _session_store = store
+
+
+def get_session_store():
+    return _session_store
+
+
+def _session(session_id):
+    store = _session_store
+    return store.get(session_id) if store is not None and session_id else None
+
+
+def _in_session(backend, model, instance, session_id, prompt, history, make_stream):
+    """
+    Run one session turn through make_stream(prompt, context) and record the
+    resulting state. *context* is the stored Ollama context ([] for a new
+    session); a session that cannot be resumed here is rebuilt from *history*.
+    The gateway keeps its own state and reports it in the final event.
+    """
+    session = _session(session_id)
+    if session is not None and (session["backend"], session["model"], session["instance"]) != (backend, model, instance):
+        session = None      # state from another backend/model/instance does not apply
+    resumed = session is not None
+    context = session["context"] if resumed else []
+    if not resumed and history and backend == "ollama":
+        prompt = history + prompt
+    for event in make_stream(prompt, context):
+        if event.get("done"):
+            event = dict(event)
+            new_context = event.pop("context", None)
+            remote = event.pop("session", None) or {}
+            if event.get("success") and _session_store is not None:
+                event["session"] = _session_store.record(
+                    session_id, backend, model, instance, new_context,
+                    resumed=remote.get("resumed", resumed),
+                    reused_tokens=remote.get("reused_tokens", len(context)),
+                    prefill_tokens=remote.get("prefill_tokens", event.get("prompt_eval_count"))
+                )
+        yield event
+
+
+# =============================================================================
+# OLLAMA RESIDENCY (optional)
+# =============================================================================
+
+_residency = {}
+
+
+def set_residency_manager(manager):
+    """Let *manager* (a services.ollama_residency.ResidencyManager) steer keep_alive for its Ollama URL."""
+    _residency[manager.base_url] = manager
+
+
+def get_residency_manager(base_url=None):
+    return _residency.get((base_url or OLLAMA_URL).rstrip("/"))
+
+
+def get_residency_stats():
+    """ResidencyManager stats per Ollama URL."""
+    return {url: manager.stats() for url, manager in list(_residency.items())}
+
+
+def _resident(manager, model, make_stream):
+    """Run make_stream(keep_alive) between the manager's acquire() and release()."""
+    if manager is None:
+        yield from make_stream(None)
+        return
+    keep_alive = manager.acquire(model)
+    final = None
+    try:
+        for event in make_stream(keep_alive):
+            if event.get("done"):
+                final = event
+            yield event
+    finally:
+        manager.release(model, final)
 
 
 # =============================================================================
@@ -45,6 +645,8 @@ class OllamaBackend:
     def __init__(self, base_url=None, default_model=None):
         self.base_url = base_url or OLLAMA_URL
         self.default_model = default_model or OLLAMA_MODEL
+        self.health = _health_for("ollama", self.base_url, self.is_available)
+        self.slots = _slots_for("ollama", self.base_url, OLLAMA_PARALLEL)
 
     def is_available(self):
         """Check if Ollama is running."""
@@ -63,38 +665,334 @@ class OllamaBackend:
         except Exception:
             return []
 
-    def generate(self, prompt, model=None, max_tokens=500, temperature=0.7):
+    def embed(self, texts, model=None):
+        """
+        Embed a list of texts with /api/embed (batched). Servers without it
+        (Ollama < 0.3, 404) fall back to one /api/embeddings call per text.
+        """
+        model = model or OLLAMA_EMBED_MODEL
+
+        def post_chunk(chunk):
+            resp = requests.post(
+                f"{self.base_url}/api/embed",
+                json={"model": model, "input": chunk},
+                timeout=(CONNECT_TIMEOUT, OLLAMA_TIMEOUT)
+            )
+            if resp.status_code != 404:
+                resp.raise_for_status()
+                return resp.json()["embeddings"]
+            vectors = []
+            for text in chunk:
+                resp = requests.post(
+                    f"{self.base_url}/api/embeddings",
+                    json={"model": model, "prompt": text},
+                    timeout=(CONNECT_TIMEOUT, OLLAMA_TIMEOUT)
+                )
+                resp.raise_for_status()
+                vectors.append(resp.json()["embedding"])
+            return vectors
+
+        return dict(_embed_chunks(self, texts, post_chunk, f"Ollama at {self.base_url}"),
+                    model=model, backend="ollama")
+
+    def generate(self, prompt, model=None, max_tokens=500, temperature=0.7, seed=None):
         """Run inference through Ollama."""
+        return _collect(self.generate_stream(prompt, model, max_tokens, temperature, seed))
+
+    def generate_stream(self, prompt, model=None, max_tokens=500, temperature=0.7, seed=None,
+                        cancel_event=None, session_id=None, history=None):
+        """
+        Stream inference through Ollama (NDJSON). Yields token events, then a
+        final event. *seed* makes sampling reproducible (and cacheable).
+        With *session_id*, the conversation context is kept between calls
+        (see services.inference_sessions); session turns are not cached.
+        """
         model = model or self.default_model
+        residency = get_residency_manager(self.base_url)
+
+        def run(prompt, context=None):
+            return _observed(self.health, _limited(self.slots, _resident(
+                residency, model, lambda keep_alive: self._stream(
+                    prompt, model, max_tokens, temperature, seed, cancel_event, keep_alive, context))),
+                "ollama", model)
+
+        if session_id is not None:
+            return _in_session("ollama", model, self.base_url, session_id, prompt, history, run)
+        return _cached(
+            "ollama", model, prompt, dict(max_tokens=max_tokens, temperature=temperature, seed=seed),
+            lambda: run(prompt),
+            seeded=True
+        )
+
+    def _stream(self, prompt, model, max_tokens, temperature, seed, cancel_event, keep_alive=None,
+                context=None):
+        body = {"model": model, "prompt": prompt, "stream": True}
+        if keep_alive is not None:
+            body["keep_alive"] = keep_alive
+        if context is not None:
+            body["context"] = context
+        options = {"num_predict": max_tokens, "temperature": temperature}
+        if seed is not None:
+            options["seed"] = seed
+        started = time.monotonic()
+        first_token_at = None
+        parts = []
+        final = None
         try:
-            resp = requests.post(
+            with _http(cancel_event) as http, http.post(
                 f"{self.base_url}/api/generate",
-                json={
-                    "model": model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "num_predict": max_tokens,
-                        "temperature": temperature
-                    }
-                },
-                timeout=OLLAMA_TIMEOUT
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            return {
-                "success": True,
-                "response": data.get("response", ""),
-                "model": model,
-                "backend": "ollama",
-                "eval_count": data.get("eval_count", 0)
-            }
+                json=dict(body, options=options),
+                stream=True,
+                timeout=(CONNECT_TIMEOUT, OLLAMA_TIMEOUT)
+            ) as resp:
+                resp.raise_for_status()
+                for line in resp.iter_lines():
+                    if cancel_event is not None and cancel_event.is_set():
+                        yield _cancelled(parts)
+                        return
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        yield _failed(data["error"], parts)
+                        return
+                    token = data.get("response", "")
+                    if token:
+                        if first_token_at is None:
+                            first_token_at = time.monotonic()
+                        parts.append(token)
+                        yield {"token": token}
+                    if data.get("done"):
+                        final = data
+                        break
         except requests.ConnectionError:
-            return {"success": False, "error": f"Cannot connect to Ollama at {self.base_url}"}
+            yield _unless_cancelled(cancel_event, parts,
+                                    _unavailable(f"Cannot connect to Ollama at {self.base_url}", parts))
+            return
         except requests.Timeout:
-            return {"success": False, "error": f"Ollama timed out after {OLLAMA_TIMEOUT}s"}
+            yield _unless_cancelled(cancel_event, parts,
+                                    _unavailable(f"Ollama timed out after {OLLAMA_TIMEOUT}s", parts))
+            return
         except Exception as e:
-            return {"success": False, "error": str(e)}
+            yield _unless_cancelled(cancel_event, parts, _error_event(e, parts))
+            return
+
+        if final is None:
+            yield _failed("Ollama stream ended before completion", parts)
+            return
+
+        timing = _timing(started, first_token_at, len(parts))
+        eval_count = final.get("eval_count", len(parts))
+        eval_ns = final.get("eval_duration")
+        if eval_ns:
+            # Server-side decode rate is more precise than chunk arrival times
+            timing["tokens_per_second"] = round(eval_count / (eval_ns / 1e9), 2)
+        event = {
+            "done": True,
+            "success": True,
+            "response": "".join(parts),
+            "model": model,
+            "backend": "ollama",
+            "eval_count": eval_count,
+            "prompt_eval_count": final.get("prompt_eval_count"),
+            "prompt_eval_ms": int(final["prompt_eval_duration"] / 1e6) if final.get("prompt_eval_duration") else None,
+            "load_ms": int(final.get("load_duration", 0) / 1e6),
+            **timing
+        }
+        if context is not None:
+            event["context"] = final.get("context")  # taken by _in_session
+        yield event
+
+
+# =============================================================================
+# OLLAMA POOL
+# =============================================================================
+
+PS_TTL = 5  # seconds an instance's loaded-model list is trusted
+
+
+class PoolHealth:
+    """BackendHealth-like view over pool members: available if any member is."""
+
+    def __init__(self, members):
+        self.members = members
+
+    def available(self):
+        return any(member.health.available() for member in self.members)
+
+    def snapshot(self):
+        return {member.base_url: member.health.snapshot() for member in self.members}
+
+
+class OllamaPool:
+    """
+    Several Ollama servers behind the OllamaBackend interface.
+
+    Placement: among healthy instances, prefer those that already have the
+    model loaded (per /api/ps, or the instance's ResidencyManager) and still
+    have a free parallel slot; then pick the fewest outstanding requests.
+    Outstanding counts and loaded-model lists are process-wide (see _pool_for).
+    """
+
+    def __init__(self, urls, default_model=None):
+        self.urls = list(urls)
+        self.default_model = default_model or OLLAMA_MODEL
+        self._lock = threading.Lock()
+        self._outstanding = {url: 0 for url in self.urls}
+        self._loaded = {}       # url -> (fetched_at, set of model names)
+        self._stats = {url: {"requests": 0, "placed_loaded": 0, "failovers": 0} for url in self.urls}
+
+    @property
+    def members(self):
+        return [OllamaBackend(base_url=url, default_model=self.default_model) for url in self.urls]
+
+    @property
+    def health(self):
+        return PoolHealth(self.members)
+
+    def is_available(self):
+        return any(member.is_available() for member in self.members)
+
+    def list_models(self):
+        models = []
+        for member in self.members:
+            models.extend(m for m in member.list_models() if m not in models)
+        return models
+
+    def _loaded_models(self, url):
+        manager = get_residency_manager(url)
+        if manager is not None:
+            return set(manager.resident())
+        with self._lock:
+            cached = self._loaded.get(url)
+            if cached and time.monotonic() - cached[0] < PS_TTL:
+                return cached[1]
+        try:
+            resp = requests.get(f"{url}/api/ps", timeout=(CONNECT_TIMEOUT, 5))
+            resp.raise_for_status()
+            models = {m.get("name") or m.get("model") for m in resp.json().get("models", [])}
+        except Exception:
+            models = set()
+        with self._lock:
+            self._loaded[url] = (time.monotonic(), models)
+        return models
+
+    def _pick(self, model, exclude, prefer=None):
+        members = [m for m in self.members if m.base_url not in exclude and m.health.available()]
+        if not members:
+            return None, False
+        for member in members:
+            if member.base_url == prefer:
+                return member, True
+        name = normalize_model(model)
+        with self._lock:
+            outstanding = dict(self._outstanding)
+        warm = [m for m in members
+                if outstanding[m.base_url] < OLLAMA_PARALLEL and name in self._loaded_models(m.base_url)]
+        choice = min(warm or members, key=lambda m: outstanding[m.base_url])
+        return choice, bool(warm)
+
+    def generate(self, prompt, model=None, max_tokens=500, temperature=0.7, seed=None):
+        return _collect(self.generate_stream(prompt, model, max_tokens, temperature, seed))
+
+    def embed(self, texts, model=None):
+        """Embed on one instance, placed like generate_stream(); fails over if it is down."""
+        model = model or OLLAMA_EMBED_MODEL
+        tried = set()
+        while True:
+            member, warm = self._pick(model, tried)
+            if member is None:
+                return {"success": False, "unavailable": True, "error": "No Ollama instance available"}
+            url = member.base_url
+            tried.add(url)
+            with self._lock:
+                self._outstanding[url] += 1
+                self._stats[url]["requests"] += 1
+                self._stats[url]["placed_loaded"] += warm
+            try:
+                result = member.embed(texts, model)
+            finally:
+                with self._lock:
+                    self._outstanding[url] -= 1
+            if result.get("success") or not result.get("unavailable") or len(tried) == len(self.urls):
+                return dict(result, instance=url)
+            with self._lock:
+                self._stats[url]["failovers"] += 1
+
+    def generate_stream(self, prompt, model=None, max_tokens=500, temperature=0.7, seed=None,
+                        cancel_event=None, session_id=None, history=None):
+        """
+        Stream from one instance (see class docstring); final events name it
+        in "instance". Session turns stay on the session's instance while it is up.
+        """
+        model = model or self.default_model
+        session = _session(session_id)
+        prefer = session["instance"] if session and session["backend"] == "ollama" else None
+        tried = set()
+        while True:
+            member, warm = self._pick(model, tried, prefer)
+            if member is None:
+                yield _unavailable("No Ollama instance available")
+                return
+            url = member.base_url
+            tried.add(url)
+            with self._lock:
+                self._outstanding[url] += 1
+                self._stats[url]["requests"] += 1
+                self._stats[url]["placed_loaded"] += warm
+            streamed = False
+            try:
+                for event in member.generate_stream(prompt, model, max_tokens, temperature, seed,
+                                                    cancel_event, session_id, history):
+                    if not event.get("done"):
+                        streamed = True
+                        yield event
+                        continue
+                    if event.get("success"):
+                        with self._lock:
+                            if url in self._loaded:
+                                self._loaded[url][1].add(normalize_model(model))
+                    elif event.get("unavailable") and not streamed and len(tried) < len(self.urls):
+                        logger.warning(f"Ollama at {url} unavailable ({event.get('error')}), trying another instance")
+                        with self._lock:
+                            self._stats[url]["failovers"] += 1
+                        break
+                    yield dict(event, instance=url)
+                    return
+                else:
+                    return
+            finally:
+                with self._lock:
+                    self._outstanding[url] -= 1
+
+    def stats(self):
+        with self._lock:
+            return {url: dict(self._stats[url], outstanding=self._outstanding[url]) for url in self.urls}
+
+
+_pools = {}
+
+
+def _pool_for(urls):
+    with _health_lock:
+        pool = _pools.get(tuple(urls))
+        if pool is None:
+            pool = _pools[tuple(urls)] = OllamaPool(urls)
+        return pool
+
+
+def _ollama():
+    """The configured Ollama backend: a single OllamaBackend, or the pool for several URLs."""
+    if len(OLLAMA_URLS) > 1:
+        return _pool_for(OLLAMA_URLS)
+    return OllamaBackend()
+
+
+def get_ollama_pool_stats():
+    """Per-instance request/outstanding/failover counts, or None with a single Ollama URL."""
+    if len(OLLAMA_URLS) > 1:
+        return _pool_for(OLLAMA_URLS).stats()
+    return None
 
 
 # =============================================================================
@@ -108,6 +1006,8 @@ class DistributedBackend:
         self.gateway_url = gateway_url or DISTRIBUTED_GATEWAY_URL
         self.gateway_key = gateway_key or DISTRIBUTED_GATEWAY_KEY
         self.default_model = default_model or DISTRIBUTED_MODEL
+        self.health = _health_for("distributed", self.gateway_url, self.is_available)
+        self.slots = _slots_for("distributed", self.gateway_url, GATEWAY_PARALLEL)
 
     def _headers(self):
         headers = {"Content-Type": "application/json"}
@@ -121,7 +1021,7 @@ class DistributedBackend:
             resp = requests.get(
                 f"{self.gateway_url}/health",
                 headers=self._headers(),
-                timeout=10
+                timeout=(CONNECT_TIMEOUT, 10)
             )
             if resp.status_code == 200:
                 data = resp.json()
@@ -156,44 +1056,155 @@ class DistributedBackend:
         except Exception:
             return None
 
-    def generate(self, prompt, model=None, max_tokens=500, temperature=0.7):
-        """Run inference through the distributed swarm."""
-        model = model or self.default_model
-        try:
+    def embed(self, texts, model=None):
+        """Embed a list of texts with the gateway's /embed endpoint (batched)."""
+        model = model or DISTRIBUTED_EMBED_MODEL
+
+        def post_chunk(chunk):
             resp = requests.post(
-                f"{self.gateway_url}/inference",
+                f"{self.gateway_url}/embed",
                 headers=self._headers(),
-                json={
-                    "prompt": prompt,
-                    "model": model,
-                    "max_tokens": max_tokens,
-                    "temperature": temperature
-                },
-                timeout=DISTRIBUTED_TIMEOUT
+                json={"model": model, "texts": chunk},
+                timeout=(CONNECT_TIMEOUT, DISTRIBUTED_TIMEOUT)
             )
             resp.raise_for_status()
             data = resp.json()
+            if not data.get("success"):
+                raise RuntimeError(data.get("error", "Unknown gateway error"))
+            return data["embeddings"]
+
+        return dict(_embed_chunks(self, texts, post_chunk, f"distributed gateway at {self.gateway_url}"),
+                    model=model, backend="distributed")
 
-            if data.get("success"):
-                return {
-                    "success": True,
-                    "response": data.get("response", ""),
-                    "model": data.get("model", model),
-                    "backend": "distributed",
-                    "tokens_generated": data.get("tokens_generated", 0),
-                    "generation_time": data.get("generation_time", 0),
-                    "node_id": data.get("node_id", ""),
-                    "query_id": data.get("query_id", "")
-                }
-            else:
-                return {"success": False, "error": data.get("error", "Unknown gateway error")}
+    def generate(self, prompt, model=None, max_tokens=500, temperature=0.7, seed=None):
+        """Run inference through the distributed swarm."""
+        return _collect(self.generate_stream(prompt, model, max_tokens, temperature, seed))
+
+    def _final_event(self, data, model, parts, timing):
+        event = {
+            "done": True,
+            "success": True,
+            "response": data.get("response", "".join(parts)),
+            "model": data.get("model", model),
+            "backend": "distributed",
+            "tokens_generated": data.get("tokens_generated", len(parts)),
+            "prompt_tokens": data.get("prompt_tokens"),
+            "generation_time": data.get("generation_time", 0),
+            "node_id": data.get("node_id", ""),
+            "query_id": data.get("query_id", ""),
+            **timing
+        }
+        if data.get("session"):
+            event["session"] = data["session"]  # taken by _in_session
+        return event
+
+    def generate_stream(self, prompt, model=None, max_tokens=500, temperature=0.7, seed=None,
+                        cancel_event=None, session_id=None, history=None):
+        """
+        Stream inference through the gateway's /inference/stream (SSE). Yields
+        token events, then a final event. Gateways without the streaming
+        endpoint (404) are served by /inference as a single token. The gateway
+        does not take a seed, so only temperature 0 results are cached.
+        With *session_id*, the gateway keeps the swarm session between turns.
+        """
+        model = model or self.default_model
+
+        def run(prompt, context=None):
+            return _observed(self.health, _limited(self.slots, self._stream(
+                prompt, model, max_tokens, temperature, cancel_event, session_id, history)),
+                "distributed", model)
+
+        if session_id is not None:
+            return _in_session("distributed", model, self.gateway_url, session_id, prompt, history, run)
+        return _cached(
+            "distributed", model, prompt, dict(max_tokens=max_tokens, temperature=temperature),
+            lambda: run(prompt)
+        )
+
+    def _stream(self, prompt, model, max_tokens, temperature, cancel_event, session_id=None,
+                history=None):
+        body = {
+            "prompt": prompt,
+            "model": model,
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        if session_id is not None:
+            body["session_id"] = session_id
+            if history:
+                body["history"] = history  # used by the gateway if it lost the session
+        headers = dict(self._headers(), Accept="text/event-stream")
+        started = time.monotonic()
+        first_token_at = None
+        parts = []
+        final = None
+        streaming = True
+        try:
+            with _http(cancel_event) as http:
+                with http.post(
+                    f"{self.gateway_url}/inference/stream",
+                    headers=headers,
+                    json=body,
+                    stream=True,
+                    timeout=(CONNECT_TIMEOUT, DISTRIBUTED_TIMEOUT)
+                ) as resp:
+                    if resp.status_code in (429, 503):
+                        yield _busy(resp, f"Distributed gateway at {self.gateway_url}")
+                        return
+                    if resp.status_code == 404:
+                        streaming = False
+                    else:
+                        resp.raise_for_status()
+                        for event in _iter_sse(resp):
+                            if cancel_event is not None and cancel_event.is_set():
+                                yield _cancelled(parts)
+                                return
+                            if event.get("done"):
+                                final = event
+                                break
+                            token = event.get("token", "")
+                            if token:
+                                if first_token_at is None:
+                                    first_token_at = time.monotonic()
+                                parts.append(token)
+                                yield {"token": token}
+
+                if not streaming:
+                    resp = http.post(
+                        f"{self.gateway_url}/inference",
+                        headers=self._headers(),
+                        json=body,
+                        timeout=(CONNECT_TIMEOUT, DISTRIBUTED_TIMEOUT)
+                    )
+                    if resp.status_code in (429, 503):
+                        yield _busy(resp, f"Distributed gateway at {self.gateway_url}")
+                        return
+                    resp.raise_for_status()
+                    final = resp.json()
+                    if final.get("success") and final.get("response"):
+                        first_token_at = time.monotonic()
+                        parts.append(final["response"])
+                        yield {"token": final["response"]}
 
         except requests.ConnectionError:
-            return {"success": False, "error": f"Cannot connect to distributed gateway at {self.gateway_url}"}
+            yield _unless_cancelled(cancel_event, parts, _unavailable(
+                f"Cannot connect to distributed gateway at {self.gateway_url}", parts))
+            return
         except requests.Timeout:
-            return {"success": False, "error": f"Distributed inference timed out after {DISTRIBUTED_TIMEOUT}s"}
+            yield _unless_cancelled(cancel_event, parts, _unavailable(
+                f"Distributed inference timed out after {DISTRIBUTED_TIMEOUT}s", parts))
+            return
         except Exception as e:
-            return {"success": False, "error": str(e)}
+            yield _unless_cancelled(cancel_event, parts, _error_event(e, parts))
+            return
+
+        if final is None:
+            yield _failed("Gateway stream ended before completion", parts)
+            return
+        if not final.get("success"):
+            yield _failed(final.get("error", "Unknown gateway error"), parts)
+            return
+        yield self._final_event(final, model, parts, _timing(started, first_token_at, len(parts)))
 
 
 # =============================================================================
@@ -204,53 +1215,264 @@ def get_backend(backend=None):
     """Get the configured inference backend instance."""
     backend = backend or INFERENCE_BACKEND
     if backend == "ollama":
-        return OllamaBackend()
+        return _ollama()
     elif backend in ("distributed",):
         return DistributedBackend()
     else:  # auto
         return None  # Handled by generate()
 
 
-def generate(prompt, model=None, max_tokens=500, temperature=0.7, backend=None):
+_router = Router()
+
+
+class _EitherEvent:
+    """is_set() view over the caller's cancel event and the router's."""
+
+    def __init__(self, *events):
+        self._events = [e for e in events if e is not None]
+
+    def is_set(self):
+        return any(e.is_set() for e in self._events)
+
+
+def _hedge_after(name, model_key):
+    if INFERENCE_HEDGE == "off":
+        return None
+    if INFERENCE_HEDGE == "auto":
+        return _router.hedge_delay(name, model_key)
+    return float(INFERENCE_HEDGE)
+
+
+def get_router_stats():
+    """Per backend/model rolling latency and error stats, plus hedge/failover counters."""
+    return _router.stats()
+
+
+def _plan(name, instance, prompt, model, max_tokens, session_id, history=None):
+    """
+    token_budget.plan() for one candidate backend, counting the session
+    context already used, or the *history* a non-resumed session is rebuilt from.
+    """
+    model = model or instance.default_model
+    url = instance.gateway_url if name == "distributed" else getattr(instance, "base_url", None) or instance.urls[0]
+    used = 0
+    if session_id is not None:
+        session = _session(session_id)
+        if session and (session["backend"], session["model"]) == (name, model):
+            used = len(session["context"])
+        elif history:
+            used = token_budget.count_tokens(history, model)[0]  # prepended by _in_session / the gateway
+    return token_budget.plan(prompt, model, max_tokens, token_budget.context_length(name, model, url),
+                             used_tokens=used)
+
+
+def _candidates(backend_name):
+    """(name, instance) pairs a request may go to; in auto mode the healthy backends."""
+    if backend_name in ("distributed",):
+        return [("distributed", DistributedBackend())]
+    if backend_name == "ollama":
+        return [("ollama", _ollama())]
+    # Auto: cached health, no per-request probe
+    return [
+        (name, instance)
+        for name, instance in (("distributed", DistributedBackend()), ("ollama", _ollama()))
+        if instance.health.available()
+    ]
+
+
+def _budgeted(candidates, prompt, model, max_tokens, session_id, history=None):
+    """
+    Keep the candidates the request fits as-is; otherwise the one with the
+    largest context, trimmed (policy "trim") or rejected.
+    Returns (candidates, plan).
+    """
+    plans = [_plan(name, instance, prompt, model, max_tokens, session_id, history)
+             for name, instance in candidates]
+    fitting = [(c, p) for c, p in zip(candidates, plans) if p["action"] in ("ok", "unchecked")]
+    if fitting:
+        return [c for c, _ in fitting], fitting[0][1]
+    best = max(zip(candidates, plans), key=lambda cp: cp[1]["context_length"] or 0)
+    return [best[0]], best[1]
+
+
+def _budget_report(plan):
+    return {k: plan[k] for k in ("action", "prompt_tokens", "max_tokens", "context_length", "estimated")}
+
+
+def _with_budget(events, plan):
+    """Note a trimmed request in its final event."""
+    for event in events:
+        if event.get("done") and plan["action"] == "trimmed":
+            event = dict(event, budget=_budget_report(plan))
+        yield event
+
+
+def budget(prompt, model=None, max_tokens=500, backend=None, session_id=None, history=None):
+    """
+    Pre-dispatch token plan (see services.token_budget.plan), over the same
+    candidate backends generate() would try: "rejected" only if none fits.
+    """
+    candidates = _candidates(backend or INFERENCE_BACKEND)
+    if not candidates:
+        # Nothing is up right now; judge against both so the job is not dropped for it
+        candidates = [("distributed", DistributedBackend()), ("ollama", _ollama())]
+    return _budgeted(candidates, prompt, model, max_tokens, session_id, history)[1]
+
+
+def generate(prompt, model=None, max_tokens=500, temperature=0.7, backend=None, seed=None,
+             session_id=None, history=None):
     """
     Run inference through the best available backend.
 
-    Auto mode: tries distributed gateway first, falls back to Ollama.
+    Auto mode: routes by observed latency, failing over between backends.
+    *session_id*/*history*: multi-turn sessions, see services.inference_sessions.
     Returns dict with 'success', 'response', 'backend', etc.
     """
+    return _collect(generate_stream(prompt, model, max_tokens, temperature, backend, seed=seed,
+                                    session_id=session_id, history=history))
+
+
+def generate_stream(prompt, model=None, max_tokens=500, temperature=0.7, backend=None,
+                    seed=None, cancel_event=None, session_id=None, history=None):
+    """
+    Stream inference through the best available backend (see module docstring
+    for the event format).
+
+    Auto mode: see Router — latency-ranked, with failover to the next backend
+    if one fails before producing any token, and optional hedging. A session
+    turn goes to the backend holding the session and is never hedged.
+    """
     backend_name = backend or INFERENCE_BACKEND
+    candidates = _candidates(backend_name)
+    if not candidates:
+        yield _failed("No inference backend available (distributed gateway down, Ollama not running)")
+        return
 
-    if backend_name in ("distributed",):
-        return DistributedBackend().generate(prompt, model=model, max_tokens=max_tokens, temperature=temperature)
+    plan = {"action": "unchecked"}
+    if token_budget.DEFAULT_POLICY != "off":
+        candidates, plan = _budgeted(candidates, prompt, model, max_tokens, session_id, history)
+        if plan["action"] == "rejected":
+            yield _failed(plan["error"], rejected=True, budget=_budget_report(plan))
+            return
+        prompt, max_tokens = plan["prompt"], plan["max_tokens"]
 
-    if backend_name == "ollama":
-        return OllamaBackend().generate(prompt, model=model, max_tokens=max_tokens, temperature=temperature)
+    if len(candidates) == 1 and backend_name in ("distributed", "ollama"):
+        yield from _with_budget(candidates[0][1].generate_stream(
+            prompt, model, max_tokens, temperature, seed, cancel_event, session_id, history), plan)
+        return
 
-    # Auto: try distributed first, fall back to Ollama
-    distributed = DistributedBackend()
-    if distributed.is_available():
-        logger.info("Using distributed backend (gateway reachable)")
-        result = distributed.generate(prompt, model=model, max_tokens=max_tokens, temperature=temperature)
-        if result.get("success"):
-            return result
-        logger.warning(f"Distributed backend failed: {result.get('error')} — falling back to Ollama")
+    model_key = model or "default"
+    ranked = _router.rank(candidates, model_key, max_tokens)
+    session = _session(session_id)
+    if session is not None:
+        ranked.sort(key=lambda candidate: candidate[0] != session["backend"])
+    logger.info(f"Routing to {ranked[0][0]} backend")
 
-    ollama = OllamaBackend()
-    if ollama.is_available():
-        logger.info("Using Ollama backend (local)")
-        return ollama.generate(prompt, model=model, max_tokens=max_tokens, temperature=temperature)
+    def make_stream(instance, router_cancel):
+        cancel = _EitherEvent(cancel_event, router_cancel)
+        return instance.generate_stream(prompt, model, max_tokens, temperature, seed, cancel,
+                                        session_id, history)
+
+    hedge_after = None if session_id else _hedge_after(ranked[0][0], model_key)
+    yield from _with_budget(_router.stream(ranked, model_key, make_stream, hedge_after), plan)
+
+
+def generate_many(prompts, model=None, max_tokens=500, temperature=0.7, backend=None,
+                  seed=None, concurrency=None):
+    """
+    Run many prompts concurrently through generate().
+
+    Items of *prompts* are strings, or dicts with "prompt" and optional
+    per-item "model", "max_tokens", "temperature", "seed" overrides.
+    In-flight requests per backend are capped process-wide (OLLAMA_PARALLEL,
+    GATEWAY_PARALLEL); *concurrency* additionally caps this call.
+
+    Returns: {
+        "results": [...],   # one generate() result per prompt, same order;
+                            # failures are {"success": False, "error": ...}
+        "stats": {"count", "succeeded", "failed", "cached", "wall_time_ms",
+                  "tokens", "tokens_per_second", "backends": {name: count}}
+    }
+    """
+    defaults = {"model": model, "max_tokens": max_tokens, "temperature": temperature, "seed": seed}
+
+    def run_one(item):
+        params = dict(defaults)
+        if isinstance(item, dict):
+            params.update({k: item[k] for k in defaults if k in item})
+            item = item.get("prompt")
+        if not item or not isinstance(item, str):
+            return _failed("prompt required")
+        try:
+            return generate(item, backend=backend, **params)
+        except Exception as e:
+            return _failed(str(e))
+
+    started = time.monotonic()
+    results = []
+    if prompts:
+        workers = min(len(prompts), concurrency or (OLLAMA_PARALLEL * len(OLLAMA_URLS) + GATEWAY_PARALLEL))
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="generate") as pool:
+            results = list(pool.map(run_one, prompts))
+    wall = time.monotonic() - started
+
+    for result in results:
+        result.pop("done", None)
+    ok = [r for r in results if r.get("success")]
+    tokens = sum(r.get("eval_count") or r.get("tokens_generated") or 0 for r in ok)
+    backends = {}
+    for r in ok:
+        backends[r.get("backend")] = backends.get(r.get("backend"), 0) + 1
+    return {
+        "results": results,
+        "stats": {
+            "count": len(results),
+            "succeeded": len(ok),
+            "failed": len(results) - len(ok),
+            "cached": sum(1 for r in ok if r.get("cached")),
+            "wall_time_ms": int(wall * 1000),
+            "tokens": tokens,
+            "tokens_per_second": round(tokens / wall, 2) if wall > 0 else None,
+            "backends": backends,
+        },
+    }
+
+
+def embed(texts, model=None, backend=None):
+    """
+    Embed a list of texts in one batched backend call (see services.embeddings
+    for coalescing concurrent callers).
+
+    Auto mode: the gateway if it is healthy, else Ollama; a backend that is
+    unavailable hands over to the other. *model* is backend-specific (None
+    uses that backend's default embedding model).
+
+    Returns {"success", "embeddings": [[float, ...], ...], "model", "backend"}.
+    """
+    backend_name = backend or INFERENCE_BACKEND
+    if backend_name in ("distributed",):
+        return DistributedBackend().embed(texts, model)
+    if backend_name == "ollama":
+        return _ollama().embed(texts, model)
 
-    return {"success": False, "error": "No inference backend available (distributed gateway down, Ollama not running)"}
+    candidates = [b for b in (DistributedBackend(), _ollama()) if b.health.available()]
+    if not candidates:
+        return {"success": False, "error": "No inference backend available for embeddings"}
+    for instance in candidates:
+        result = instance.embed(texts, model)
+        if result.get("success") or not result.get("unavailable"):
+            break
+    return result
 
 
 def check_available():
-    """Check if any inference backend is available."""
+    """Check if any inference backend is available (cached; see BackendHealth)."""
     if INFERENCE_BACKEND in ("distributed",):
-        return DistributedBackend().is_available()
+        return DistributedBackend().health.available()
     if INFERENCE_BACKEND == "ollama":
-        return OllamaBackend().is_available()
+        return _ollama().health.available()
     # Auto: either works
-    return DistributedBackend().is_available() or OllamaBackend().is_available()
+    return DistributedBackend().health.available() or _ollama().health.available()
 
 
 # =============================================================================
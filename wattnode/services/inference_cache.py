@@ -0,0 +1,113 @@
+"""
+WattNode Inference Response Cache
+Reuses results of deterministic generations (temperature 0, or a fixed seed
+on backends that honour it) for identical requests.
+
+Keys hash (backend, model, prompt, generation params), so a cached answer is
+only ever returned for exactly the request that produced it. Sampled
+generations are never cached — see is_cacheable().
+
+Tiers:
+- memory: LRU bounded by entry count and bytes
+- disk (optional): a services.result_store.ResultStore, which survives
+  restarts; memory misses fall through to it and hits are promoted
+
+Usage:
+    from services.inference_cache import ResponseCache
+    from services.inference import set_response_cache
+    set_response_cache(ResponseCache(max_bytes=32 * 1024 * 1024, ttl=3600))
+"""
+
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_MAX_MB = 32
+DEFAULT_TTL = 3600          # seconds; None keeps entries until evicted
+
+
+def is_cacheable(temperature, seed=None, seeded_backend=False):
+    """Greedy decoding is deterministic; sampling only with a seed the backend honours."""
+    if temperature is not None and temperature <= 0:
+        return True
+    return seed is not None and seeded_backend
+
+
+def cache_key(backend, model, prompt, **params):
+    """Hex key for one request. *params* are the generation options that affect output."""
+    prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    raw = json.dumps([backend, model, prompt_hash, params], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Two-tier (memory LRU + optional disk) cache of final inference results. Thread-safe."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_MB * 1024 * 1024,
+                 ttl=DEFAULT_TTL, disk=None, clock=time.time):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.disk = disk
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (stored_at, size, result)
+        self._bytes = 0
+        self._stats = {"hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _expired(self, stored_at):
+        return self.ttl is not None and self._clock() - stored_at > self.ttl
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key):
+        """Cached result for *key* (a copy), or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return dict(entry[2])
+                self._drop(key)
+
+        stored = self.disk.get(key) if self.disk is not None else None
+        if stored is not None and not self._expired(stored.get("stored_at", 0)):
+            self._insert(key, stored["result"], stored["stored_at"])
+            with self._lock:
+                self._stats["disk_hits"] += 1
+            return dict(stored["result"])
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, key, result):
+        now = self._clock()
+        self._insert(key, result, now)
+        if self.disk is not None:
+            self.disk.put(key, {"stored_at": now, "result": result})
+        with self._lock:
+            self._stats["stores"] += 1
+
+    def _insert(self, key, result, stored_at):
+        size = len(json.dumps(result, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (stored_at, size, dict(result))
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), bytes=self._bytes)
@@ -2,20 +2,45 @@
 WSI Inference Gateway — HTTP server that wraps the distributed inference client.
 Runs on the seed node (or any node with the inference client installed).
 Accepts HTTP requests from the API server and routes them through the inference swarm.
+Concurrent prompts are queued and batched into shared generate calls (see BatchScheduler).
+Inference requests pass admission control first (see AdmissionController): a
+bounded queue per priority lane ("priority": "high"|"normal"|"low" in the body)
+with a queue-time deadline ("max_queue_ms", capped at WSI_QUEUE_TIMEOUT).
+Saturated: 429 + Retry-After; deadline missed: 503 + Retry-After.
 
 Endpoints:
-- POST /inference  - Run distributed inference
-- GET  /swarm      - Swarm health & node info
-- GET  /models     - Available models
-- GET  /health     - Gateway health check
+- POST /inference         - Run distributed inference
+- POST /inference/stream  - Run distributed inference, streaming tokens (SSE)
+- POST /embed             - Embed a batch of texts
+- GET  /swarm             - Swarm health & node info
+- GET  /models            - Available models
+- GET  /health            - Gateway health check
 
 Usage:
     python inference_gateway.py                        # default port 8090
     python inference_gateway.py --port 8090 --host 0.0.0.0
     WSI_GATEWAY_KEY=mysecret python inference_gateway.py # with auth
+    python inference_gateway.py --threads 16 --connection-limit 200
+    python inference_gateway.py --server flask         # Flask development server
+
+Serving:
+    By default the gateway runs under waitress: one process (the model is
+    loaded once and shared), a pool of worker threads, a connection limit and
+    keep-alive timeout. The pool is sized from the admission limits (one
+    thread per running or queued request, SSE streams included) and the
+    gateway refuses to start with fewer threads than that. Handlers spend their time in network I/O and torch
+    kernels, both of which release the GIL, so threads serve concurrently.
+    Without waitress installed it falls back to Flask's threaded dev server.
+
+    SIGTERM drains: new requests get 503 + Retry-After (and /health reports
+    "draining") while in-flight requests finish; once nothing is in flight
+    or queued in the server for DRAIN_GRACE seconds, the process exits.
+    SIGHUP drains the same way, then re-executes the gateway in place
+    (graceful reload, same PID for the supervisor).
 
 Requirements:
     pip install petals torch transformers flask  # distributed inference dependencies
+    pip install waitress                         # production server (optional)
 
 Version: 1.0.0
 """
@@ -25,12 +50,15 @@ import sys
 import time
 import json
 import logging
+import signal
 import argparse
 import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
 from datetime import datetime
 
 # Flask for HTTP API
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, g, stream_with_context
 
 app = Flask(__name__)
 
@@ -49,6 +77,48 @@ DEFAULT_MAX_TOKENS = 500
 MAX_MAX_TOKENS = 2000
 DEFAULT_TEMPERATURE = 0.7
 
+# Sessions — swarm inference sessions kept open between chat turns, so a
+# follow-up only sends its new tokens through the swarm
+SESSION_TTL = int(os.getenv("WSI_SESSION_TTL", "600"))      # seconds idle
+MAX_SESSIONS = int(os.getenv("WSI_MAX_SESSIONS", "16"))     # each holds attention caches on the servers
+SESSION_MAX_LENGTH = 2048                                   # tokens per session, all turns
+
+# Batching — concurrent prompts for the same model share one generate call.
+# Only prompts of equal token length are batched (the swarm's models take no
+# padding), grouped by max_tokens bucket so rows finish at about the same step.
+MAX_BATCH = int(os.getenv("WSI_MAX_BATCH", "8"))
+BATCH_WAIT_MS = int(os.getenv("WSI_BATCH_WAIT_MS", "10"))  # how long a forming batch waits for more
+MIN_BUCKET = 16                                             # smallest max_tokens bucket
+
+# Admission control — a bounded waiting room in front of the model. When it is
+# full, or a request waits past its deadline, callers get 429/503 with
+# Retry-After at once and can fail over instead of timing out.
+PRIORITIES = ("high", "normal", "low")                              # lanes, served in this order
+MAX_ACTIVE = int(os.getenv("WSI_MAX_ACTIVE", str(2 * MAX_BATCH)))   # requests generating at once
+MAX_QUEUE = int(os.getenv("WSI_MAX_QUEUE", "32"))                   # waiting requests per lane
+QUEUE_TIMEOUT = float(os.getenv("WSI_QUEUE_TIMEOUT", "20"))         # max seconds waiting for a slot
+
+# Serving — production server limits (see "Serving" above)
+SERVER = os.getenv("WSI_SERVER", "waitress")                    # waitress | flask
+# Every running or queued inference request holds a server thread, so the pool
+# must cover MAX_ACTIVE + all lanes, plus SERVER_HEADROOM for /health and refusals;
+# with fewer threads a burst waits in the server's own unbounded task queue.
+SERVER_HEADROOM = 4
+MIN_SERVER_THREADS = MAX_ACTIVE + MAX_QUEUE * len(PRIORITIES) + SERVER_HEADROOM
+SERVER_THREADS = int(os.getenv("WSI_THREADS", str(MIN_SERVER_THREADS)))
+CONNECTION_LIMIT = int(os.getenv("WSI_CONNECTION_LIMIT", str(SERVER_THREADS + 32)))
+KEEPALIVE_TIMEOUT = int(os.getenv("WSI_KEEPALIVE_TIMEOUT", "30"))  # idle seconds before a connection closes
+MAX_BODY_MB = float(os.getenv("WSI_MAX_BODY_MB", "4"))
+DRAIN_TIMEOUT = int(os.getenv("WSI_DRAIN_TIMEOUT", "120"))       # seconds to wait for in-flight requests
+DRAIN_GRACE = 2.0   # seconds with nothing in flight or queued before a drain completes
+
+app.config["MAX_CONTENT_LENGTH"] = int(MAX_BODY_MB * 1024 * 1024)
+
+# Embeddings — a small encoder run locally on the gateway (not through the swarm)
+EMBED_MODEL = os.getenv("WSI_EMBED_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBED_BATCH = 32        # texts per forward pass
+MAX_EMBED_TEXTS = 1024  # per request
+
 # Logging
 logging.basicConfig(
     level=logging.INFO,
@@ -65,6 +135,9 @@ _models = {}        # model_name -> (model, tokenizer)
 _models_lock = threading.Lock()
 _load_errors = {}   # model_name -> error string
 _node_id = None     # this gateway's node ID (set on startup)
+_embedders = {}     # model_name -> (model, tokenizer)
+_sessions = OrderedDict()   # session_id -> SwarmSession, least recently used first
+_sessions_lock = threading.Lock()
 
 # Track queries served for contribution reporting
 _query_stats = {
@@ -138,113 +211,824 @@ def load_model(model_name):
         return None, err
 
 
-def run_inference(prompt, model_name=None, max_tokens=500, temperature=0.7):
+class SwarmSession:
+    """An open swarm inference session (server-side attention caches) for one conversation."""
+
+    def __init__(self, model_name, session):
+        self.model_name = model_name
+        self.session = session
+        self.tokens = 0         # tokens already processed by the session
+        self.lock = threading.Lock()
+        self.updated_at = time.time()
+
+    def close(self):
+        try:
+            self.session.close()
+        except Exception as e:
+            logger.debug(f"Closing session failed: {e}")
+
+
+def _close_session(session_id):
+    with _sessions_lock:
+        swarm_session = _sessions.pop(session_id, None)
+    if swarm_session:
+        swarm_session.close()
+
+
+def get_session(session_id, model_name, model):
+    """Existing session for *session_id* (resumed=True), or a newly opened one."""
+    expired = []
+    with _sessions_lock:
+        now = time.time()
+        for sid, existing in list(_sessions.items()):
+            if now - existing.updated_at > SESSION_TTL:
+                expired.append(_sessions.pop(sid))
+        swarm_session = _sessions.get(session_id)
+        if swarm_session is not None and swarm_session.model_name != model_name:
+            expired.append(_sessions.pop(session_id))
+            swarm_session = None
+        if swarm_session is not None:
+            _sessions.move_to_end(session_id)
+    for old in expired:
+        old.close()
+    if swarm_session is not None:
+        return swarm_session, True
+
+    opened = SwarmSession(model_name, model.inference_session(max_length=SESSION_MAX_LENGTH))
+    evicted = []
+    with _sessions_lock:
+        # A concurrent first turn may have opened the same session meanwhile:
+        # keep theirs (turns serialize on its lock) and close ours
+        swarm_session = _sessions.get(session_id)
+        if swarm_session is not None and swarm_session.model_name == model_name:
+            _sessions.move_to_end(session_id)
+            evicted.append(opened)
+        else:
+            if swarm_session is not None:
+                evicted.append(swarm_session)
+            swarm_session = _sessions[session_id] = opened
+            while len(_sessions) > MAX_SESSIONS:
+                evicted.append(_sessions.popitem(last=False)[1])
+    for old in evicted:
+        old.close()
+    return swarm_session, False
+
+
+# =============================================================================
+# BATCHING SCHEDULER
+# =============================================================================
+
+def _bucket(tokens):
+    """Smallest power of two >= *tokens* (at least MIN_BUCKET)."""
+    bucket = MIN_BUCKET
+    while bucket < tokens:
+        bucket *= 2
+    return bucket
+
+
+class _Request:
+    __slots__ = ("key", "model", "tokenizer", "input_ids", "max_new_tokens", "temperature",
+                 "enqueued_at", "future")
+
+    def __init__(self, key, model, tokenizer, input_ids, max_new_tokens, temperature):
+        self.key = key
+        self.model = model
+        self.tokenizer = tokenizer
+        self.input_ids = input_ids
+        self.max_new_tokens = max_new_tokens
+        self.temperature = temperature
+        self.enqueued_at = time.time()
+        self.future = Future()
+
+
+class BatchScheduler:
+    """
+    Request queue + worker pool that runs compatible prompts as one batch.
+
+    Compatible means same model, temperature, prompt length in tokens and
+    max_tokens bucket. Distributed models require an all-ones attention mask
+    and consecutive position ids, so rows cannot be padded to a common width.
+    Each of *workers* threads takes the oldest queued request together with
+    up to *max_batch* - 1 queued requests that match it. Only when it found
+    company does it wait up to *max_wait* seconds for more; a lone request is
+    dispatched at once. Batches run concurrently, so *workers* should match
+    the number of requests admitted to generate at once (MAX_ACTIVE). The
+    swarm's generate() runs a batch to completion: each row is cut at its own
+    EOS / max_tokens and its caller is answered.
+    """
+
+    def __init__(self, max_batch=MAX_BATCH, max_wait=BATCH_WAIT_MS / 1000.0, workers=MAX_ACTIVE):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.workers = max(1, workers)
+        self._cond = threading.Condition()
+        self._queue = []        # _Request, oldest first
+        self._threads = []
+        self._stats = {"batches": 0, "requests": 0, "max_batch_size": 0, "queue_ms_total": 0,
+                       "max_queue_ms": 0, "prompt_tokens": 0, "errors": 0}
+
+    def submit(self, model_name, model, tokenizer, input_ids, max_new_tokens, temperature):
+        """Queue one tokenized prompt (list of ids); the Future resolves to (generated_ids, batch_info)."""
+        key = (model_name, round(temperature, 2), len(input_ids), _bucket(max_new_tokens))
+        item = _Request(key, model, tokenizer, input_ids, max_new_tokens, temperature)
+        with self._cond:
+            self._queue.append(item)
+            if not self._threads:
+                for i in range(self.workers):
+                    thread = threading.Thread(target=self._loop, name=f"batch-scheduler-{i}", daemon=True)
+                    thread.start()
+                    self._threads.append(thread)
+            # Wake idle workers and any worker waiting for company with this key
+            self._cond.notify_all()
+        return item.future
+
+    def generate(self, model_name, model, tokenizer, input_ids, max_new_tokens, temperature):
+        return self.submit(model_name, model, tokenizer, input_ids, max_new_tokens, temperature).result()
+
+    def _join(self, batch):
+        """Move queued requests matching batch[0] into *batch*, up to max_batch."""
+        key = batch[0].key
+        room = self.max_batch - len(batch)
+        joining = [item for item in self._queue if item.key == key][:room]
+        if joining:
+            taken = set(map(id, joining))
+            self._queue = [item for item in self._queue if id(item) not in taken]
+            batch.extend(joining)
+
+    def _take(self):
+        with self._cond:
+            while not self._queue:
+                self._cond.wait()
+            batch = [self._queue.pop(0)]
+            self._join(batch)
+            if len(batch) > 1:
+                deadline = time.time() + self.max_wait
+                while len(batch) < self.max_batch and time.time() < deadline:
+                    self._cond.wait(deadline - time.time())
+                    self._join(batch)
+            return batch
+
+    def _loop(self):
+        while True:
+            batch = self._take()
+            try:
+                self._run(batch)
+            except Exception as e:
+                with self._cond:
+                    self._stats["errors"] += 1
+                for item in batch:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+
+    def _run(self, batch):
+        import torch
+
+        started = time.time()
+        first = batch[0]
+        tokenizer = first.tokenizer
+        width = len(first.input_ids)    # every row has this length (see submit)
+
+        outputs = first.model.generate(
+            torch.tensor([item.input_ids for item in batch]),
+            pad_token_id=tokenizer.pad_token_id,
+            max_new_tokens=max(item.max_new_tokens for item in batch),
+            **_sampling(first.temperature)
+        )
+
+        queue_ms = [int((started - item.enqueued_at) * 1000) for item in batch]
+        with self._cond:
+            self._stats["batches"] += 1
+            self._stats["requests"] += len(batch)
+            self._stats["max_batch_size"] = max(self._stats["max_batch_size"], len(batch))
+            self._stats["queue_ms_total"] += sum(queue_ms)
+            self._stats["max_queue_ms"] = max([self._stats["max_queue_ms"]] + queue_ms)
+            self._stats["prompt_tokens"] += width * len(batch)
+
+        for row, item, waited in zip(outputs, batch, queue_ms):
+            generated = row[width:width + item.max_new_tokens].tolist()
+            if tokenizer.eos_token_id in generated:
+                generated = generated[:generated.index(tokenizer.eos_token_id)]
+            item.future.set_result((generated, {"batch_size": len(batch), "queue_ms": waited}))
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats, queued=len(self._queue), max_batch=self.max_batch,
+                         workers=self.workers)
+        requests = stats.pop("requests")
+        queue_ms_total = stats.pop("queue_ms_total")
+        stats["batched_requests"] = requests
+        stats["mean_batch_size"] = round(requests / stats["batches"], 2) if stats["batches"] else None
+        stats["mean_queue_ms"] = round(queue_ms_total / requests, 1) if requests else None
+        return stats
+
+
+_scheduler = BatchScheduler()
+
+
+# =============================================================================
+# ADMISSION CONTROL
+# =============================================================================
+
+class AdmissionController:
+    """
+    Bounded per-priority queues in front of at most *max_active* running requests.
+
+    admit() takes a slot at once when one is free and nobody is waiting;
+    otherwise it joins its lane (or is refused with "full" when the lane holds
+    *max_queue* requests) and waits until it is the oldest request of the
+    highest non-empty lane and a slot frees, or until its deadline ("expired").
+    Retry-After is estimated from the mean service time and queue length.
+    """
+
+    def __init__(self, max_active=MAX_ACTIVE, max_queue=MAX_QUEUE, priorities=PRIORITIES,
+                 clock=time.monotonic):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.priorities = priorities
+        self._clock = clock
+        self._cond = threading.Condition()
+        self._lanes = {priority: deque() for priority in priorities}
+        self._active = 0
+        self._service_seconds = None    # moving average of slot hold time
+        self._stats = {priority: {"admitted": 0, "rejected": 0, "expired": 0, "queue_ms_total": 0}
+                       for priority in priorities}
+
+    def _head(self):
+        for priority in self.priorities:
+            if self._lanes[priority]:
+                return self._lanes[priority][0]
+        return None
+
+    def _queued(self):
+        return sum(len(lane) for lane in self._lanes.values())
+
+    def retry_after(self):
+        """Seconds until a new request would likely get a slot (1-60)."""
+        with self._cond:
+            service = self._service_seconds or 5.0
+            waves = (self._queued() + 1) / self.max_active
+            return max(1, min(60, int(service * waves + 0.999)))
+
+    def admit(self, priority="normal", timeout=QUEUE_TIMEOUT):
+        """Wait for a slot: (ticket, None) when admitted, else (None, "full"|"expired")."""
+        lane = self._lanes[priority]
+        stats = self._stats[priority]
+        with self._cond:
+            enqueued_at = self._clock()
+            if self._active < self.max_active and self._head() is None:
+                self._active += 1
+                stats["admitted"] += 1
+                return enqueued_at, None
+            if len(lane) >= self.max_queue:
+                stats["rejected"] += 1
+                return None, "full"
+
+            ticket = object()
+            lane.append(ticket)
+            deadline = enqueued_at + timeout
+            while not (self._active < self.max_active and self._head() is ticket):
+                remaining = deadline - self._clock()
+                if remaining <= 0:
+                    lane.remove(ticket)
+                    stats["expired"] += 1
+                    self._cond.notify_all()     # the next request may now be at the head
+                    return None, "expired"
+                self._cond.wait(remaining)
+            lane.popleft()
+            self._active += 1
+            now = self._clock()
+            stats["admitted"] += 1
+            stats["queue_ms_total"] += int((now - enqueued_at) * 1000)
+            self._cond.notify_all()
+            return now, None
+
+    def release(self, ticket):
+        """Free the slot taken by admit() (*ticket* is its admission time)."""
+        with self._cond:
+            self._active -= 1
+            held = self._clock() - ticket
+            self._service_seconds = held if self._service_seconds is None else (
+                0.8 * self._service_seconds + 0.2 * held)
+            self._cond.notify_all()
+
+    def depth(self):
+        with self._cond:
+            return {"active": self._active, "queue_depth": self._queued()}
+
+    def stats(self):
+        with self._cond:
+            lanes = {}
+            for priority, counters in self._stats.items():
+                lane = dict(counters, queued=len(self._lanes[priority]))
+                queue_ms_total = lane.pop("queue_ms_total")
+                lane["mean_queue_ms"] = round(queue_ms_total / lane["admitted"], 1) if lane["admitted"] else None
+                lanes[priority] = lane
+            return {
+                "active": self._active,
+                "max_active": self.max_active,
+                "queue_depth": self._queued(),
+                "max_queue": self.max_queue,
+                "rejected": sum(lane["rejected"] for lane in lanes.values()),
+                "expired": sum(lane["expired"] for lane in lanes.values()),
+                "mean_service_ms": int(self._service_seconds * 1000) if self._service_seconds else None,
+                "lanes": lanes,
+            }
+
+
+_admission = AdmissionController()
+
+
+def _sampling(temperature):
+    """generate() sampling arguments for *temperature* (greedy at 0)."""
+    return {
+        "temperature": temperature,
+        "do_sample": temperature > 0,
+        "top_p": 0.9 if temperature > 0 else 1.0,
+    }
+
+
+def _prepare(prompt, model_name, max_tokens, session_id=None, history=None):
+    """
+    Load the model, open or resume the session and tokenize the prompt.
+    Returns (job, None) or (None, error); inference client errors are raised.
+    """
+    model_pair, error = load_model(model_name)
+    if error:
+        return None, error
+
+    model, tokenizer = model_pair
+    swarm_session = None
+    resumed = False
+    if session_id:
+        swarm_session, resumed = get_session(session_id, model_name, model)
+        if not resumed and history:
+            prompt = history + prompt
+
+    # Tokenize input (no BOS in the middle of a session)
+    inputs = tokenizer(prompt, return_tensors="pt", add_special_tokens=not resumed)
+    input_ids = inputs["input_ids"]
+    input_len = input_ids.shape[1]
+    max_new_tokens = min(max_tokens, MAX_MAX_TOKENS)
+
+    if swarm_session and swarm_session.tokens + input_len + max_new_tokens > SESSION_MAX_LENGTH:
+        _close_session(session_id)
+        return None, f"Session {session_id} would exceed {SESSION_MAX_LENGTH} tokens; start a new session"
+
+    return {
+        "model": model,
+        "tokenizer": tokenizer,
+        "session": swarm_session,
+        "resumed": resumed,
+        "input_ids": input_ids,
+        "input_len": input_len,
+        "max_new_tokens": max_new_tokens,
+    }, None
+
+
+def _finish(job, model_name, session_id, response_text, tokens_generated, start_time):
+    """Update stats and the session for a completed generation; returns the result dict."""
+    latency_ms = int((time.time() - start_time) * 1000)
+
+    # Update stats
+    _query_stats["total_queries"] += 1
+    _query_stats["total_tokens"] += tokens_generated
+
+    # Contribution info — in single-node setup, the gateway itself served all blocks
+    # In multi-node, the engine routes internally but doesn't expose per-node stats easily
+    # The gateway reports its own contribution; individual nodes report via /contribute
+    node_id = get_node_id()
+
+    result = {
+        "success": True,
+        "response": response_text,
+        "model": model_name,
+        "tokens_generated": tokens_generated,
+        "prompt_tokens": job["input_len"],
+        "latency_ms": latency_ms,
+        "nodes_used": [node_id],
+        "total_blocks": 32,  # Llama 8B has 32 transformer blocks
+        "contributions": [{
+            "node_id": node_id,
+            "blocks_served": 32,
+            "latency_ms": latency_ms
+        }]
+    }
+
+    swarm_session = job["session"]
+    if swarm_session:
+        result["session"] = {
+            "id": session_id,
+            "resumed": job["resumed"],
+            "reused_tokens": swarm_session.tokens,
+            "prefill_tokens": job["input_len"]
+        }
+        swarm_session.tokens += job["input_len"] + tokens_generated
+        swarm_session.updated_at = time.time()
+
+    logger.info(f"Query completed: {tokens_generated} tokens in {latency_ms}ms")
+    return result
+
+
+def run_inference(prompt, model_name=None, max_tokens=500, temperature=0.7, session_id=None,
+                  history=None):
     """
     Run distributed inference through the swarm.
 
+    With *session_id*, the swarm session stays open between calls and the
+    prompt is only the new turn; if the session is gone (expired, gateway
+    restarted), *history* (the conversation so far) is prepended to rebuild it.
+
     Returns: {
         "success": True/False,
         "response": "generated text",
         "model": "model_name",
         "tokens_generated": 150,
+        "prompt_tokens": 42,
         "latency_ms": 3200,
         "nodes_used": ["node_abc"],
         "total_blocks": 32,
-        "contributions": [...]
+        "contributions": [...],
+        "batch_size": 4, "queue_ms": 12,                                  # without session_id
+        "session": {"id", "resumed", "reused_tokens", "prefill_tokens"}  # with session_id
     }
     """
     model_name = model_name or DEFAULT_MODEL
     start_time = time.time()
 
-    # Load model (cached after first call)
-    model_pair, error = load_model(model_name)
-    if error:
-        _query_stats["errors"] += 1
-        return {"success": False, "error": error}
-
-    model, tokenizer = model_pair
-
     try:
-        # Tokenize input
-        inputs = tokenizer(prompt, return_tensors="pt")
-        input_ids = inputs["input_ids"]
-        input_len = input_ids.shape[1]
+        job, error = _prepare(prompt, model_name, max_tokens, session_id, history)
+        if error:
+            _query_stats["errors"] += 1
+            return {"success": False, "error": error}
 
         # Generate through distributed swarm
-        # Each token passes through ALL layers, distributed across nodes
-        outputs = model.generate(
-            input_ids,
-            max_new_tokens=min(max_tokens, MAX_MAX_TOKENS),
-            temperature=temperature,
-            do_sample=temperature > 0,
-            top_p=0.9 if temperature > 0 else 1.0
-        )
+        # Each token passes through ALL layers, distributed across nodes.
+        # In a session only the new tokens are sent; earlier turns stay cached on the servers.
+        # Stateless prompts go through the batching scheduler and share generate calls.
+        model, tokenizer, swarm_session = job["model"], job["tokenizer"], job["session"]
+        batch_info = None
+        if swarm_session:
+            with swarm_session.lock:
+                outputs = model.generate(
+                    job["input_ids"],
+                    max_new_tokens=job["max_new_tokens"],
+                    session=swarm_session.session,
+                    **_sampling(temperature)
+                )
+            # Decode only the generated tokens (not the input)
+            generated_ids = outputs[0][job["input_len"]:]
+        else:
+            generated_ids, batch_info = _scheduler.generate(
+                model_name, model, tokenizer, job["input_ids"][0].tolist(), job["max_new_tokens"], temperature)
 
-        # Decode only the generated tokens (not the input)
-        generated_ids = outputs[0][input_len:]
         response_text = tokenizer.decode(generated_ids, skip_special_tokens=True)
-        tokens_generated = len(generated_ids)
+        result = _finish(job, model_name, session_id, response_text, len(generated_ids), start_time)
+        if batch_info:
+            result.update(batch_info)
+        return result
 
+    except Exception as e:
+        if session_id:
+            _close_session(session_id)  # session state is unknown after a failure
+        _query_stats["errors"] += 1
         latency_ms = int((time.time() - start_time) * 1000)
+        logger.error(f"Inference error: {e}")
+        return {
+            "success": False,
+            "error": f"Inference failed: {e}",
+            "latency_ms": latency_ms
+        }
 
-        # Update stats
-        _query_stats["total_queries"] += 1
-        _query_stats["total_tokens"] += tokens_generated
 
-        # Contribution info — in single-node setup, the gateway itself served all blocks
-        # In multi-node, the engine routes internally but doesn't expose per-node stats easily
-        # The gateway reports its own contribution; individual nodes report via /contribute
-        node_id = get_node_id()
+def stream_inference(prompt, model_name=None, max_tokens=500, temperature=0.7, session_id=None,
+                     history=None, cancel_event=None):
+    """
+    Generator form of run_inference(): yields {"token": "..."} as text is
+    decoded, then exactly one final event — run_inference()'s result plus
+    "done": True and "ttft_ms" (or {"done": True, "success": False, "error"}).
+
+    Generation runs in a worker thread feeding a TextIteratorStreamer; it
+    stops at the next token once *cancel_event* is set or this generator is
+    closed (the client went away). Streams are not batched: the streamer
+    follows a single sequence.
+    """
+    model_name = model_name or DEFAULT_MODEL
+    cancel_event = cancel_event or threading.Event()
+    start_time = time.time()
 
-        result = {
-            "success": True,
-            "response": response_text,
-            "model": model_name,
-            "tokens_generated": tokens_generated,
-            "latency_ms": latency_ms,
-            "nodes_used": [node_id],
-            "total_blocks": 32,  # Llama 8B has 32 transformer blocks
-            "contributions": [{
-                "node_id": node_id,
-                "blocks_served": 32,
-                "latency_ms": latency_ms
-            }]
-        }
+    try:
+        from transformers import TextIteratorStreamer, StoppingCriteria, StoppingCriteriaList
 
-        logger.info(f"Query completed: {tokens_generated} tokens in {latency_ms}ms")
-        return result
+        job, error = _prepare(prompt, model_name, max_tokens, session_id, history)
+    except Exception as e:
+        if session_id:
+            _close_session(session_id)
+        job, error = None, f"Inference failed: {e}"
+    if error:
+        _query_stats["errors"] += 1
+        yield {"done": True, "success": False, "error": error}
+        return
+
+    class Cancelled(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return cancel_event.is_set()
+
+    tokenizer, swarm_session = job["tokenizer"], job["session"]
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+    outcome = {}
+
+    def generate():
+        kwargs = {"session": swarm_session.session} if swarm_session else {}
+        try:
+            if swarm_session:
+                swarm_session.lock.acquire()
+            try:
+                outcome["outputs"] = job["model"].generate(
+                    job["input_ids"],
+                    max_new_tokens=job["max_new_tokens"],
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([Cancelled()]),
+                    **_sampling(temperature),
+                    **kwargs
+                )
+            finally:
+                if swarm_session:
+                    swarm_session.lock.release()
+        except Exception as e:
+            outcome["error"] = e
+            streamer.end()  # unblock the consumer
+        if (cancel_event.is_set() or "error" in outcome) and session_id:
+            _close_session(session_id)  # partial turn: session state no longer matches the caller's
+
+    worker = threading.Thread(target=generate, name="stream-generate", daemon=True)
+    worker.start()
+
+    first_token_at = None
+    parts = []
+    try:
+        for text in streamer:
+            if text:
+                if first_token_at is None:
+                    first_token_at = time.time()
+                parts.append(text)
+                yield {"token": text}
+    finally:
+        if worker.is_alive():
+            cancel_event.set()  # closed early: stop generating at the next token
+    worker.join()
+
+    if "error" in outcome:
+        _query_stats["errors"] += 1
+        logger.error(f"Inference error: {outcome['error']}")
+        yield {"done": True, "success": False, "error": f"Inference failed: {outcome['error']}",
+               "latency_ms": int((time.time() - start_time) * 1000)}
+        return
+
+    tokens_generated = outcome["outputs"].shape[1] - job["input_len"]
+    result = _finish(job, model_name, session_id, "".join(parts), tokens_generated, start_time)
+    result["done"] = True
+    result["ttft_ms"] = int((first_token_at - start_time) * 1000) if first_token_at else None
+    yield result
+
+
+def load_embedder(model_name):
+    """Load an encoder model + tokenizer for embeddings (cached)."""
+    with _models_lock:
+        if model_name in _embedders:
+            return _embedders[model_name], None
 
+    logger.info(f"Loading embedding model: {model_name}")
+    try:
+        import torch
+        from transformers import AutoTokenizer, AutoModel
+
+        tokenizer = AutoTokenizer.from_pretrained(model_name)
+        model = AutoModel.from_pretrained(model_name)
+        if torch.cuda.is_available():
+            model = model.to("cuda")
+        model.eval()
+
+        with _models_lock:
+            _embedders[model_name] = (model, tokenizer)
+        return (model, tokenizer), None
+
+    except ImportError:
+        err = "Embeddings need torch + transformers. Run: pip install torch transformers"
+        logger.error(err)
+        return None, err
     except Exception as e:
+        err = f"Failed to load embedding model {model_name}: {e}"
+        logger.error(err)
+        return None, err
+
+
+def run_embed(texts, model_name=None):
+    """
+    Embed *texts*: mean-pooled, L2-normalised last hidden states.
+    Texts are sorted by length so each padded batch wastes little compute;
+    the result keeps the input order.
+
+    Returns: {"success": True, "embeddings": [[...], ...], "model": ..., "dims": 384}
+    """
+    model_name = model_name or EMBED_MODEL
+    start_time = time.time()
+    pair, error = load_embedder(model_name)
+    if error:
         _query_stats["errors"] += 1
+        return {"success": False, "error": error}
+    model, tokenizer = pair
+
+    try:
+        import torch
+
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        with torch.no_grad():
+            for start in range(0, len(order), EMBED_BATCH):
+                indices = order[start:start + EMBED_BATCH]
+                batch = tokenizer([texts[i] for i in indices], padding=True, truncation=True,
+                                  return_tensors="pt").to(model.device)
+                hidden = model(**batch).last_hidden_state
+                mask = batch["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+                pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+                pooled = torch.nn.functional.normalize(pooled, dim=1)
+                for i, vector in zip(indices, pooled.float().cpu().tolist()):
+                    vectors[i] = vector
+
+        _query_stats["total_queries"] += 1
         latency_ms = int((time.time() - start_time) * 1000)
-        logger.error(f"Inference error: {e}")
+        logger.info(f"Embedded {len(texts)} texts in {latency_ms}ms")
         return {
-            "success": False,
-            "error": f"Inference failed: {e}",
+            "success": True,
+            "embeddings": vectors,
+            "model": model_name,
+            "dims": len(vectors[0]) if vectors else 0,
             "latency_ms": latency_ms
         }
 
+    except Exception as e:
+        _query_stats["errors"] += 1
+        logger.error(f"Embedding error: {e}")
+        return {"success": False, "error": f"Embedding failed: {e}"}
+
+
+# =============================================================================
+# REQUEST TRACKING (graceful drain)
+# =============================================================================
+
+_inflight = 0
+_inflight_lock = threading.Lock()
+_last_request_at = 0.0      # monotonic time any request (refused ones too) was last seen
+_draining = threading.Event()
+_server = None              # the waitress server, when serving with waitress
+
+
+@app.before_request
+def _track_request():
+    """Count in-flight requests; refuse new work while draining."""
+    global _inflight, _last_request_at
+    _last_request_at = time.monotonic()
+    if _draining.is_set() and request.path != "/health":
+        response = jsonify({"success": False, "error": "Gateway is restarting, retry shortly"})
+        response.headers["Retry-After"] = "5"
+        return response, 503
+    with _inflight_lock:
+        _inflight += 1
+    g.tracked = True
+
+
+@app.teardown_request
+def _untrack_request(exc):
+    global _inflight
+    if g.pop("tracked", False):
+        with _inflight_lock:
+            _inflight -= 1
+
+
+@app.errorhandler(413)
+def too_large(e):
+    return jsonify({"success": False, "error": f"Request body over {MAX_BODY_MB:g} MB"}), 413
+
 
 # =============================================================================
 # ENDPOINTS
 # =============================================================================
 
+def _inference_args():
+    """Validated run_inference() keyword arguments from the request body, or an error response."""
+    data = request.get_json()
+    if not data:
+        return None, (jsonify({"success": False, "error": "Request body required"}), 400)
+
+    prompt = data.get("prompt", "").strip()
+    if not prompt:
+        return None, (jsonify({"success": False, "error": "prompt required"}), 400)
+    history = data.get("history")
+    if history is not None and not isinstance(history, str):
+        return None, (jsonify({"success": False, "error": "history must be a string"}), 400)
+
+    return {
+        "prompt": prompt,
+        "model_name": data.get("model") or DEFAULT_MODEL,
+        "max_tokens": min(data.get("max_tokens", DEFAULT_MAX_TOKENS), MAX_MAX_TOKENS),
+        "temperature": data.get("temperature", DEFAULT_TEMPERATURE),
+        "session_id": data.get("session_id"),
+        "history": history,
+    }, None
+
+
+def _busy(status, error):
+    """429/503 telling the caller when to retry (or to fail over now)."""
+    retry_after = _admission.retry_after()
+    response = jsonify({"success": False, "error": error, "retry_after": retry_after, **_admission.depth()})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, status
+
+
+def _admit():
+    """Admission for the current request: (ticket, None) or (None, error response)."""
+    data = request.get_json()
+    priority = data.get("priority") or "normal"
+    if priority not in PRIORITIES:
+        return None, (jsonify({"success": False, "error": f"priority must be one of {list(PRIORITIES)}"}), 400)
+    timeout = QUEUE_TIMEOUT
+    if data.get("max_queue_ms") is not None:
+        try:
+            timeout = min(timeout, max(0.0, float(data["max_queue_ms"]) / 1000))
+        except (TypeError, ValueError):
+            return None, (jsonify({"success": False, "error": "max_queue_ms must be a number"}), 400)
+
+    ticket, refused = _admission.admit(priority, timeout)
+    if refused == "full":
+        return None, _busy(429, f"Gateway saturated: {priority} queue is full")
+    if refused == "expired":
+        return None, _busy(503, f"No inference slot within {timeout:g}s")
+    return ticket, None
+
+
 @app.route('/inference', methods=['POST'])
 def inference_endpoint():
     """Run distributed inference. Called by Railway API."""
+    kwargs, error_response = _inference_args()
+    if error_response:
+        return error_response
+    ticket, error_response = _admit()
+    if error_response:
+        return error_response
+
+    try:
+        result = run_inference(**kwargs)
+    finally:
+        _admission.release(ticket)
+
+    status_code = 200 if result.get("success") else 500
+    return jsonify(result), status_code
+
+
+@app.route('/inference/stream', methods=['POST'])
+def inference_stream_endpoint():
+    """
+    Run distributed inference, streaming server-sent events:
+        data: {"token": "..."}                                  (as generated)
+        data: {"done": true, "success": true, "response": ..., "tokens_generated": ...,
+               "prompt_tokens": ..., "ttft_ms": ..., "latency_ms": ...}
+    Generation stops if the client disconnects.
+    """
+    kwargs, error_response = _inference_args()
+    if error_response:
+        return error_response
+    ticket, error_response = _admit()
+    if error_response:
+        return error_response
+
+    def events():
+        stream = stream_inference(**kwargs)
+        try:
+            for event in stream:
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            stream.close()  # on disconnect the server closes us; stop generation
+
+    response = Response(stream_with_context(events()), mimetype="text/event-stream",
+                        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    response.call_on_close(lambda: _admission.release(ticket))  # runs even if the stream never started
+    return response
+
+
+@app.route('/embed', methods=['POST'])
+def embed_endpoint():
+    """Embed a batch of texts."""
     data = request.get_json()
     if not data:
         return jsonify({"success": False, "error": "Request body required"}), 400
 
-    prompt = data.get("prompt", "").strip()
-    if not prompt:
-        return jsonify({"success": False, "error": "prompt required"}), 400
+    texts = data.get("texts")
+    if not texts or not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return jsonify({"success": False, "error": "texts must be a non-empty list of strings"}), 400
+    if len(texts) > MAX_EMBED_TEXTS:
+        return jsonify({"success": False, "error": f"At most {MAX_EMBED_TEXTS} texts per request"}), 400
 
-    model = data.get("model") or DEFAULT_MODEL
-    max_tokens = min(data.get("max_tokens", DEFAULT_MAX_TOKENS), MAX_MAX_TOKENS)
-    temperature = data.get("temperature", DEFAULT_TEMPERATURE)
-
-    result = run_inference(prompt, model_name=model, max_tokens=max_tokens, temperature=temperature)
+    result = run_embed(texts, model_name=data.get("model") or EMBED_MODEL)
 
     status_code = 200 if result.get("success") else 500
     return jsonify(result), status_code
@@ -279,8 +1063,11 @@ def swarm_endpoint():
             "total_queries": _query_stats["total_queries"],
             "total_tokens": _query_stats["total_tokens"],
             "errors": _query_stats["errors"],
+            "open_sessions": len(_sessions),
             "uptime_seconds": uptime
         },
+        "batching": _scheduler.stats(),
+        "admission": _admission.stats(),
         "swarm_peers": swarm_nodes,
         "timestamp": datetime.utcnow().isoformat() + "Z"
     }), 200
@@ -314,15 +1101,18 @@ def models_endpoint():
 
 @app.route('/health', methods=['GET'])
 def health_endpoint():
-    """Gateway health check."""
+    """Gateway health check (503 while draining, so load balancers move away)."""
+    draining = _draining.is_set()
     return jsonify({
-        "status": "ok",
+        "status": "draining" if draining else "ok",
         "gateway": "WSI Inference Gateway",
         "version": "1.0.0",
         "node_id": get_node_id(),
         "models_loaded": len(_models),
+        "in_flight": _inflight,
+        **_admission.depth(),
         "uptime_seconds": int(time.time() - _query_stats["start_time"])
-    }), 200
+    }), 503 if draining else 200
 
 
 # =============================================================================
@@ -339,11 +1129,99 @@ def preload_model():
         logger.info(f"Default model ready: {DEFAULT_MODEL}")
 
 
+def _queued_in_server():
+    """Requests accepted by waitress but not yet picked up by a worker thread."""
+    dispatcher = getattr(_server, "task_dispatcher", None)
+    return len(getattr(dispatcher, "queue", ()))
+
+
+def drain_and_exit(reload=False, timeout=DRAIN_TIMEOUT, grace=DRAIN_GRACE):
+    """
+    Stop taking requests, let in-flight ones finish, then exit (or re-exec when
+    *reload*). Requests still queued in the server are answered 503 first: the
+    drain only completes once nothing is in flight or queued and no request
+    has arrived for *grace* seconds.
+    """
+    _draining.set()
+    logger.info(f"Draining {_inflight} in-flight requests before {'reload' if reload else 'shutdown'}")
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with _inflight_lock:
+            idle = not _inflight and time.monotonic() - _last_request_at >= grace
+        if idle and not _queued_in_server():
+            break
+        time.sleep(0.1)
+    else:
+        logger.warning(f"Drain timed out after {timeout}s with {_inflight} requests in flight "
+                       f"and {_queued_in_server()} queued")
+
+    for session_id in list(_sessions):
+        _close_session(session_id)
+    if reload:
+        logger.info("Reloading gateway")
+        # Release the listener first: Flask's dev server marks it inheritable,
+        # so the new process could not bind the port while it stays open
+        os.closerange(3, 65536)
+        os.execv(sys.executable, [sys.executable] + sys.argv)
+    os._exit(0)
+
+
+def install_signal_handlers():
+    """SIGTERM drains and exits; SIGHUP drains and reloads (where the platform has it)."""
+    def handler(signum, frame):
+        if not _draining.is_set():
+            reload = hasattr(signal, "SIGHUP") and signum == signal.SIGHUP
+            threading.Thread(target=drain_and_exit, args=(reload,), name="drain", daemon=True).start()
+
+    signal.signal(signal.SIGTERM, handler)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, handler)
+
+
+def serve(host, port, server=SERVER, threads=SERVER_THREADS, connection_limit=CONNECTION_LIMIT):
+    """Serve the app with waitress, or Flask's threaded dev server if unavailable / asked for."""
+    if server == "waitress":
+        required = _admission.max_active + _admission.max_queue * len(_admission.priorities) + SERVER_HEADROOM
+        if threads < required:
+            raise SystemExit(f"--threads {threads} is too few for admission control: need at least {required} "
+                             f"(WSI_MAX_ACTIVE + {len(_admission.priorities)} x WSI_MAX_QUEUE + {SERVER_HEADROOM}); "
+                             f"raise the threads or lower those limits")
+        if connection_limit < threads:
+            raise SystemExit(f"--connection-limit {connection_limit} is below --threads {threads}")
+    install_signal_handlers()
+    if server == "waitress":
+        try:
+            from waitress import create_server
+        except ImportError:
+            logger.warning("waitress not installed (pip install waitress); using Flask's development server")
+        else:
+            global _server
+            _server = create_server(
+                app,
+                host=host,
+                port=port,
+                threads=threads,
+                connection_limit=connection_limit,
+                channel_timeout=KEEPALIVE_TIMEOUT,
+                max_request_body_size=app.config["MAX_CONTENT_LENGTH"],
+                ident="WSI-Gateway",
+            )
+            _server.run()
+            return
+    app.run(host=host, port=port, debug=False, threaded=True)
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="WSI Inference Gateway")
     parser.add_argument("--host", default="0.0.0.0", help="Bind address (default: 0.0.0.0)")
     parser.add_argument("--port", type=int, default=8090, help="Port (default: 8090)")
     parser.add_argument("--no-preload", action="store_true", help="Don't preload model on startup")
+    parser.add_argument("--server", choices=["waitress", "flask"], default=SERVER,
+                        help=f"HTTP server (default: {SERVER})")
+    parser.add_argument("--threads", type=int, default=SERVER_THREADS,
+                        help=f"Worker threads (default: {SERVER_THREADS})")
+    parser.add_argument("--connection-limit", type=int, default=CONNECTION_LIMIT,
+                        help=f"Max open connections (default: {CONNECTION_LIMIT})")
     args = parser.parse_args()
 
     print("=" * 60)
@@ -352,6 +1230,7 @@ if __name__ == "__main__":
     print(f"  Listening: {args.host}:{args.port}")
     print(f"  Node ID: {get_node_id()}")
     print(f"  Auth: {'enabled' if GATEWAY_KEY else 'disabled'}")
+    print(f"  Server: {args.server} ({args.threads} threads, {args.connection_limit} connections)")
     print("=" * 60)
 
     # Preload model in background (so first query doesn't wait)
@@ -359,4 +1238,5 @@ if __name__ == "__main__":
         preload_thread = threading.Thread(target=preload_model, daemon=True)
         preload_thread.start()
 
-    app.run(host=args.host, port=args.port, debug=False)
+    serve(args.host, args.port, server=args.server, threads=args.threads,
+          connection_limit=args.connection_limit)
@@ -0,0 +1,231 @@
+"""
+WattNode Inference Router
+Latency-aware backend selection with optional hedged requests.
+
+For every (backend, model) pair the router keeps a rolling window of recent
+outcomes: time to first token, decode rate and success/failure. A request
+goes to the backend with the lowest expected completion time:
+
+    expected = p50(ttft) + max_tokens / p50(tokens_per_second)
+    score    = expected / (1 - error_rate)     # failures cost a retry
+
+Pairs with fewer than MIN_SAMPLES observations score 0 so they get measured;
+ties keep the caller's preference order.
+
+Hedging: if the chosen backend has not produced its first token after
+*hedge_after* seconds, the next backend is started as well. Whichever streams
+a token first wins and the other request is cancelled. A backend that fails
+before its first token hands over to the next one immediately.
+
+Usage (see services.inference.generate_stream for the real wiring):
+    router = Router()
+    ranked = router.rank([("ollama", o), ("distributed", d)], model, max_tokens)
+    for event in router.stream(ranked, model, make_stream, hedge_after=2.0):
+        ...
+"""
+
+import time
+import queue
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger("wattnode.inference_router")
+
+WINDOW = 100                # outcomes kept per (backend, model)
+MIN_SAMPLES = 5             # below this a pair is explored rather than scored
+DEFAULT_TPS = 20.0          # assumed decode rate when a pair has no rate samples
+MAX_ERROR_RATE = 0.95       # caps the retry penalty so scores stay finite
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))]
+
+
+class RollingStats:
+    """Recent latency/outcome window for one (backend, model) pair."""
+
+    def __init__(self, window=WINDOW):
+        self.ttft = deque(maxlen=window)        # seconds
+        self.tps = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)    # True = success
+
+    def observe(self, ok, ttft=None, tps=None):
+        self.outcomes.append(ok)
+        if ok and ttft is not None:
+            self.ttft.append(ttft)
+        if ok and tps:
+            self.tps.append(tps)
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def expected_seconds(self, max_tokens):
+        ttft = _percentile(self.ttft, 50) or 0.0
+        tps = _percentile(self.tps, 50) or DEFAULT_TPS
+        return ttft + max_tokens / tps
+
+    def to_dict(self):
+        def ms(value):
+            return int(value * 1000) if value is not None else None
+        return {
+            "samples": len(self.outcomes),
+            "error_rate": round(self.error_rate(), 3),
+            "ttft_p50_ms": ms(_percentile(self.ttft, 50)),
+            "ttft_p95_ms": ms(_percentile(self.ttft, 95)),
+            "tps_p50": _percentile(self.tps, 50),
+        }
+
+
+class Router:
+    """Ranks backends per model by rolling latency/error stats and runs hedged streams. Thread-safe."""
+
+    def __init__(self, window=WINDOW, min_samples=MIN_SAMPLES):
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._stats = {}        # (backend name, model) -> RollingStats
+        self._counters = {"requests": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0}
+
+    def _pair(self, name, model):
+        key = (name, model)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = RollingStats(self.window)
+        return stats
+
+    def observe(self, name, model, event):
+        """Record the final event of a request to backend *name* (cancelled runs are ignored)."""
+        if event.get("cancelled"):
+            return
+        ttft_ms = event.get("ttft_ms")
+        with self._lock:
+            self._pair(name, model).observe(
+                bool(event.get("success")),
+                ttft=ttft_ms / 1000.0 if ttft_ms is not None else None,
+                tps=event.get("tokens_per_second"),
+            )
+
+    def score(self, name, model, max_tokens):
+        with self._lock:
+            stats = self._pair(name, model)
+            if len(stats.outcomes) < self.min_samples:
+                return 0.0
+            error_rate = min(stats.error_rate(), MAX_ERROR_RATE)
+            return stats.expected_seconds(max_tokens) / (1.0 - error_rate)
+
+    def rank(self, candidates, model, max_tokens):
+        """Order (name, backend) *candidates* by score; ties keep the given order."""
+        scored = [(self.score(name, model, max_tokens), i, (name, backend))
+                  for i, (name, backend) in enumerate(candidates)]
+        return [candidate for _, _, candidate in sorted(scored)]
+
+    def hedge_delay(self, name, model):
+        """p95 time to first token for the pair (a natural hedge threshold), or None."""
+        with self._lock:
+            stats = self._pair(name, model)
+            if len(stats.ttft) < self.min_samples:
+                return None
+            return _percentile(stats.ttft, 95)
+
+    def stream(self, candidates, model, make_stream, hedge_after=None):
+        """
+        Stream from ranked *candidates*, failing over and optionally hedging.
+
+        make_stream(backend, cancel_event) must return a generate_stream()
+        style generator. Yields the winning backend's events.
+        """
+        with self._lock:
+            self._counters["requests"] += 1
+        events = queue.Queue()
+        cancels = []
+        running = set()
+        next_index = 0
+
+        def pump(index, name, backend, cancel_event):
+            try:
+                for event in make_stream(backend, cancel_event):
+                    if event.get("done"):
+                        self.observe(name, model, event)
+                    events.put((index, event))
+            except Exception as e:
+                events.put((index, {"done": True, "success": False, "error": str(e)}))
+
+        def start():
+            nonlocal next_index
+            index = next_index
+            next_index += 1
+            name, backend = candidates[index]
+            cancel_event = threading.Event()
+            cancels.append(cancel_event)
+            running.add(index)
+            threading.Thread(target=pump, args=(index, name, backend, cancel_event),
+                             name=f"router-{name}", daemon=True).start()
+
+        winner = None
+        last_failure = None
+        hedge_at = None
+        try:
+            start()
+            if hedge_after is not None and len(candidates) > 1:
+                hedge_at = time.monotonic() + hedge_after
+            while True:
+                timeout = None
+                if winner is None and hedge_at is not None and next_index < len(candidates):
+                    timeout = max(0.0, hedge_at - time.monotonic())
+                try:
+                    index, event = events.get(timeout=timeout)
+                except queue.Empty:
+                    logger.info(f"hedging: no first token after {hedge_after:.2f}s, "
+                                f"starting {candidates[next_index][0]}")
+                    with self._lock:
+                        self._counters["hedged"] += 1
+                    start()
+                    hedge_at = None
+                    continue
+
+                if winner is None:
+                    if "token" in event or (event.get("done") and event.get("success")):
+                        winner = index
+                        if index > min(running):     # the hedge beat a still-running primary
+                            with self._lock:
+                                self._counters["hedge_wins"] += 1
+                        for i, cancel_event in enumerate(cancels):
+                            if i != index:
+                                cancel_event.set()
+                    elif event.get("done"):
+                        running.discard(index)
+                        last_failure = event
+                        if running:
+                            continue
+                        if next_index < len(candidates):
+                            logger.warning(f"{candidates[index][0]} failed: {event.get('error')} — "
+                                           f"failing over to {candidates[next_index][0]}")
+                            with self._lock:
+                                self._counters["failovers"] += 1
+                            start()
+                            hedge_at = None
+                            continue
+                        yield last_failure
+                        return
+                    else:
+                        continue
+
+                if index != winner:
+                    continue
+                yield event
+                if event.get("done"):
+                    return
+        finally:
+            for cancel_event in cancels:
+                cancel_event.set()
+
+    def stats(self):
+        with self._lock:
+            pairs = {f"{name} {model}": stats.to_dict() for (name, model), stats in self._stats.items()}
+            return dict(self._counters, backends=pairs)
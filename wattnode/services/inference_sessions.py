@@ -0,0 +1,144 @@
+"""
+WattNode Inference Sessions
+Multi-turn inference that only prefills the new turn.
+
+Chat-style jobs used to resend and re-process the whole conversation every
+turn. With a session_id, the node keeps the backend's state between turns:
+
+- Ollama: the `context` token array returned with each answer is sent back
+  with the next prompt, so Ollama reuses the prefix instead of re-tokenizing
+  and re-evaluating the conversation. The session stays on the same Ollama
+  instance so its KV cache is reused too.
+- Gateway: the gateway keeps a swarm inference session per session_id (see
+  inference_gateway.py); the node only remembers which gateway owns it.
+
+Sessions expire after *ttl* seconds idle and are evicted least recently used
+beyond *max_sessions* / *max_bytes*. A turn whose session is gone (expired,
+or the previous turn ran on another node) reports "resumed": False; callers
+can pass the conversation so far as *history* to rebuild it.
+
+Every session turn's final event carries:
+    "session": {"id", "turn", "resumed", "reused_tokens", "prefill_tokens",
+                "saved_tokens"}
+where reused_tokens is the prefix this turn did not re-process, and
+saved_tokens the running total for the session.
+
+Usage:
+    from services.inference_sessions import SessionStore
+    from services.inference import set_session_store, generate
+    set_session_store(SessionStore())
+    generate("Hi, I'm Ana.", session_id="chat-1")
+    generate("What's my name?", session_id="chat-1")
+"""
+
+import time
+import threading
+from array import array
+from collections import OrderedDict
+
+DEFAULT_MAX_SESSIONS = 256
+DEFAULT_MAX_MB = 64
+DEFAULT_TTL = 1800          # seconds idle
+SESSION_OVERHEAD = 256      # bytes charged per session besides its context
+
+
+class _Session:
+    __slots__ = ("backend", "model", "instance", "context", "turns", "saved_tokens", "updated_at")
+
+    def __init__(self, backend, model, instance):
+        self.backend = backend
+        self.model = model
+        self.instance = instance
+        self.context = array("I")   # token ids, 4 bytes each
+        self.turns = 0
+        self.saved_tokens = 0
+        self.updated_at = 0.0
+
+    @property
+    def size(self):
+        return SESSION_OVERHEAD + self.context.itemsize * len(self.context)
+
+
+class SessionStore:
+    """Per-session backend state with idle TTL and LRU limits. Thread-safe."""
+
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS, max_bytes=DEFAULT_MAX_MB * 1024 * 1024,
+                 ttl=DEFAULT_TTL, clock=time.monotonic):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()  # session_id -> _Session
+        self._bytes = 0
+        self._stats = {"turns": 0, "resumed_turns": 0, "reused_tokens": 0, "prefill_tokens": 0,
+                       "expired": 0, "evicted": 0}
+
+    def _pop(self, session_id):
+        session = self._sessions.pop(session_id)
+        self._bytes -= session.size
+        return session
+
+    def get(self, session_id):
+        """{"backend", "model", "instance", "context", "turns"} for a live session, or None."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if self.ttl is not None and self._clock() - session.updated_at > self.ttl:
+                self._pop(session_id)
+                self._stats["expired"] += 1
+                return None
+            return {
+                "backend": session.backend,
+                "model": session.model,
+                "instance": session.instance,
+                "context": session.context.tolist(),
+                "turns": session.turns,
+            }
+
+    def record(self, session_id, backend, model, instance, context=None, resumed=False,
+               reused_tokens=0, prefill_tokens=None):
+        """Store the state after a successful turn; returns the turn's "session" report."""
+        with self._lock:
+            session = self._sessions.get(session_id) if resumed else None
+            if session is None:
+                if session_id in self._sessions:
+                    self._pop(session_id)
+                session = _Session(backend, model, instance)
+            else:
+                self._pop(session_id)
+            if context is not None:
+                session.context = array("I", context)
+            session.turns += 1
+            session.saved_tokens += reused_tokens
+            session.updated_at = self._clock()
+            self._sessions[session_id] = session
+            self._bytes += session.size
+
+            self._stats["turns"] += 1
+            self._stats["resumed_turns"] += resumed
+            self._stats["reused_tokens"] += reused_tokens
+            self._stats["prefill_tokens"] += prefill_tokens or 0
+            while len(self._sessions) > 1 and (
+                    len(self._sessions) > self.max_sessions or self._bytes > self.max_bytes):
+                self._pop(next(iter(self._sessions)))
+                self._stats["evicted"] += 1
+
+            return {
+                "id": session_id,
+                "turn": session.turns,
+                "resumed": resumed,
+                "reused_tokens": reused_tokens,
+                "prefill_tokens": prefill_tokens,
+                "saved_tokens": session.saved_tokens,
+            }
+
+    def drop(self, session_id):
+        with self._lock:
+            if session_id in self._sessions:
+                self._pop(session_id)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, sessions=len(self._sessions), bytes=self._bytes)
@@ -0,0 +1,169 @@
+"""
+WattNode Inference Telemetry
+Rolling latency/throughput histograms per (backend, model).
+
+For every completed request the node records:
+    prompt_eval_ms   prefill time (Ollama's prompt_eval_duration)
+    ttft_ms          time to first token, measured by the node
+    decode_tps       decode tokens per second
+    latency_ms       total request time, measured by the node
+plus prompt/completion token totals and error counts.
+
+Histograms use fixed buckets and cover the last WINDOW_SECONDS, kept as
+SLICES sub-windows that age out one at a time, so the numbers track
+current hardware load rather than the whole uptime. Snapshots report
+count, mean, p50/p95/p99 (bucket upper bounds) and per-bucket counts,
+ready for the heartbeat.
+
+Model names come from jobs, so at most MAX_SERIES series are kept; requests
+for models seen after that are counted under "<backend> other".
+
+Usage:
+    from services.inference_telemetry import Telemetry
+    telemetry = Telemetry()
+    telemetry.observe(final_event)
+    telemetry.snapshot()   # {"ollama llama2": {"ttft_ms": {...}, ...}}
+"""
+
+import time
+import threading
+from collections import deque
+
+WINDOW_SECONDS = 600
+SLICES = 10
+MAX_SERIES = 32         # (backend, model) series before new models fold into OTHER_MODEL
+OTHER_MODEL = "other"
+
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000, 120000)
+RATE_BUCKETS = (1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 250, 500)
+
+METRICS = {
+    "prompt_eval_ms": LATENCY_BUCKETS_MS,
+    "ttft_ms": LATENCY_BUCKETS_MS,
+    "decode_tps": RATE_BUCKETS,
+    "latency_ms": LATENCY_BUCKETS_MS,
+}
+
+
+class RollingHistogram:
+    """Bucketed histogram over a sliding time window. Not thread-safe (Telemetry locks)."""
+
+    def __init__(self, bounds, window=WINDOW_SECONDS, slices=SLICES, clock=time.monotonic):
+        self.bounds = tuple(bounds)
+        self.slice_seconds = window / slices
+        self.slices = slices
+        self._clock = clock
+        self._slices = deque()  # [start, counts, count, total, max]
+
+    def _current(self):
+        now = self._clock()
+        while self._slices and now - self._slices[0][0] >= self.slice_seconds * self.slices:
+            self._slices.popleft()
+        if not self._slices or now - self._slices[-1][0] >= self.slice_seconds:
+            self._slices.append([now, [0] * (len(self.bounds) + 1), 0, 0.0, 0.0])
+        return self._slices[-1]
+
+    def observe(self, value):
+        current = self._current()
+        index = next((i for i, bound in enumerate(self.bounds) if value <= bound), len(self.bounds))
+        current[1][index] += 1
+        current[2] += 1
+        current[3] += value
+        current[4] = max(current[4], value)
+
+    def snapshot(self):
+        self._current()
+        counts = [0] * (len(self.bounds) + 1)
+        count = 0
+        total = 0.0
+        peak = 0.0
+        for _, slice_counts, slice_count, slice_total, slice_max in self._slices:
+            counts = [a + b for a, b in zip(counts, slice_counts)]
+            count += slice_count
+            total += slice_total
+            peak = max(peak, slice_max)
+
+        def percentile(pct):
+            if not count:
+                return None
+            rank = pct / 100.0 * count
+            seen = 0
+            for i, n in enumerate(counts):
+                seen += n
+                if seen >= rank and n:
+                    return self.bounds[i] if i < len(self.bounds) else peak
+            return peak
+
+        buckets = {f"le_{bound}": n for bound, n in zip(self.bounds, counts)}
+        buckets["inf"] = counts[-1]
+        return {
+            "count": count,
+            "mean": round(total / count, 2) if count else None,
+            "p50": percentile(50),
+            "p95": percentile(95),
+            "p99": percentile(99),
+            "max": round(peak, 2) if count else None,
+            "buckets": buckets,
+        }
+
+
+class Telemetry:
+    """Per (backend, model) rolling histograms and token totals. Thread-safe."""
+
+    def __init__(self, window=WINDOW_SECONDS, slices=SLICES, max_series=MAX_SERIES, clock=time.monotonic):
+        self.window = window
+        self.slices = slices
+        self.max_series = max_series
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._series = {}   # (backend, model) -> {"histograms", "totals"}
+
+    def _get(self, backend, model):
+        key = (backend, model)
+        if key not in self._series and len(self._series) >= self.max_series:
+            key = (backend, OTHER_MODEL)
+        series = self._series.get(key)
+        if series is None:
+            series = self._series[key] = {
+                "histograms": {name: RollingHistogram(bounds, self.window, self.slices, self._clock)
+                               for name, bounds in METRICS.items()},
+                "totals": {"requests": 0, "errors": 0, "prompt_tokens": 0, "completion_tokens": 0},
+            }
+        return series
+
+    def observe(self, event, backend=None, model=None):
+        """Record a request's final event (cancelled requests are ignored)."""
+        if event.get("cancelled"):
+            return
+        backend = event.get("backend") or backend or "unknown"
+        model = event.get("model") or model or "unknown"
+        values = {
+            "prompt_eval_ms": event.get("prompt_eval_ms"),
+            "ttft_ms": event.get("ttft_ms"),
+            "decode_tps": event.get("tokens_per_second"),
+            "latency_ms": event.get("latency_ms"),
+        }
+        with self._lock:
+            series = self._get(backend, model)
+            totals = series["totals"]
+            totals["requests"] += 1
+            if not event.get("success"):
+                totals["errors"] += 1
+                return
+            totals["prompt_tokens"] += event.get("prompt_eval_count") or event.get("prompt_tokens") or 0
+            totals["completion_tokens"] += event.get("eval_count") or event.get("tokens_generated") or 0
+            for name, value in values.items():
+                if value is not None:
+                    series["histograms"][name].observe(value)
+
+    def snapshot(self):
+        """{"<backend> <model>": {metric: histogram snapshot, ..., "totals": {...}}}"""
+        with self._lock:
+            return {
+                f"{backend} {model}": dict(
+                    {name: histogram.snapshot() for name, histogram in series["histograms"].items()},
+                    totals=dict(series["totals"]),
+                    window_seconds=self.window,
+                )
+                for (backend, model), series in self._series.items()
+            }
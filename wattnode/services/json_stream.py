@@ -0,0 +1,448 @@
+"""
+WattNode Streaming JSON
+Incremental JSON validation and projection for large `json` scrapes.
+
+Bytes are fed as they arrive from the network. The document is validated
+token by token without building it; only the subtrees selected by JSON
+pointers (RFC 6901) are retained and materialized. The working buffer stays
+around one network chunk, so a 2 MB response that only needs one field
+never exists as a full bytearray/str/object graph.
+
+    parser = StreamingJSONParser(["/data/items/0", "/meta/total"])
+    for chunk in resp.iter_content(8192):
+        parser.feed(chunk)
+    parser.close()   # -> {"/data/items/0": {...}, "/meta/total": 1234}
+
+With no pointers the whole document is decoded incrementally and parsed once
+at close (no per-token work, just fewer intermediate copies).
+
+Selectors may be pointer strings ("/a/0/b") or path lists (["a", 0, "b"]).
+Selected paths that do not exist are omitted from the result.
+"""
+
+import re
+import json
+import codecs
+
+# =============================================================================
+# TOKENS
+# =============================================================================
+
+_WS = re.compile(r"[ \t\n\r]*")
+_STRING = re.compile(r'"(?:[^"\\\x00-\x1f]|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*"')
+_STRING_PARTIAL = re.compile(
+    r'"(?:[^"\\\x00-\x1f]|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*(?:\\(?:u[0-9a-fA-F]{0,3})?)?\Z')
+_NUMBER = re.compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?")
+_NUMBER_TAIL = re.compile(r"(?:\.|[eE][+-]?)\Z")    # number cut mid-fraction/exponent
+_LITERALS = {"t": "true", "f": "false", "n": "null"}
+
+# One token (after optional whitespace): 1=string 2=number 3=literal 4=punctuation.
+# Used by the fast loop that validates subtrees no selector can match.
+_TOKEN = re.compile(
+    r'[ \t\n\r]*(?:("(?:[^"\\\x00-\x1f]|\\["\\/bfnrt]|\\u[0-9a-fA-F]{4})*")'
+    r"|(-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)"
+    r"|(true|false|null)|([{}\[\],:]))")
+
+def _reject_constant(name):
+    raise ValueError(f"Invalid JSON constant: {name}")
+
+
+# C-speed validation of small untracked subtrees. Objects are built and
+# dropped immediately, bounded by the working buffer (~one network chunk).
+_raw_decode = json.JSONDecoder(parse_constant=_reject_constant).raw_decode
+_MISSING = object()
+
+# Parser states
+_VALUE = 0          # expecting any value
+_ARR_FIRST = 1      # just after '[': value or ']'
+_ARR_NEXT = 2       # after array element: ',' or ']'
+_OBJ_FIRST = 3      # just after '{': key or '}'
+_OBJ_KEY = 4        # after ',': key
+_OBJ_COLON = 5      # after key: ':'
+_OBJ_NEXT = 6       # after member value: ',' or '}'
+_DONE = 7           # top-level value complete: only whitespace allowed
+
+
+class JSONStreamError(ValueError):
+    """Raised when the stream is not valid JSON (or ends early)."""
+
+
+def parse_pointer(selector):
+    """
+    Convert a JSON pointer string or path list to a (pointer, segments) pair.
+    Segments are strings; array indices compare by their decimal form.
+    """
+    if isinstance(selector, (list, tuple)):
+        segments = tuple(str(s) for s in selector)
+        pointer = "".join("/" + s.replace("~", "~0").replace("/", "~1") for s in segments)
+        return pointer, segments
+    if not isinstance(selector, str):
+        raise ValueError(f"Invalid JSON selector: {selector!r}")
+    if selector == "":
+        return "", ()
+    if not selector.startswith("/"):
+        raise ValueError(f"JSON pointer must be empty or start with '/': {selector!r}")
+    segments = tuple(s.replace("~1", "/").replace("~0", "~") for s in selector[1:].split("/"))
+    return selector, segments
+
+
+class StreamingJSONParser:
+    """Incremental JSON validator with pointer projection. See module docstring."""
+
+    def __init__(self, selectors=None, encoding="utf-8"):
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._project = selectors is not None
+        self._targets = {}          # segments -> pointer string
+        self._prefixes = set()      # proper prefixes of target paths
+        if self._project:
+            for selector in selectors:
+                pointer, segments = parse_pointer(selector)
+                self._targets[segments] = pointer
+                for i in range(len(segments)):
+                    self._prefixes.add(segments[:i])
+
+        self._pieces = []           # non-projecting mode: decoded text
+        self._buf = ""
+        self._pos = 0
+        self._state = _VALUE
+        # Open containers (True = object). The first len(self._path) entries are
+        # "tracked": their children may match a selector, so keys/indices are
+        # kept in _path (and array positions in _indices). Deeper containers
+        # are only validated.
+        self._stack = []
+        self._path = []
+        self._indices = []
+        self._results = {}
+        # Active capture: [pointer, start offset in _buf, stack depth]; text
+        # already trimmed out of _buf is kept in _captured
+        self._capture = None
+        self._captured = []
+        self._fast_blocked = False  # a subtree in this buffer is incomplete
+        self.bytes_fed = 0
+
+    # -------------------------------------------------------------------------
+    # Public
+    # -------------------------------------------------------------------------
+
+    def feed(self, data):
+        """Feed the next chunk of raw bytes."""
+        self.bytes_fed += len(data)
+        text = self._decoder.decode(data)
+        if not self._project:
+            if text:
+                self._pieces.append(text)
+            return
+        if text:
+            self._append(text)
+            self._parse(final=False)
+
+    def close(self):
+        """
+        Finish the stream and return the result: the whole document when no
+        selectors were given, else {pointer: value} for the selectors found.
+        """
+        text = self._decoder.decode(b"", final=True)
+        if not self._project:
+            if text:
+                self._pieces.append(text)
+            try:
+                return json.loads("".join(self._pieces))
+            except ValueError as exc:
+                raise JSONStreamError(str(exc)) from exc
+            finally:
+                self._pieces = []
+        if text:
+            self._append(text)
+        self._parse(final=True)
+        if self._state != _DONE:
+            raise JSONStreamError("Unexpected end of JSON input")
+        self._resolve_nested()
+        return self._results
+
+    # -------------------------------------------------------------------------
+    # Internals
+    # -------------------------------------------------------------------------
+
+    def _append(self, text):
+        """Drop consumed input (keeping any capture text) and append *text*."""
+        cut = self._pos
+        if self._capture is not None:
+            start = self._capture[1]
+            if start < cut:
+                self._captured.append(self._buf[start:cut])
+            self._capture[1] = 0
+        self._buf = self._buf[cut:] + text
+        self._pos = 0
+        self._fast_blocked = False
+
+    def _resolve_nested(self):
+        """Fill selectors nested inside another captured selector (e.g. /a/b under /a)."""
+        # Shortest paths first so a resolved ancestor can serve deeper selectors
+        for segments in sorted(self._targets, key=len):
+            pointer = self._targets[segments]
+            if pointer in self._results:
+                continue
+            for i in range(len(segments) - 1, -1, -1):
+                ancestor = self._targets.get(segments[:i])
+                if ancestor is None or ancestor not in self._results:
+                    continue
+                value = self._results[ancestor]
+                for seg in segments[i:]:
+                    if isinstance(value, dict) and seg in value:
+                        value = value[seg]
+                    elif isinstance(value, list) and seg.isdigit() and int(seg) < len(value):
+                        value = value[int(seg)]
+                    else:
+                        break
+                else:
+                    self._results[pointer] = value
+                break
+
+    def _error(self, pos, message):
+        snippet = self._buf[pos:pos + 20]
+        raise JSONStreamError(f"{message} at byte ~{self.bytes_fed - len(self._buf) + pos}: {snippet!r}")
+
+    def _tracking(self):
+        return self._capture is None and len(self._stack) == len(self._path)
+
+    def _begin_value(self, pos):
+        """Called at the first character of every value."""
+        if self._tracking():
+            pointer = self._targets.get(tuple(self._path))
+            if pointer is not None:
+                self._capture = [pointer, pos, len(self._stack)]
+                self._captured = []
+
+    def _end_value(self, end, value=_MISSING):
+        """Called after every value (scalar or closed container)."""
+        capture = self._capture
+        if capture is not None and capture[2] == len(self._stack):
+            if value is _MISSING:
+                self._captured.append(self._buf[capture[1]:end])
+                value = json.loads("".join(self._captured))
+            self._captured = []
+            self._capture = None
+            self._results[capture[0]] = value
+        if not self._stack:
+            self._state = _DONE
+        else:
+            self._state = _OBJ_NEXT if self._stack[-1] else _ARR_NEXT
+
+    def _fast_value(self, buf, pos):
+        """
+        Validate (and return) the whole container starting at *pos* with the C
+        scanner. Returns (value, end) or None if it is not complete in *buf*.
+        """
+        if self._fast_blocked:
+            return None
+        try:
+            return _raw_decode(buf, pos)
+        except ValueError:
+            # Incomplete (or invalid): the token-level path decides which.
+            # Later containers in this buffer sit inside or after the broken
+            # one, so stop retrying until more data arrives.
+            self._fast_blocked = True
+            return None
+
+    def _open(self, is_obj):
+        if self._tracking() and tuple(self._path) in self._prefixes:
+            self._path.append("" if is_obj else "0")
+            self._indices.append(0)
+        self._stack.append(is_obj)
+        self._state = _OBJ_FIRST if is_obj else _ARR_FIRST
+
+    def _close(self, end):
+        self._stack.pop()
+        if len(self._path) > len(self._stack):
+            self._path.pop()
+            self._indices.pop()
+        self._end_value(end)
+
+    def _skip(self, buf, pos, final):
+        """
+        Fast path for untracked subtrees: validate tokens with a compact state
+        machine until the subtree closes back to a tracked level, the buffer
+        runs out, or something needs the full handler (partial token, error).
+        Returns the new position.
+        """
+        match = _TOKEN.match
+        n = len(buf)
+        stack = self._stack
+        base = len(self._path) + 1      # closing at this depth returns to tracked code
+        state = self._state
+
+        while True:
+            m = match(buf, pos)
+            if m is None:
+                break
+            kind = m.lastindex
+            end = m.end()
+            if kind == 4:
+                c = buf[end - 1]
+                if c == ",":
+                    if state == _ARR_NEXT:
+                        state = _VALUE
+                    elif state == _OBJ_NEXT:
+                        state = _OBJ_KEY
+                    else:
+                        break
+                elif c == ":":
+                    if state != _OBJ_COLON:
+                        break
+                    state = _VALUE
+                elif c == "{" or c == "[":
+                    if state != _VALUE and state != _ARR_FIRST:
+                        break
+                    fast = self._fast_value(buf, end - 1)
+                    if fast is not None:
+                        end = fast[1]
+                        state = _OBJ_NEXT if stack[-1] else _ARR_NEXT
+                    else:
+                        stack.append(c == "{")
+                        state = _OBJ_FIRST if c == "{" else _ARR_FIRST
+                else:
+                    is_obj = c == "}"
+                    if len(stack) <= base or stack[-1] != is_obj:
+                        break   # leaves the subtree (or invalid): full handler
+                    if state != (_OBJ_NEXT if is_obj else _ARR_NEXT) and \
+                            state != (_OBJ_FIRST if is_obj else _ARR_FIRST):
+                        break
+                    stack.pop()
+                    state = _OBJ_NEXT if stack[-1] else _ARR_NEXT
+            elif state == _VALUE or state == _ARR_FIRST:
+                if kind == 2 and not final and (end == n or _NUMBER_TAIL.match(buf, end)):
+                    break
+                state = _OBJ_NEXT if stack[-1] else _ARR_NEXT
+            elif kind == 1 and (state == _OBJ_FIRST or state == _OBJ_KEY):
+                state = _OBJ_COLON
+            else:
+                break
+            pos = end
+
+        self._state = state
+        return pos
+
+    def _parse(self, final):
+        buf = self._buf
+        n = len(buf)
+        pos = self._pos
+
+        while True:
+            if self._stack and not self._tracking():
+                pos = self._skip(buf, pos, final)
+            pos = _WS.match(buf, pos).end()
+            if pos >= n:
+                break
+            state = self._state
+            c = buf[pos]
+
+            if state == _DONE:
+                self._error(pos, "Extra data after JSON value")
+
+            if state in (_VALUE, _ARR_FIRST):
+                if state == _ARR_FIRST and c == "]":
+                    self._close(pos + 1)
+                    pos += 1
+                    continue
+                if c == "{" or c == "[":
+                    self._begin_value(pos)
+                    if not (self._tracking() and tuple(self._path) in self._prefixes):
+                        # Nothing inside can match: validate it in one go if possible
+                        fast = self._fast_value(buf, pos)
+                        if fast is not None:
+                            self._end_value(fast[1], fast[0])
+                            pos = fast[1]
+                            continue
+                    self._open(c == "{")
+                    pos += 1
+                    continue
+                if c == '"':
+                    m = _STRING.match(buf, pos)
+                    if m is None:
+                        if not final and _STRING_PARTIAL.match(buf, pos):
+                            break
+                        self._error(pos, "Invalid string")
+                    end = m.end()
+                elif c == "-" or "0" <= c <= "9":
+                    m = _NUMBER.match(buf, pos)
+                    if m is None:
+                        if not final and buf[pos:] == "-":
+                            break
+                        self._error(pos, "Invalid number")
+                    end = m.end()
+                    if not final and (end == n or _NUMBER_TAIL.match(buf, end)):
+                        break   # number may continue in the next chunk
+                elif c in _LITERALS:
+                    literal = _LITERALS[c]
+                    end = pos + len(literal)
+                    if buf[pos:end] != literal:
+                        if not final and end > n and literal.startswith(buf[pos:]):
+                            break
+                        self._error(pos, "Invalid literal")
+                else:
+                    self._error(pos, "Expecting value")
+                self._begin_value(pos)
+                self._end_value(end)
+                pos = end
+                continue
+
+            if state == _ARR_NEXT:
+                if c == ",":
+                    if len(self._path) == len(self._stack):
+                        self._indices[-1] += 1
+                        self._path[-1] = str(self._indices[-1])
+                    self._state = _VALUE
+                    pos += 1
+                elif c == "]" and not self._stack[-1]:
+                    self._close(pos + 1)
+                    pos += 1
+                else:
+                    self._error(pos, "Expecting ',' or ']'")
+                continue
+
+            if state in (_OBJ_FIRST, _OBJ_KEY):
+                if state == _OBJ_FIRST and c == "}":
+                    self._close(pos + 1)
+                    pos += 1
+                    continue
+                if c != '"':
+                    self._error(pos, "Expecting property name")
+                m = _STRING.match(buf, pos)
+                if m is None:
+                    if not final and _STRING_PARTIAL.match(buf, pos):
+                        break
+                    self._error(pos, "Invalid property name")
+                if len(self._path) == len(self._stack):
+                    raw = m.group()
+                    self._path[-1] = raw[1:-1] if "\\" not in raw else json.loads(raw)
+                self._state = _OBJ_COLON
+                pos = m.end()
+                continue
+
+            if state == _OBJ_COLON:
+                if c != ":":
+                    self._error(pos, "Expecting ':'")
+                self._state = _VALUE
+                pos += 1
+                continue
+
+            if state == _OBJ_NEXT:
+                if c == ",":
+                    self._state = _OBJ_KEY
+                    pos += 1
+                elif c == "}" and self._stack[-1]:
+                    self._close(pos + 1)
+                    pos += 1
+                else:
+                    self._error(pos, "Expecting ',' or '}'")
+                continue
+
+        self._pos = pos
+
+
+def parse_json_stream(chunks, selectors=None, encoding="utf-8"):
+    """Convenience wrapper: run an iterable of byte chunks through the parser."""
+    parser = StreamingJSONParser(selectors, encoding)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser.close()
@@ -0,0 +1,163 @@
+"""
+WattNode Memory Governor
+Process-wide byte budget for in-flight downloads and their parse copies.
+
+Each fetch reserves an estimate of its memory footprint before it starts and
+grows the reservation as the body arrives. When the budget is exhausted new
+fetches block (up to an admission timeout) instead of piling more buffers on
+top, so concurrent scrapes on a small VPS stay under a predictable ceiling.
+
+Rules:
+- A request is admitted if it fits, or if nothing else is reserved (a single
+  job larger than the whole budget still runs, alone).
+- Growth of an admitted download has priority over new admissions, so
+  half-finished downloads drain before new ones start. If every holder is
+  waiting to grow, nothing would ever be released, so one grower (the first
+  to re-check) overcommits; the rest keep waiting for memory to be released.
+- Waiting is bounded; on timeout BudgetTimeout is raised and the caller can
+  defer/retry the job.
+
+Usage:
+    budget = ByteBudget(64 * 1024 * 1024)
+    with budget.reserve(256 * 1024) as r:
+        ...
+        r.grow_to(len(buffer) * 3)
+    budget.stats()   # in_use, peak, waits, timeouts, ...
+"""
+
+import time
+import threading
+
+DEFAULT_BUDGET_MB = 64              # daemon default; scraper.memory_budget_mb: 0 disables
+DEFAULT_ADMISSION_TIMEOUT = 30.0    # seconds a fetch may wait to be admitted
+
+
+class BudgetTimeout(Exception):
+    """Raised when a reservation could not be admitted within its timeout."""
+
+    def __init__(self, requested, in_use, limit):
+        super().__init__(
+            f"Memory budget exhausted: requested {requested} bytes "
+            f"({in_use}/{limit} in use)"
+        )
+        self.requested = requested
+        self.in_use = in_use
+        self.limit = limit
+
+
+class Reservation:
+    """Bytes held against a ByteBudget. Release exactly once (context manager)."""
+
+    def __init__(self, budget, nbytes):
+        self._budget = budget
+        self.nbytes = nbytes
+        self._released = False
+
+    def grow_to(self, nbytes, timeout=None):
+        """Grow the reservation to at least *nbytes*. May block; raises BudgetTimeout."""
+        if nbytes > self.nbytes:
+            self._budget._acquire(nbytes - self.nbytes, self, timeout)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self._budget._release(self.nbytes)
+            self.nbytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+
+class ByteBudget:
+    """Blocking byte-budget semaphore with peak/wait accounting. Thread-safe."""
+
+    def __init__(self, limit_bytes, admission_timeout=DEFAULT_ADMISSION_TIMEOUT):
+        if limit_bytes <= 0:
+            raise ValueError("limit_bytes must be positive")
+        self.limit = int(limit_bytes)
+        self.admission_timeout = admission_timeout
+        self._cond = threading.Condition()
+        self._in_use = 0
+        self._holders = 0           # admitted, unreleased reservations
+        self._growers = 0           # reservations waiting to grow (have priority)
+        self._stats = {
+            "admitted": 0,
+            "peak_bytes": 0,
+            "waits": 0,
+            "wait_seconds": 0.0,
+            "timeouts": 0,
+            "overcommits": 0,       # admitted over the limit (sole holder or deadlock)
+        }
+
+    def reserve(self, nbytes, timeout=None):
+        """Admit a new reservation of *nbytes*. Blocks; raises BudgetTimeout."""
+        reservation = Reservation(self, 0)
+        self._acquire(int(nbytes), reservation, timeout)
+        return reservation
+
+    def _fits(self, nbytes, reservation, growing):
+        if growing:
+            # Every holder is waiting to grow, so nothing will be released:
+            # let this one overcommit rather than deadlock until timeout. It
+            # leaves _growers on its way out (under the lock), so the check
+            # fails for the others: one overcommit at a time, never all
+            if self._growers == self._holders:
+                return True
+        elif self._growers:
+            return False
+        if self._in_use + nbytes <= self.limit:
+            return True
+        # Nobody else holds anything: let a single oversized job through
+        return self._in_use == reservation.nbytes
+
+    def _acquire(self, nbytes, reservation, timeout):
+        timeout = self.admission_timeout if timeout is None else timeout
+        growing = reservation.nbytes > 0
+        with self._cond:
+            if growing:
+                self._growers += 1
+            try:
+                if not self._fits(nbytes, reservation, growing):
+                    self._stats["waits"] += 1
+                    started = time.monotonic()
+                    deadline = started + timeout
+                    try:
+                        while not self._fits(nbytes, reservation, growing):
+                            remaining = deadline - time.monotonic()
+                            if remaining <= 0:
+                                self._stats["timeouts"] += 1
+                                raise BudgetTimeout(nbytes, self._in_use, self.limit)
+                            self._cond.wait(remaining)
+                    finally:
+                        self._stats["wait_seconds"] += time.monotonic() - started
+            finally:
+                if growing:
+                    self._growers -= 1
+                    self._cond.notify_all()
+            if self._in_use + nbytes > self.limit:
+                self._stats["overcommits"] += 1
+            if not growing:
+                self._holders += 1
+                self._stats["admitted"] += 1
+            self._in_use += nbytes
+            reservation.nbytes += nbytes
+            if self._in_use > self._stats["peak_bytes"]:
+                self._stats["peak_bytes"] = self._in_use
+
+    def _release(self, nbytes):
+        with self._cond:
+            self._in_use -= nbytes
+            self._holders -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["limit_bytes"] = self.limit
+            stats["in_use_bytes"] = self._in_use
+            stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+            return stats
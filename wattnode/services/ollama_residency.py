@@ -0,0 +1,226 @@
+"""
+WattNode Ollama Residency
+Keeps the models the job stream actually uses loaded in Ollama.
+
+Ollama unloads a model keep_alive (default 5 minutes) after its last request,
+and the next request pays a multi-second load; alternating jobs for two
+models that do not fit together reload one of them every time. The
+residency manager:
+
+- warms configured models at daemon start (an empty prompt loads a model)
+- learns per-model usage as an exponentially decayed request count, and
+  asks Ollama to keep "hot" models (score >= HOT_SCORE) resident longer
+  via the keep_alive request field
+- with a memory budget, unloads the coldest idle models (keep_alive 0)
+  when the resident set reported by /api/ps would exceed it, before a cold
+  model is loaded
+- records load/warm/evict events and counters for the heartbeat
+
+Usage:
+    from services.ollama_residency import ResidencyManager
+    from services.inference import set_residency_manager
+    manager = ResidencyManager("http://localhost:11434", budget_bytes=8 << 30,
+                               warm_models=["llama3"])
+    set_residency_manager(manager)
+    manager.warm()
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+
+import requests
+
+logger = logging.getLogger("wattnode.ollama_residency")
+
+DEFAULT_KEEP_ALIVE = "5m"       # Ollama's own default
+HOT_KEEP_ALIVE = "60m"
+HOT_SCORE = 3.0                 # decayed uses that make a model hot
+USAGE_HALF_LIFE = 900           # seconds
+COLD_LOAD_MS = 250              # load_duration above this means the model was loaded
+PS_TTL = 5                      # seconds a /api/ps snapshot is reused
+MAX_EVENTS = 100
+REQUEST_TIMEOUT = (5, 30)
+LOAD_TIMEOUT = (5, 300)         # loading a large model from disk is slow
+
+
+def normalize_model(model):
+    """Ollama reports "llama2" as "llama2:latest"."""
+    return model if ":" in model else f"{model}:latest"
+
+
+class ResidencyManager:
+    """Usage-driven keep_alive, warmup and budgeted eviction for one Ollama server. Thread-safe."""
+
+    def __init__(self, base_url, budget_bytes=None, warm_models=(), keep_alive=DEFAULT_KEEP_ALIVE,
+                 hot_keep_alive=HOT_KEEP_ALIVE, half_life=USAGE_HALF_LIFE, clock=time.monotonic):
+        self.base_url = base_url.rstrip("/")
+        self.budget_bytes = budget_bytes
+        self.warm_models = [normalize_model(m) for m in warm_models]
+        self.keep_alive = keep_alive
+        self.hot_keep_alive = hot_keep_alive
+        self.half_life = half_life
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._usage = {}            # model -> (score, updated_at)
+        self._active = {}           # model -> in-flight requests
+        self._sizes = {}            # model -> bytes, learned from /api/ps
+        self._resident = None       # model -> size, last /api/ps snapshot
+        self._resident_at = 0.0
+        self._events = deque(maxlen=MAX_EVENTS)
+        self._counters = {"requests": 0, "cold_starts": 0, "loads": 0, "warmups": 0,
+                          "evictions": 0, "errors": 0}
+        now = clock()
+        for model in self.warm_models:
+            self._usage[model] = (HOT_SCORE, now)
+
+    # -- usage ---------------------------------------------------------------
+
+    def _score(self, model, now):
+        score, updated_at = self._usage.get(model, (0.0, now))
+        return score * 0.5 ** ((now - updated_at) / self.half_life)
+
+    def _event(self, kind, model, **detail):
+        self._events.append({"at": time.time(), "event": kind, "model": model, **detail})
+        logger.info("ollama %s | model=%s %s", kind, model,
+                    " ".join(f"{k}={v}" for k, v in detail.items()))
+
+    def acquire(self, model):
+        """
+        Record a request for *model* and return the keep_alive to send with it.
+        If the model is not resident, first evicts cold models to make room.
+        Pair with release().
+        """
+        name = normalize_model(model)
+        with self._lock:
+            now = self._clock()
+            self._usage[name] = (self._score(name, now) + 1.0, now)
+            self._active[name] = self._active.get(name, 0) + 1
+            self._counters["requests"] += 1
+            hot = self._usage[name][0] >= HOT_SCORE
+        if self.budget_bytes and name not in self.resident():
+            self.enforce(reserve=name)
+        return self.hot_keep_alive if hot else self.keep_alive
+
+    def release(self, model, final=None):
+        """End a request started with acquire(); *final* is its final stream event, if any."""
+        name = normalize_model(model)
+        load_ms = (final or {}).get("load_ms") or 0
+        with self._lock:
+            self._active[name] = max(0, self._active.get(name, 1) - 1)
+            loaded = load_ms >= COLD_LOAD_MS
+            if loaded:
+                self._counters["cold_starts"] += 1
+                self._counters["loads"] += 1
+                self._resident_at = 0.0     # the resident set changed
+                self._event("load", name, load_ms=load_ms)
+        if loaded and self.budget_bytes:
+            self.enforce()
+
+    # -- resident set --------------------------------------------------------
+
+    def resident(self, refresh=False):
+        """Loaded models -> size in bytes (from /api/ps, cached PS_TTL seconds)."""
+        with self._lock:
+            if not refresh and self._resident is not None and self._clock() - self._resident_at < PS_TTL:
+                return dict(self._resident)
+        try:
+            resp = requests.get(f"{self.base_url}/api/ps", timeout=REQUEST_TIMEOUT)
+            resp.raise_for_status()
+            models = {m.get("name") or m.get("model"): m.get("size", 0)
+                      for m in resp.json().get("models", [])}
+        except Exception as e:
+            logger.debug(f"/api/ps failed: {e}")
+            with self._lock:
+                return dict(self._resident or {})
+        with self._lock:
+            self._resident = models
+            self._resident_at = self._clock()
+            self._sizes.update(models)
+        return dict(models)
+
+    def enforce(self, reserve=None):
+        """
+        Unload the coldest idle models while the resident set (plus the known
+        size of model *reserve*, about to load) exceeds the budget.
+        Returns the evicted model names.
+        """
+        if not self.budget_bytes:
+            return []
+        resident = self.resident(refresh=True)
+        evicted = []
+        with self._lock:
+            needed = self._sizes.get(reserve, 0) if reserve and reserve not in resident else 0
+            now = self._clock()
+            candidates = sorted(
+                (self._score(name, now), name) for name in resident
+                if not self._active.get(name) and name != reserve
+            )
+        total = sum(resident.values()) + needed
+        for _, name in candidates:
+            if total <= self.budget_bytes:
+                break
+            if self.unload(name, reason="budget"):
+                total -= resident[name]
+                evicted.append(name)
+        return evicted
+
+    def unload(self, model, reason="manual"):
+        name = normalize_model(model)
+        try:
+            resp = requests.post(f"{self.base_url}/api/generate",
+                                 json={"model": name, "keep_alive": 0}, timeout=REQUEST_TIMEOUT)
+            resp.raise_for_status()
+        except Exception as e:
+            with self._lock:
+                self._counters["errors"] += 1
+            logger.warning(f"Could not unload {name}: {e}")
+            return False
+        with self._lock:
+            self._counters["evictions"] += 1
+            size = (self._resident or {}).pop(name, None)
+            self._event("evict", name, reason=reason, size=size)
+        return True
+
+    def warm(self, models=None):
+        """Load *models* (default: the configured warm_models) and keep them hot. Blocking."""
+        warmed = []
+        for name in [normalize_model(m) for m in (models or self.warm_models)]:
+            if self.budget_bytes:
+                self.enforce(reserve=name)
+            started = time.monotonic()
+            try:
+                resp = requests.post(
+                    f"{self.base_url}/api/generate",
+                    json={"model": name, "prompt": "", "stream": False,
+                          "keep_alive": self.hot_keep_alive},
+                    timeout=LOAD_TIMEOUT
+                )
+                resp.raise_for_status()
+            except Exception as e:
+                with self._lock:
+                    self._counters["errors"] += 1
+                logger.warning(f"Could not warm {name}: {e}")
+                continue
+            with self._lock:
+                self._counters["warmups"] += 1
+                self._resident_at = 0.0
+                self._event("warm", name, load_ms=int((time.monotonic() - started) * 1000))
+            warmed.append(name)
+        return warmed
+
+    def stats(self):
+        """Counters, usage scores, last known resident set and recent events (no HTTP)."""
+        with self._lock:
+            now = self._clock()
+            usage = {name: round(self._score(name, now), 2) for name in self._usage}
+            return dict(
+                self._counters,
+                budget_bytes=self.budget_bytes,
+                resident={name: {"size": size, "hot": usage.get(name, 0) >= HOT_SCORE,
+                                 "active": self._active.get(name, 0)}
+                          for name, size in (self._resident or {}).items()},
+                usage=usage,
+                events=list(self._events)[-20:],
+            )
@@ -0,0 +1,112 @@
+"""
+WattNode Parse Pool
+Process pool for the CPU-bound half of scraping (decode + HTML extraction).
+
+BeautifulSoup parsing holds the GIL, so fetch threads alone only ever parse on
+one core. With a parse pool installed, fetch threads hand the raw body to a
+worker process and wait without holding the GIL, so downloads keep flowing
+while up to `workers` pages are parsed in parallel.
+
+Bodies are passed through multiprocessing.shared_memory: the parent copies the
+buffer once into a shared block and the worker decodes straight from it, so
+the body is never pickled. Only the (smaller) extraction result comes back
+through the pool's pipe.
+
+Workers are started with forkserver (spawn where it is unavailable), never
+plain fork: the daemon already runs heartbeat, batching and loader threads,
+and a forked child can deadlock on a lock one of them held at fork time.
+
+Usage:
+    from services.parse_pool import ParsePool, default_workers
+    from services.scraper import set_parse_pool
+    set_parse_pool(ParsePool(default_workers(cpu_allocation=50)))
+"""
+
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from services.scraper import extract_content
+
+logger = logging.getLogger("wattnode.parse_pool")
+
+DEFAULT_CPU_ALLOCATION = 50     # percent of cores, same default as the GUI slider
+MIN_POOL_BYTES = 32 * 1024      # smaller bodies parse inline; IPC would cost more
+
+
+def default_workers(cpu_allocation=DEFAULT_CPU_ALLOCATION):
+    """Worker count for *cpu_allocation* percent of the cores this process may use."""
+    if hasattr(os, "sched_getaffinity"):
+        cores = len(os.sched_getaffinity(0))
+    else:
+        cores = os.cpu_count() or 1
+    return max(1, int(cores * cpu_allocation / 100))
+
+
+def _mp_context():
+    """forkserver where the platform has it (Linux, macOS), else spawn (Windows)."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def _parse_shared(name, size, encoding, format, base_url):
+    """Worker entry point: decode the shared body and run the format's extraction."""
+    # Pool workers share the parent's resource tracker, so attaching here does
+    # not add a second owner; the parent unlinks the block after the call
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        view = shm.buf[:size]
+        try:
+            text = str(view, encoding, "replace")
+        finally:
+            view.release()
+    finally:
+        shm.close()
+    return extract_content(text, format, base_url)
+
+
+class ParsePool:
+    """
+    Process pool running extraction on bodies passed through shared memory.
+
+    parse() blocks the calling (fetch) thread until the result is ready and
+    re-raises whatever the worker raised; a dead pool raises BrokenExecutor.
+    """
+
+    def __init__(self, workers=None, min_bytes=MIN_POOL_BYTES):
+        self.workers = workers or default_workers()
+        self.min_bytes = min_bytes
+        self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+        self._lock = threading.Lock()
+        self._stats = {"parsed": 0, "bytes": 0, "errors": 0}
+
+    def parse(self, body, encoding, format, base_url):
+        """Decode *body* (bytes-like) with *encoding* and extract *format* in a worker."""
+        size = len(body)
+        shm = shared_memory.SharedMemory(create=True, size=size)
+        try:
+            shm.buf[:size] = body
+            future = self._executor.submit(_parse_shared, shm.name, size, encoding, format, base_url)
+            try:
+                result = future.result()
+            except Exception:
+                with self._lock:
+                    self._stats["errors"] += 1
+                raise
+        finally:
+            shm.close()
+            shm.unlink()
+        with self._lock:
+            self._stats["parsed"] += 1
+            self._stats["bytes"] += size
+        return result
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, workers=self.workers)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,224 @@
+"""
+WattNode Scraper Proxy Pool
+Optional egress proxy pool for scrape jobs.
+
+Proxies are picked per target domain by observed success rate and latency,
+with a small exploration rate so new or recovered proxies get re-measured.
+Failing proxies are cooled down automatically:
+- per (proxy, domain) when the target blocks or times out through that proxy
+- per proxy when the proxy itself cannot be reached
+
+Cooldowns double with each consecutive failure up to MAX_COOLDOWN and reset
+on the first success.
+
+Per-domain state is kept for the MAX_DOMAINS most recently used (proxy,
+domain) pairs; older pairs fall back to the proxy's own health. metrics()
+reports per-proxy totals and only the busiest domains.
+
+Usage:
+    from services.proxy_pool import ProxyPool
+    from services.scraper import set_proxy_pool
+    set_proxy_pool(ProxyPool(["http://10.0.0.2:3128", "http://user:pw@10.0.0.3:3128"]))
+"""
+
+import time
+import random
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit
+
+logger = logging.getLogger("wattnode.proxy_pool")
+
+# =============================================================================
+# CONFIG
+# =============================================================================
+
+DEFAULT_COOLDOWN = 30       # seconds after FAILURE_THRESHOLD consecutive failures
+MAX_COOLDOWN = 600          # cap for exponential cooldown growth
+FAILURE_THRESHOLD = 2       # consecutive failures before a cooldown starts
+EXPLORE_RATE = 0.1          # chance of picking a random healthy proxy
+LATENCY_ALPHA = 0.3         # EWMA weight for new latency samples
+DEFAULT_LATENCY = 1.0       # seconds, assumed for proxies with no samples
+MAX_DOMAINS = 4096          # (proxy, domain) health entries kept, least recently used dropped
+METRICS_TOP_DOMAINS = 10    # per-proxy domains reported by metrics()
+
+
+def _domain_of(url):
+    return (urlsplit(url).hostname or "").lower()
+
+
+def _redact(proxy):
+    """Hide credentials in a proxy URL for logs and metrics."""
+    parts = urlsplit(proxy)
+    if not parts.username:
+        return proxy
+    netloc = parts.hostname + (f":{parts.port}" if parts.port else "")
+    return urlunsplit((parts.scheme, f"***@{netloc}", parts.path, parts.query, parts.fragment))
+
+
+class _Health:
+    """Success/latency/cooldown state for one proxy or (proxy, domain) pair."""
+
+    def __init__(self):
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.latency = None             # EWMA seconds
+        self.cooldown_until = 0.0
+        self.cooldowns = 0
+
+    def success_rate(self):
+        # Laplace-smoothed so a single early failure does not sink a proxy
+        return (self.successes + 1) / (self.requests + 2)
+
+    def record(self, ok, latency, now, base_cooldown, max_cooldown, threshold):
+        """Record one outcome. Returns cooldown seconds if one started, else 0."""
+        self.requests += 1
+        if latency is not None:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                self.latency += LATENCY_ALPHA * (latency - self.latency)
+        if ok:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.cooldown_until = 0.0
+            return 0
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures < threshold:
+            return 0
+        exponent = self.consecutive_failures - threshold
+        cooldown = min(max_cooldown, base_cooldown * (2 ** exponent))
+        self.cooldown_until = now + cooldown
+        self.cooldowns += 1
+        return cooldown
+
+    def cooling(self, now):
+        return self.cooldown_until > now
+
+    def to_dict(self, now):
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "success_rate": round(self.success_rate(), 3),
+            "avg_latency_ms": int(self.latency * 1000) if self.latency is not None else None,
+            "cooling_down": self.cooling(now),
+            "cooldown_remaining": max(0, int(self.cooldown_until - now)),
+            "cooldowns": self.cooldowns,
+        }
+
+
+class ProxyPool:
+    """
+    Health-scored pool of HTTP(S) proxies.
+
+    choose(url) returns the proxy to use for *url*; report(...) feeds the
+    outcome back. Thread-safe. *clock* and *rng* are injectable for tests.
+    """
+
+    def __init__(self, proxies, cooldown=DEFAULT_COOLDOWN, max_cooldown=MAX_COOLDOWN,
+                 failure_threshold=FAILURE_THRESHOLD, explore_rate=EXPLORE_RATE,
+                 max_domains=MAX_DOMAINS, clock=time.monotonic, rng=None):
+        self.proxies = [p.strip() for p in proxies if p and p.strip()]
+        if not self.proxies:
+            raise ValueError("ProxyPool requires at least one proxy URL")
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.failure_threshold = failure_threshold
+        self.explore_rate = explore_rate
+        self.max_domains = max_domains
+        self._clock = clock
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._proxy_health = {p: _Health() for p in self.proxies}
+        self._domain_health = OrderedDict()    # (proxy, domain) -> _Health, least recent first
+
+    def _domain(self, proxy, domain):
+        key = (proxy, domain)
+        health = self._domain_health.get(key)
+        if health is None:
+            health = self._domain_health[key] = _Health()
+            while len(self._domain_health) > self.max_domains:
+                self._domain_health.popitem(last=False)
+        else:
+            self._domain_health.move_to_end(key)
+        return health
+
+    def _score(self, proxy, domain):
+        """Expected successes per second through *proxy* for *domain*."""
+        d = self._domain_health.get((proxy, domain))
+        p = self._proxy_health[proxy]
+        rate = d.success_rate() if d else p.success_rate()
+        latency = (d.latency if d and d.latency is not None else p.latency) or DEFAULT_LATENCY
+        return rate / max(latency, 0.001)
+
+    def choose(self, url):
+        """Pick a proxy for *url*. Never returns None; falls back to the soonest-ready proxy."""
+        domain = _domain_of(url)
+        now = self._clock()
+        with self._lock:
+            ready = [
+                p for p in self.proxies
+                if not self._proxy_health[p].cooling(now)
+                and not (self._domain_health.get((p, domain)) or _Health()).cooling(now)
+            ]
+            if not ready:
+                # Everything is cooling down; use whichever recovers first
+                def ready_at(p):
+                    d = self._domain_health.get((p, domain))
+                    return max(self._proxy_health[p].cooldown_until, d.cooldown_until if d else 0.0)
+                return min(self.proxies, key=ready_at)
+            if len(ready) > 1 and self._rng.random() < self.explore_rate:
+                return self._rng.choice(ready)
+            return max(ready, key=lambda p: self._score(p, domain))
+
+    def report(self, proxy, url, ok, latency=None, proxy_failure=False):
+        """
+        Record the outcome of a request sent through *proxy*.
+
+        Args:
+            ok:            target answered without blocking/timing out
+            latency:       seconds until response headers (None if unknown)
+            proxy_failure: the proxy itself was unreachable (cools the proxy
+                           down for every domain, not just this one)
+        """
+        if proxy not in self._proxy_health:
+            return
+        domain = _domain_of(url)
+        now = self._clock()
+        with self._lock:
+            args = (now, self.cooldown, self.max_cooldown, self.failure_threshold)
+            proxy_cooldown = self._proxy_health[proxy].record(
+                ok or not proxy_failure, latency if ok else None, *args)
+            domain_cooldown = 0
+            if not proxy_failure:
+                domain_cooldown = self._domain(proxy, domain).record(ok, latency if ok else None, *args)
+
+        if proxy_cooldown:
+            logger.warning("proxy cooling down | proxy=%s seconds=%d", _redact(proxy), proxy_cooldown)
+        elif domain_cooldown:
+            logger.info("proxy cooling down for domain | proxy=%s domain=%s seconds=%d",
+                        _redact(proxy), domain, domain_cooldown)
+
+    def metrics(self, top_domains=METRICS_TOP_DOMAINS):
+        """
+        Per-proxy metrics (credentials redacted) with the *top_domains* most
+        requested domains (None: all tracked domains) and how many are tracked.
+        """
+        now = self._clock()
+        with self._lock:
+            by_proxy = {proxy: [] for proxy in self.proxies}
+            for (proxy, domain), health in self._domain_health.items():
+                by_proxy[proxy].append((domain, health))
+            result = {}
+            for proxy in self.proxies:
+                domains = sorted(by_proxy[proxy], key=lambda item: item[1].requests, reverse=True)
+                entry = self._proxy_health[proxy].to_dict(now)
+                entry["domains_tracked"] = len(domains)
+                entry["domains"] = {domain: health.to_dict(now) for domain, health in domains[:top_domains]}
+                result[_redact(proxy)] = entry
+            return result
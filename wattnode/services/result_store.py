@@ -0,0 +1,152 @@
+"""
+WattNode Result Store
+Content-addressed on-disk store for extraction results with LRU eviction.
+
+Entries are JSON files named by a hex key (normally a sha256 digest) under a
+two-level fan-out directory. The scraper keys results by the hash of the raw
+body plus the extraction options, so identical bytes (mirrors, unchanged
+pages) are parsed once and served from disk afterwards.
+
+Recency is tracked in memory and persisted through file mtimes, so the LRU
+order survives restarts. Writes are atomic (temp file + rename); temp files
+left behind by a crash are removed when the store opens.
+
+Usage:
+    store = ResultStore("~/.wattnode/results", max_bytes=128 * 1024 * 1024)
+    store.put(key, {"text": "..."})
+    store.get(key)      # -> value or None
+    store.stats()
+"""
+
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger("wattnode.result_store")
+
+DEFAULT_DIR = os.path.expanduser("~/.wattnode/results")
+DEFAULT_MAX_MB = 128        # daemon default; scraper.result_cache_mb: 0 disables
+
+
+class ResultStore:
+    """
+    Disk LRU of JSON-serializable values keyed by hex strings. Thread-safe.
+
+    *ttl* (seconds, optional) expires entries by age since they were written
+    or last read.
+    """
+
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=DEFAULT_MAX_MB * 1024 * 1024, ttl=None):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = int(max_bytes)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._index = OrderedDict()     # key -> size in bytes, least recent first
+        self._total = 0
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        os.makedirs(self.directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def _load_index(self):
+        entries = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    # Orphaned by a crash between mkstemp() and the rename
+                    try:
+                        os.remove(os.path.join(root, name))
+                    except OSError:
+                        pass
+                    continue
+                if not name.endswith(".json"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, name[:-5], st.st_size))
+        for _mtime, key, size in sorted(entries):
+            self._index[key] = size
+            self._total += size
+        self._evict()
+
+    def _remove(self, key):
+        size = self._index.pop(key, 0)
+        self._total -= size
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._index:
+            key = next(iter(self._index))
+            self._remove(key)
+            self._stats["evictions"] += 1
+
+    def get(self, key):
+        """Return the stored value for *key*, or None (missing, expired or unreadable)."""
+        with self._lock:
+            if key not in self._index:
+                self._stats["misses"] += 1
+                return None
+            path = self._path(key)
+            try:
+                if self.ttl is not None and time.time() - os.path.getmtime(path) > self.ttl:
+                    self._remove(key)
+                    self._stats["misses"] += 1
+                    return None
+                with open(path, "r", encoding="utf-8") as f:
+                    value = json.load(f)
+                os.utime(path)
+            except (OSError, ValueError):
+                self._remove(key)
+                self._stats["misses"] += 1
+                return None
+            self._index.move_to_end(key)
+            self._stats["hits"] += 1
+            return value
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._index
+
+    def put(self, key, value):
+        """Store *value* under *key*, evicting least recently used entries to fit."""
+        data = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        with self._lock:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+                try:
+                    with os.fdopen(fd, "wb") as f:
+                        f.write(data)
+                    os.replace(tmp, path)
+                except OSError:
+                    os.remove(tmp)
+                    raise
+            except OSError as exc:
+                logger.warning("result store write failed | key=%s error=%s", key[:16], exc)
+                return
+            self._total += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._stats["writes"] += 1
+            self._evict()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._index)
+            stats["bytes"] = self._total
+            stats["max_bytes"] = self.max_bytes
+            return stats
@@ -0,0 +1,186 @@
+"""
+WattNode Scrape Diff
+Diff mode for recurring scrapes: return only what changed since a snapshot.
+
+Monitoring jobs re-scrape the same page on a schedule. With diff mode the node
+keeps the extracted content of each diff-mode scrape as a snapshot (in the
+result store, keyed by content hash) and, when a job names the hash of a
+previous result, returns one of:
+
+    {"status": "unchanged", "content_hash": h}
+    {"status": "diff", "content_hash": h, "base_hash": prev, "diff": [[start, end, "new"], ...]}
+    {"status": "full", "content_hash": h, "content": "..."}
+
+A diff is a list of [start, end, replacement] edits against the previous
+content's character offsets, in ascending order; apply_diff() rebuilds the new
+content. "full" is returned when this node has no snapshot for the base hash
+(e.g. the previous scrape ran elsewhere) or when the diff would not be
+smaller than the content.
+
+Job payload:
+    {"url": "...", "format": "text", "diff": true}            # start a series
+    {"url": "...", "format": "text", "diff": "<content_hash>"}  # diff against it
+"""
+
+import re
+import json
+import zlib
+import hashlib
+import logging
+from collections import Counter
+from difflib import SequenceMatcher
+
+from services.scraper import local_scrape, get_result_store
+
+logger = logging.getLogger("wattnode.scrape_diff")
+
+DIFF_FORMATS = ("text", "html")
+
+# Words with their trailing whitespace; joining the tokens gives the input back
+_WORD = re.compile(r"\S+\s*|\s+")
+CHUNK_MASK = 0xF        # ~1 in 16 words ends a chunk (content-defined)
+REFINE_LIMIT = 2000     # max words per side for the word-level pass
+# Max (old, new) pairs of equal items SequenceMatcher would have to consider;
+# repetitive pages (few distinct chunks) go quadratic, so above this the
+# differing middle is replaced whole
+MAX_MATCH_WORK = 500_000
+
+
+def _opcodes(a, b):
+    """
+    SequenceMatcher opcodes for lists *a* and *b*, with the common prefix and
+    suffix split off first and the middle replaced as a whole when matching
+    it would cost more than MAX_MATCH_WORK.
+    """
+    n = min(len(a), len(b))
+    head = 0
+    while head < n and a[head] == b[head]:
+        head += 1
+    tail = 0
+    while tail < n - head and a[len(a) - 1 - tail] == b[len(b) - 1 - tail]:
+        tail += 1
+    a_mid, b_mid = a[head:len(a) - tail], b[head:len(b) - tail]
+
+    ops = [("equal", 0, head, 0, head)] if head else []
+    if a_mid or b_mid:
+        counts = Counter(b_mid)
+        work = sum(counts[item] for item in a_mid)
+        if work > MAX_MATCH_WORK or not a_mid or not b_mid:
+            tag = "replace" if a_mid and b_mid else ("delete" if a_mid else "insert")
+            ops.append((tag, head, head + len(a_mid), head, head + len(b_mid)))
+        else:
+            for tag, i1, i2, j1, j2 in SequenceMatcher(None, a_mid, b_mid, autojunk=False).get_opcodes():
+                ops.append((tag, head + i1, head + i2, head + j1, head + j2))
+    if tail:
+        ops.append(("equal", len(a) - tail, len(a), len(b) - tail, len(b)))
+    return ops
+
+
+def _chunks(text):
+    """
+    Split *text* into runs of words ending at sentence/line ends or at words
+    whose crc32 matches CHUNK_MASK. Boundaries depend only on nearby content,
+    so an edit disturbs one chunk and the rest still line up.
+    """
+    chunks = []
+    current = []
+    for word in _WORD.findall(text):
+        current.append(word)
+        stripped = word.rstrip()
+        if (not stripped or "\n" in word or stripped[-1] in ".!?"
+                or zlib.crc32(stripped.encode("utf-8")) & CHUNK_MASK == 0):
+            chunks.append(current)
+            current = []
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def compute_diff(old, new):
+    """
+    Edits turning *old* into *new*, as [start, end, replacement] on *old*.
+
+    Chunks of words are matched first (mostly unique, so fast even for large
+    pages); each changed run is then refined word by word.
+    """
+    old_chunks = _chunks(old)
+    new_chunks = _chunks(new)
+    offsets = [0]
+    for chunk in old_chunks:
+        offsets.append(offsets[-1] + sum(len(word) for word in chunk))
+
+    edits = []
+    matcher_input = (["".join(c) for c in old_chunks], ["".join(c) for c in new_chunks])
+    for tag, i1, i2, j1, j2 in _opcodes(*matcher_input):
+        if tag == "equal":
+            continue
+        old_words = [w for chunk in old_chunks[i1:i2] for w in chunk]
+        new_words = [w for chunk in new_chunks[j1:j2] for w in chunk]
+        if tag != "replace" or max(len(old_words), len(new_words)) > REFINE_LIMIT:
+            edits.append([offsets[i1], offsets[i2], "".join(new_words)])
+            continue
+        word_offsets = [offsets[i1]]
+        for word in old_words:
+            word_offsets.append(word_offsets[-1] + len(word))
+        for wtag, w1, w2, k1, k2 in _opcodes(old_words, new_words):
+            if wtag != "equal":
+                edits.append([word_offsets[w1], word_offsets[w2], "".join(new_words[k1:k2])])
+    return edits
+
+
+def apply_diff(old, edits):
+    """Apply edits from compute_diff() to *old*."""
+    parts = []
+    pos = 0
+    for start, end, replacement in edits:
+        parts.append(old[pos:start])
+        parts.append(replacement)
+        pos = end
+    parts.append(old[pos:])
+    return "".join(parts)
+
+
+def _snapshot_key(content_hash, format):
+    return hashlib.sha256(f"snapshot|{content_hash}|{format}".encode("utf-8")).hexdigest()
+
+
+def local_scrape_diff(url, since=None, format="text", store=None):
+    """
+    Scrape *url* and describe the result relative to the snapshot *since*.
+
+    Args:
+        since:  content_hash of a previous diff-mode result, or None to start
+                a series (returns "full" and keeps a snapshot)
+        format: "text" or "html"
+        store:  ResultStore for snapshots (defaults to the scraper's store;
+                without one every result is "full")
+
+    Raises:
+        ValueError: unsupported format
+        ScraperException subclasses from local_scrape
+    """
+    if format not in DIFF_FORMATS:
+        raise ValueError(f"Invalid diff format: {format}. Valid: {list(DIFF_FORMATS)}")
+    store = store or get_result_store()
+
+    content, content_hash = local_scrape(url, format, with_hash=True)
+    if store is not None:
+        store.put(_snapshot_key(content_hash, format), content)
+
+    if not since:
+        return {"status": "full", "content_hash": content_hash, "content": content}
+    if since == content_hash:
+        return {"status": "unchanged", "content_hash": content_hash}
+
+    previous = store.get(_snapshot_key(since, format)) if store is not None else None
+    if previous is None:
+        logger.info("no snapshot for diff base | url=%.120s base=%s", url, since[:16])
+        return {"status": "full", "content_hash": content_hash, "content": content}
+    if previous == content:
+        # Raw bytes changed (timestamps, tokens) but the extracted content did not
+        return {"status": "unchanged", "content_hash": content_hash}
+
+    edits = compute_diff(previous, content)
+    if len(json.dumps(edits, ensure_ascii=False)) >= len(content):
+        return {"status": "full", "content_hash": content_hash, "content": content}
+    return {"status": "diff", "content_hash": content_hash, "base_hash": since, "diff": edits}
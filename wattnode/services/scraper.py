@@ -9,17 +9,29 @@ Error handling covers:
 - Connection refused / host unreachable
 - HTTP error status codes (401, 403, 404, 429, 500, 503)
 - Malformed URLs
+- Redirect loops
+- Connection resets / read timeouts while streaming the body
 - Response size limits
 - Malformed JSON/HTML content
 """
 
 import json
+import time
+import hashlib
 import logging
 import random
+import threading
+from concurrent.futures import BrokenExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urljoin, urlsplit, urlunsplit
 
 import requests
 from bs4 import BeautifulSoup
 
+from services.json_stream import StreamingJSONParser, JSONStreamError, parse_pointer
+from services.memory_governor import BudgetTimeout
+
 # User agents for rotation
 USER_AGENTS = [
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0.0.0 Safari/537.36",
@@ -31,6 +43,14 @@ TIMEOUT = 30
 MAX_SIZE = 2 * 1024 * 1024  # 2MB
 MAX_REDIRECTS = 3
 
+# Memory governor: bytes reserved per fetch before the body size is known, and
+# estimated peak bytes held per body byte (buffer + decoded str + parse tree)
+INITIAL_RESERVATION = 256 * 1024
+FOOTPRINT_FACTOR = {"json": 2, "html": 3, "text": 8, "structured": 8}
+
+# Target responses that mean "this egress IP is blocked/throttled" for proxy scoring
+PROXY_BLOCK_STATUSES = {403, 407, 429, 503}
+
 logger = logging.getLogger("wattnode.scraper")
 
 
@@ -54,6 +74,14 @@ class InvalidURLError(ScraperException):
         super().__init__(message, "invalid_url", 400)
 
 
+class InvalidSelectError(ScraperException):
+    def __init__(self, detail: str = ""):
+        msg = "JSON select must be a list of JSON pointers or path lists"
+        if detail:
+            msg += f": {detail}"
+        super().__init__(msg, "invalid_select", 400)
+
+
 class TimeoutError_(ScraperException):
     def __init__(self):
         super().__init__(
@@ -94,6 +122,30 @@ class HostUnreachableError(ScraperException):
         )
 
 
+class ProxyConnectionError(ScraperException):
+    def __init__(self):
+        super().__init__(
+            "Unable to reach the egress proxy for this request.",
+            "proxy_error", 502
+        )
+
+
+class TooManyRedirectsError(ScraperException):
+    def __init__(self):
+        super().__init__(
+            "The target URL redirected too many times.",
+            "too_many_redirects", 502
+        )
+
+
+class MemoryBudgetError(ScraperException):
+    def __init__(self):
+        super().__init__(
+            "Node is at its in-flight memory budget. Try again shortly.",
+            "memory_budget", 503
+        )
+
+
 class HTTPError(ScraperException):
     """Wraps a non-2xx status code returned by the target server."""
     _MESSAGES = {
@@ -105,13 +157,14 @@ class HTTPError(ScraperException):
         503: "The target server is unavailable (HTTP 503). Try again later.",
     }
 
-    def __init__(self, status_code: int):
+    def __init__(self, status_code: int, retry_after: float = None):
         msg = self._MESSAGES.get(
             status_code,
             f"The target server returned an error (HTTP {status_code})."
         )
         super().__init__(msg, "http_error", 502)
         self.http_status_code = status_code
+        self.retry_after = retry_after  # seconds from a Retry-After header, if any
 
     def to_dict(self) -> dict:
         d = super().to_dict()
@@ -188,27 +241,406 @@ def _map_connection_error(exc: requests.ConnectionError) -> ScraperException:
     )
 
 
+def _map_body_error(exc: requests.RequestException, url: str) -> ScraperException:
+    """Translate a failure while streaming the body (read timeout, reset) into a transient error."""
+    # requests re-raises urllib3's ReadTimeoutError from iter_content() as a ConnectionError
+    if isinstance(exc, requests.exceptions.Timeout) or "timed out" in str(exc).lower():
+        logger.warning("timeout reading body | url=%.120s", url)
+        return TimeoutError_()
+    logger.warning("connection lost reading body | url=%.120s error=%s", url, str(exc)[:120])
+    return ScraperException(
+        "The connection was interrupted while reading the response.",
+        "connection_error", 502
+    )
+
+
+def _parse_retry_after(value):
+    """Parse a Retry-After header (delta-seconds or HTTP-date) into seconds."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+def _map_request_exception(exc: requests.RequestException, url: str) -> ScraperException:
+    """Translate (and log) a requests exception raised while fetching *url*."""
+    if isinstance(exc, (requests.exceptions.InvalidURL, requests.exceptions.InvalidSchema,
+                        requests.exceptions.MissingSchema, requests.exceptions.URLRequired)):
+        logger.warning("invalid url | url=%.120s error=%s", url, str(exc)[:120])
+        return InvalidURLError(f"URL is malformed: {exc}")
+    if isinstance(exc, requests.exceptions.TooManyRedirects):
+        logger.warning("too many redirects | url=%.120s", url)
+        return TooManyRedirectsError()
+    if isinstance(exc, requests.exceptions.ProxyError):
+        logger.warning("proxy error | url=%.120s error=%s", url, str(exc)[:120])
+        return ProxyConnectionError()
+    if isinstance(exc, requests.exceptions.SSLError):
+        logger.warning("ssl error | url=%.120s error=%s", url, str(exc)[:120])
+        return SSLError()
+    if isinstance(exc, requests.exceptions.Timeout):
+        logger.warning("timeout | url=%.120s", url)
+        return TimeoutError_()
+    if isinstance(exc, requests.exceptions.ConnectionError):
+        logger.warning("connection error | url=%.120s error=%s", url, str(exc)[:120])
+        return _map_connection_error(exc)
+    logger.error("unexpected request error | url=%.120s type=%s", url, type(exc).__name__)
+    return ScraperException(
+        "HTTP request failed. Please verify the URL and try again.",
+        "request_error", 502
+    )
+
+
+# ---------------------------------------------------------------------------
+# Retry policy
+# ---------------------------------------------------------------------------
+
+class RetryPolicy:
+    """
+    Retries transient scrape failures with full-jitter exponential backoff.
+
+    Retried:  TimeoutError_ (connect, or read while streaming the body),
+              ConnectionRefusedError_, ProxyConnectionError, MemoryBudgetError,
+              generic connection errors (resets, also mid-body),
+              HTTPError in retry_statuses.
+    Never:    InvalidURLError, DNS/SSL errors, redirect loops, 4xx other than
+              429, size and parsing errors, unclassified request errors —
+              repeating those cannot change the outcome.
+
+    *budget* caps the whole job (all attempts plus backoff) in seconds; each
+    attempt's timeout shrinks to fit what is left. A Retry-After header is
+    honoured when it fits in the budget.
+    """
+
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+    MIN_ATTEMPT_TIME = 2.0  # don't start an attempt with less time than this
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0, budget=60.0,
+                 retry_statuses=None, rng=None, sleep=time.sleep, clock=time.monotonic):
+        self.max_attempts = max(1, int(max_attempts))
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self.retry_statuses = frozenset(retry_statuses) if retry_statuses else self.RETRY_STATUSES
+        self._rng = rng or random.Random()
+        self.sleep = sleep
+        self.clock = clock
+
+    def is_retryable(self, exc: ScraperException) -> bool:
+        if isinstance(exc, HTTPError):
+            return exc.http_status_code in self.retry_statuses
+        if isinstance(exc, (TimeoutError_, ConnectionRefusedError_, ProxyConnectionError,
+                            MemoryBudgetError)):
+            return True
+        # Resets and other unclassified *connection* failures use the base class
+        return type(exc) is ScraperException and exc.error_code == "connection_error"
+
+    def backoff(self, attempt: int, exc: ScraperException) -> float:
+        """Delay before retry number *attempt* (1-based)."""
+        delay = self._rng.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+        retry_after = getattr(exc, "retry_after", None)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+_retry_policy = DEFAULT_RETRY_POLICY
+
+_retry_stats_lock = threading.Lock()
+_retry_stats = {
+    "scrapes": 0,
+    "attempts": 0,
+    "retries": 0,
+    "recovered": 0,          # succeeded after at least one retry
+    "exhausted": 0,          # still failing after max_attempts
+    "budget_exceeded": 0,    # gave up because the time budget ran out
+    "retries_by_error": {},  # error_code (or http_<status>) -> retries
+}
+
+
+def set_retry_policy(policy: RetryPolicy) -> None:
+    """Install the process-wide retry policy (RetryPolicy(max_attempts=1) disables retries)."""
+    global _retry_policy
+    _retry_policy = policy or DEFAULT_RETRY_POLICY
+
+
+def get_retry_stats() -> dict:
+    """Snapshot of retry counters since process start."""
+    with _retry_stats_lock:
+        stats = dict(_retry_stats)
+        stats["retries_by_error"] = dict(_retry_stats["retries_by_error"])
+    return stats
+
+
+def _count(key: str, error_key: str = None) -> None:
+    with _retry_stats_lock:
+        _retry_stats[key] += 1
+        if error_key:
+            by_error = _retry_stats["retries_by_error"]
+            by_error[error_key] = by_error.get(error_key, 0) + 1
+
+
+# ---------------------------------------------------------------------------
+# Egress proxy pool (optional)
+# ---------------------------------------------------------------------------
+
+_proxy_pool = None
+
+
+def set_proxy_pool(pool) -> None:
+    """Route all scrapes through *pool* (a services.proxy_pool.ProxyPool), or None for direct."""
+    global _proxy_pool
+    _proxy_pool = pool
+
+
+def get_proxy_pool():
+    """Return the process-wide proxy pool, or None if scraping goes out directly."""
+    return _proxy_pool
+
+
+# ---------------------------------------------------------------------------
+# In-flight memory budget (optional)
+# ---------------------------------------------------------------------------
+
+_memory_budget = None
+
+
+def set_memory_budget(budget) -> None:
+    """Admit fetches against *budget* (a services.memory_governor.ByteBudget), or None for no limit."""
+    global _memory_budget
+    _memory_budget = budget
+
+
+def get_memory_stats():
+    """Budget usage (in_use, peak, waits, timeouts), or None if no budget is installed."""
+    return _memory_budget.stats() if _memory_budget else None
+
+
+def _grow(reservation, nbytes: int, timeout: float, url: str) -> None:
+    try:
+        reservation.grow_to(nbytes, timeout=timeout)
+    except BudgetTimeout as exc:
+        logger.warning("memory budget exhausted | url=%.120s requested=%d", url, exc.requested)
+        raise MemoryBudgetError() from exc
+
+
+# ---------------------------------------------------------------------------
+# Content-addressed result store (optional)
+# ---------------------------------------------------------------------------
+
+# Formats whose extraction is worth caching (html is just a decode, json is
+# parsed while it streams in, so there is nothing left to skip)
+CACHED_FORMATS = ("text", "structured")
+
+_result_store = None
+
+
+def set_result_store(store) -> None:
+    """Reuse extraction results for identical bodies via *store* (a services.result_store.ResultStore), or None."""
+    global _result_store
+    _result_store = store
+
+
+def get_result_store():
+    """Return the process-wide result store, or None if results are not cached."""
+    return _result_store
+
+
+def _result_key(content_hash: str, format: str, encoding: str, base_url: str) -> str:
+    # The same bytes decode differently per charset, and structured output
+    # resolves links against the final URL, so both are part of the key
+    scope = base_url if format == "structured" else ""
+    raw = f"{content_hash}|{format}|{encoding.lower()}|{scope}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def result_hash(content_hash: str, format: str, select=None) -> str:
+    """
+    Identify one job result: the same body hash yields different content per
+    format and *select*, so submit dedup keys on all three.
+    """
+    raw = json.dumps([content_hash, format, select], separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Process pool for extraction (optional)
+# ---------------------------------------------------------------------------
+
+_parse_pool = None
+
+
+def set_parse_pool(pool) -> None:
+    """Run text/structured extraction in *pool* (a services.parse_pool.ParsePool), or None for inline."""
+    global _parse_pool
+    _parse_pool = pool
+
+
+def get_parse_pool():
+    """Return the process-wide parse pool, or None if extraction runs in the fetching thread."""
+    return _parse_pool
+
+
+# Tags removed before text extraction (boilerplate / non-content)
+_NON_CONTENT_TAGS = ["script", "style", "nav", "footer", "header"]
+
+
+def _extract_text(soup) -> str:
+    """Strip non-content tags from *soup* (in place) and return visible text."""
+    for element in soup(_NON_CONTENT_TAGS):
+        element.decompose()
+    return soup.get_text(separator=" ", strip=True)
+
+
+def normalize_link(href: str, base_url: str):
+    """
+    Resolve *href* against *base_url* and normalize it for deduplication.
+    Returns None for non-http(s) links (mailto:, javascript:, data:, ...).
+    """
+    href = href.strip()
+    if not href:
+        return None
+    try:
+        parts = urlsplit(urljoin(base_url, href))
+        port = parts.port   # raises ValueError for a non-numeric or out-of-range port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not parts.hostname:
+        return None
+
+    netloc = parts.hostname.lower()
+    if ":" in netloc:
+        netloc = f"[{netloc}]"  # IPv6 literal; hostname strips the brackets
+    if port and not (scheme == "http" and port == 80 or scheme == "https" and port == 443):
+        netloc = f"{netloc}:{port}"
+    if parts.username:
+        auth = parts.username + (f":{parts.password}" if parts.password else "")
+        netloc = f"{auth}@{netloc}"
+
+    # Fragments never change the fetched document, so they are dropped
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def extract_content(text: str, format: str, base_url: str):
+    """Format a decoded document: html as-is, text or structured extraction."""
+    if format == "html":
+        return text
+    soup = BeautifulSoup(text, "html.parser")
+    if format == "structured":
+        return _extract_structured(soup, base_url)
+    return _extract_text(soup)  # text (default)
+
+
+def _extract_structured(soup, base_url: str) -> dict:
+    """
+    Extract title, meta tags, canonical URL, links, JSON-LD and text from an
+    already-parsed document. Metadata is collected in a single document-order
+    walk before boilerplate is stripped for the text.
+    """
+    title = ""
+    meta = {}
+    canonical = None
+    links = []
+    seen_links = set()
+    json_ld = []
+    base_href = base_url
+    base_seen = False
+
+    for tag in soup.find_all(["base", "title", "meta", "link", "a", "script"]):
+        name = tag.name
+        if name == "a":
+            link = normalize_link(tag.get("href") or "", base_href)
+            if link and link not in seen_links:
+                seen_links.add(link)
+                links.append(link)
+        elif name == "meta":
+            key = tag.get("property") or tag.get("name") or tag.get("http-equiv")
+            content = tag.get("content")
+            if key and content is not None and key.lower() not in meta:
+                meta[key.lower()] = content.strip()
+        elif name == "script":
+            if (tag.get("type") or "").strip().lower() == "application/ld+json":
+                try:
+                    data = json.loads(tag.string or "")
+                except (ValueError, TypeError):
+                    continue  # malformed JSON-LD is common; skip it
+                if isinstance(data, list):
+                    json_ld.extend(data)
+                else:
+                    json_ld.append(data)
+        elif name == "link":
+            rel = tag.get("rel") or []
+            if canonical is None and "canonical" in [r.lower() for r in rel]:
+                canonical = normalize_link(tag.get("href") or "", base_href)
+        elif name == "title":
+            if not title:
+                title = tag.get_text(strip=True)
+        elif name == "base":
+            # Only the first <base href> counts (HTML spec)
+            if tag.get("href") and not base_seen:
+                base_seen = True
+                base_href = urljoin(base_url, tag["href"].strip())
+
+    return {
+        "url": base_url,
+        "title": title,
+        "meta": meta,
+        "canonical_url": canonical,
+        "links": links,
+        "json_ld": json_ld,
+        "text": _extract_text(soup),
+    }
+
+
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
-def local_scrape(url: str, format: str = "text") -> str:
+def local_scrape(url: str, format: str = "text", select=None, proxy_pool=None,
+                 retry_policy: RetryPolicy = None, with_hash: bool = False) -> str:
     """
     Scrape a URL and return content.
 
     Args:
         url: URL to scrape
-        format: Output format — "text", "html", or "json"
+        format: Output format — "text", "html", "json" or "structured"
+                ("structured" returns a dict with url, title, meta,
+                canonical_url, links, json_ld and text from a single parse)
+        select: format=="json" only — list of JSON pointers ("/data/items")
+                or path lists (["data", "items"]). The body is validated while
+                it streams in and only the selected subtrees are materialized;
+                returns {pointer: value} for the pointers that exist
+        proxy_pool: ProxyPool to send the request through (defaults to the
+                    pool installed with set_proxy_pool, if any)
+        retry_policy: RetryPolicy for transient failures (defaults to the
+                      policy installed with set_retry_policy)
+        with_hash: also return the sha256 hex digest of the raw (decompressed)
+                   body, which identifies the content for dedup on submit
 
     Returns:
-        Scraped content as string (or parsed dict for json)
+        Scraped content as string (or parsed dict for json/structured), or
+        (content, content_hash) if *with_hash*. text/structured results for a
+        body seen before come from the result store instead of a re-parse.
 
     Raises:
         InvalidURLError:          Malformed or missing URL
+        InvalidSelectError:       *select* is not a list of valid pointers
         TimeoutError_:            Target did not respond within TIMEOUT
+                                  (or the retry budget)
         SSLError:                 TLS/SSL handshake failed
         DNSError:                 Domain could not be resolved
         ConnectionRefusedError_:  Target actively refused the TCP connection
+        ProxyConnectionError:     Egress proxy could not be reached
+        MemoryBudgetError:        Not admitted under the in-flight memory budget
         HostUnreachableError:     Network path to host is unreachable
         HTTPError:                Target returned a non-2xx status
         ResponseTooLargeError:    Body exceeded MAX_SIZE
@@ -221,7 +653,70 @@ def local_scrape(url: str, format: str = "text") -> str:
     # --- input validation --------------------------------------------------
     _validate_url(url)
     url = url.strip()
+    if select is not None:
+        if not isinstance(select, (list, tuple)):
+            raise InvalidSelectError()
+        try:
+            for selector in select:
+                parse_pointer(selector)
+        except ValueError as exc:
+            raise InvalidSelectError(str(exc)) from exc
+
+    # --- fetch with retries -----------------------------------------------
+    policy = retry_policy or _retry_policy
+    pool = proxy_pool or _proxy_pool
+    deadline = policy.clock() + policy.budget
+    _count("scrapes")
+    attempt = 1
+    while True:
+        timeout = min(TIMEOUT, max(0.1, deadline - policy.clock()))
+        _count("attempts")
+        try:
+            result, content_hash = _scrape_once(url, format, select, pool, timeout)
+        except ScraperException as exc:
+            if not policy.is_retryable(exc):
+                raise
+            if attempt >= policy.max_attempts:
+                if attempt > 1:
+                    _count("exhausted")
+                raise
+            delay = policy.backoff(attempt, exc)
+            if policy.clock() + delay + policy.MIN_ATTEMPT_TIME > deadline:
+                _count("budget_exceeded")
+                logger.warning("retry budget exhausted | url=%.120s attempts=%d", url, attempt)
+                raise
+            code = exc.error_code
+            if isinstance(exc, HTTPError):
+                code = f"http_{exc.http_status_code}"
+            _count("retries", code)
+            logger.info("retrying scrape | url=%.120s attempt=%d error=%s delay=%.2fs",
+                        url, attempt + 1, code, delay)
+            policy.sleep(delay)
+            attempt += 1
+            continue
+        if attempt > 1:
+            _count("recovered")
+        return (result, content_hash) if with_hash else result
+
+
+def _scrape_once(url: str, format: str, select, pool, timeout: float):
+    """One fetch + parse attempt. Returns (result, content_hash); see local_scrape."""
+    budget = _memory_budget
+    if budget is None:
+        return _fetch_and_parse(url, format, select, pool, timeout, None)
+
+    # Admission: block (bounded by the attempt timeout) until the budget has room
+    try:
+        reservation = budget.reserve(INITIAL_RESERVATION,
+                                     timeout=min(budget.admission_timeout, timeout))
+    except BudgetTimeout as exc:
+        logger.warning("memory budget exhausted | url=%.120s in_use=%d", url, exc.in_use)
+        raise MemoryBudgetError() from exc
+    with reservation:
+        return _fetch_and_parse(url, format, select, pool, timeout, reservation)
+
 
+def _fetch_and_parse(url: str, format: str, select, pool, timeout: float, reservation):
     headers = {
         "User-Agent": random.choice(USER_AGENTS),
         "Accept": "text/html,application/json;q=0.9,*/*;q=0.8",
@@ -229,89 +724,150 @@ def local_scrape(url: str, format: str = "text") -> str:
     }
 
     # --- network fetch -----------------------------------------------------
+    proxy = pool.choose(url) if pool else None
+    started = time.monotonic()
     try:
         resp = requests.get(
             url,
             headers=headers,
-            timeout=TIMEOUT,
+            timeout=timeout,
             stream=True,
             allow_redirects=True,
             verify=True,           # enforce SSL verification
+            proxies={"http": proxy, "https": proxy} if proxy else None,
         )
-    except requests.exceptions.SSLError as exc:
-        logger.warning("ssl error | url=%.120s error=%s", url, str(exc)[:120])
-        raise SSLError() from exc
-    except requests.exceptions.Timeout as exc:
-        logger.warning("timeout | url=%.120s", url)
-        raise TimeoutError_() from exc
-    except requests.exceptions.ConnectionError as exc:
-        logger.warning("connection error | url=%.120s error=%s", url, str(exc)[:120])
-        raise _map_connection_error(exc) from exc
     except requests.exceptions.RequestException as exc:
-        logger.error("unexpected request error | url=%.120s type=%s", url, type(exc).__name__)
-        raise ScraperException(
-            "HTTP request failed. Please verify the URL and try again.",
-            "connection_error", 502
-        ) from exc
+        if proxy:
+            pool.report(proxy, url, ok=False,
+                        proxy_failure=isinstance(exc, requests.exceptions.ProxyError))
+        raise _map_request_exception(exc, url) from exc
+
+    if proxy:
+        pool.report(proxy, url, ok=resp.status_code not in PROXY_BLOCK_STATUSES,
+                    latency=time.monotonic() - started)
 
     # --- HTTP status -------------------------------------------------------
     if resp.status_code < 200 or resp.status_code >= 300:
         logger.warning("http error | url=%.120s status=%d", url, resp.status_code)
-        raise HTTPError(resp.status_code)
+        retry_after = _parse_retry_after(resp.headers.get("Retry-After"))
+        resp.close()
+        raise HTTPError(resp.status_code, retry_after)
 
     # --- read body with size cap -------------------------------------------
+    # JSON is parsed incrementally as it arrives instead of being buffered
+    encoding = resp.encoding or "utf-8"
+    json_parser = None
+    if format == "json":
+        try:
+            json_parser = StreamingJSONParser(select, encoding)
+        except LookupError as exc:
+            logger.error("decode error | url=%.120s encoding=%s", url, encoding)
+            raise ParsingError(f"failed to decode response with encoding '{encoding}'") from exc
+
+    # Reserve the whole footprint up front when the (uncompressed) size is known,
+    # otherwise grow the reservation in INITIAL_RESERVATION steps as bytes arrive
+    factor = FOOTPRINT_FACTOR.get(format, FOOTPRINT_FACTOR["text"])
+    if reservation is not None:
+        length = resp.headers.get("Content-Length", "")
+        if length.isdigit() and not resp.headers.get("Content-Encoding"):
+            try:
+                _grow(reservation, min(int(length), MAX_SIZE) * factor, timeout, url)
+            except MemoryBudgetError:
+                resp.close()
+                raise
+
     content = bytearray()
+    received = 0
+    hasher = hashlib.sha256()
     try:
         for chunk in resp.iter_content(chunk_size=8192):
             if chunk:
-                content.extend(chunk)
-                if len(content) > MAX_SIZE:
-                    logger.warning("response too large | url=%.120s size=%d", url, len(content))
-                    raise ResponseTooLargeError(len(content))
-    except ResponseTooLargeError:
+                received += len(chunk)
+                if received > MAX_SIZE:
+                    logger.warning("response too large | url=%.120s size=%d", url, received)
+                    raise ResponseTooLargeError(received)
+                hasher.update(chunk)
+                if reservation is not None and received * factor > reservation.nbytes:
+                    _grow(reservation, (received + INITIAL_RESERVATION) * factor, timeout, url)
+                if json_parser is not None:
+                    json_parser.feed(chunk)
+                else:
+                    content.extend(chunk)
+    except (ResponseTooLargeError, MemoryBudgetError):
+        resp.close()
         raise  # re-raise our own error
+    except JSONStreamError as exc:
+        logger.warning("invalid json | url=%.120s", url)
+        raise InvalidJSONError() from exc
+    except requests.exceptions.ContentDecodingError as exc:
+        logger.error("content decoding error | url=%.120s", url)
+        raise ParsingError("failed to decode response body") from exc
+    except (requests.exceptions.ChunkedEncodingError, requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout) as exc:
+        resp.close()
+        raise _map_body_error(exc, url) from exc
     except Exception as exc:
         logger.error("read error | url=%.120s type=%s", url, type(exc).__name__)
         raise ParsingError("failed to read response body") from exc
 
     # --- empty check -------------------------------------------------------
-    if len(content) == 0:
+    if received == 0:
         logger.warning("empty response | url=%.120s", url)
         raise EmptyResponseError()
 
-    # --- decode ------------------------------------------------------------
-    encoding = resp.encoding or "utf-8"
-    try:
-        text = bytes(content).decode(encoding, errors="replace")
-    except Exception as exc:
-        logger.error("decode error | url=%.120s encoding=%s", url, encoding)
-        raise ParsingError(f"failed to decode response with encoding '{encoding}'") from exc
-
-    # --- format output -----------------------------------------------------
-    try:
-        if format == "html":
-            result = text
-
-        elif format == "json":
-            try:
-                result = json.loads(text)
-            except json.JSONDecodeError as exc:
-                logger.warning("invalid json | url=%.120s", url)
-                raise InvalidJSONError() from exc
-
-        else:  # text (default)
-            soup = BeautifulSoup(text, "html.parser")
-            for element in soup(["script", "style", "nav", "footer", "header"]):
-                element.decompose()
-            result = soup.get_text(separator=" ", strip=True)
-    except (InvalidJSONError, EmptyResponseError):
-        raise  # already the right type
-    except Exception as exc:
-        logger.error("parsing error | url=%.120s format=%s type=%s", url, format, type(exc).__name__)
-        raise ParsingError(str(exc)) from exc
+    if json_parser is not None:
+        try:
+            result = json_parser.close()
+        except JSONStreamError as exc:
+            logger.warning("invalid json | url=%.120s", url)
+            raise InvalidJSONError() from exc
+        logger.info("local_scrape success | url=%.120s format=%s", url, format)
+        return result, hasher.hexdigest()
+
+    # --- reuse a previous extraction of identical bytes --------------------
+    content_hash = hasher.hexdigest()
+    base_url = resp.url or url
+    store = _result_store
+    store_key = None
+    if store is not None and format in CACHED_FORMATS:
+        store_key = _result_key(content_hash, format, encoding, base_url)
+        cached = store.get(store_key)
+        if cached is not None:
+            logger.info("local_scrape success (cached) | url=%.120s format=%s", url, format)
+            return cached, content_hash
+
+    # --- decode + format output (in the parse pool for large HTML) ---------
+    parse_pool = _parse_pool
+    result = None
+    if parse_pool is not None and format in CACHED_FORMATS and received >= parse_pool.min_bytes:
+        try:
+            result = parse_pool.parse(content, encoding, format, base_url)
+        except BrokenExecutor:
+            logger.error("parse pool unavailable, parsing inline | url=%.120s", url)
+        except LookupError as exc:
+            logger.error("decode error | url=%.120s encoding=%s", url, encoding)
+            raise ParsingError(f"failed to decode response with encoding '{encoding}'") from exc
+        except Exception as exc:
+            logger.error("parsing error | url=%.120s format=%s type=%s", url, format, type(exc).__name__)
+            raise ParsingError(str(exc)) from exc
+
+    if result is None:
+        try:
+            text = content.decode(encoding, errors="replace")
+        except Exception as exc:
+            logger.error("decode error | url=%.120s encoding=%s", url, encoding)
+            raise ParsingError(f"failed to decode response with encoding '{encoding}'") from exc
+        try:
+            result = extract_content(text, format, base_url)
+        except Exception as exc:
+            logger.error("parsing error | url=%.120s format=%s type=%s", url, format, type(exc).__name__)
+            raise ParsingError(str(exc)) from exc
+
+    if store_key is not None:
+        store.put(store_key, result)
 
     logger.info("local_scrape success | url=%.120s format=%s", url, format)
-    return result
+    return result, content_hash
 
 
 if __name__ == "__main__":
@@ -0,0 +1,259 @@
+"""
+WattNode Token Budget
+Pre-dispatch prompt sizing: count tokens, check prompt + max_tokens against
+the model's context window, and reject or trim before any queue time is spent.
+
+Counting uses the model's Hugging Face tokenizer when `transformers` is
+installed and the model name is a Hub id; otherwise a byte-length estimate
+(~CHARS_PER_TOKEN bytes per token) with ESTIMATE_SLACK of tolerance in each
+direction, so estimates never reject a prompt that might fit.
+
+Context windows come from Ollama's /api/show (num_ctx if the model sets it,
+else OLLAMA_CONTEXT_LENGTH if the operator sets it, capped by the trained
+context), or from the model config for gateway models. An Ollama model with
+neither is not checked: its real window is the server's default, which this
+process cannot see.
+
+Tokenizers, model configs and /api/show answers are fetched once per model
+in a background thread; until one is ready, counts are estimated, gateway
+models use DISTRIBUTED_CONTEXT_LENGTH and Ollama models are not checked. A
+failed /api/show is retried after SHOW_RETRY seconds. The job dispatch path
+never waits on a download or on an unreachable Ollama.
+
+Policies (INFERENCE_TOKEN_POLICY):
+    reject  over-length requests fail before dispatch
+    trim    shrink max_tokens (down to MIN_COMPLETION_TOKENS), then drop the
+            oldest part of the prompt, as Ollama itself does (default)
+    off     no checks
+
+Every plan carries a predicted cost in decode-token equivalents (prefill is
+batched, so a prompt token costs about 1/PREFILL_DISCOUNT of a generated
+one); the daemon uses it to run cheap jobs first.
+"""
+
+import os
+import time
+import logging
+import threading
+
+import requests
+
+logger = logging.getLogger("wattnode.token_budget")
+
+POLICIES = ("reject", "trim", "off")
+DEFAULT_POLICY = os.environ.get("INFERENCE_TOKEN_POLICY", "trim")
+
+CHARS_PER_TOKEN = 4.0           # UTF-8 bytes per token for the estimate
+ESTIMATE_SLACK = 0.15
+MIN_COMPLETION_TOKENS = 64      # trim never leaves less room than this to answer
+PREFILL_DISCOUNT = 8
+
+# Context Ollama serves for models without num_ctx; unset: such models are not checked
+OLLAMA_CONTEXT_LENGTH = int(os.environ.get("OLLAMA_CONTEXT_LENGTH", "0")) or None
+SHOW_RETRY = 30         # seconds before a failed /api/show is tried again
+DISTRIBUTED_CONTEXT_LENGTH = int(os.environ.get("DISTRIBUTED_CONTEXT_LENGTH", "8192"))
+
+_lock = threading.Lock()
+_tokenizers = {}        # model -> tokenizer, or None when only estimates are possible
+_contexts = {}          # (backend, url, model) -> context length, None if unknown
+_show_failed = {}       # (backend, url, model) -> monotonic time of the last failed /api/show
+_loading = set()        # background loads in progress
+_stats = {"checked": 0, "rejected": 0, "trimmed": 0, "estimated": 0}
+
+
+def _load_in_background(key, load):
+    """Run load() once per *key* in a daemon thread (it stores its own result)."""
+    with _lock:
+        if key in _loading:
+            return
+        _loading.add(key)
+
+    def run():
+        try:
+            load()
+        finally:
+            with _lock:
+                _loading.discard(key)
+
+    threading.Thread(target=run, name="token-budget-load", daemon=True).start()
+
+
+def _load_tokenizer(model):
+    tokenizer = None
+    try:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(model)
+    except ImportError:
+        pass
+    except Exception as e:
+        logger.info(f"No tokenizer for {model}, estimating token counts: {e}")
+    with _lock:
+        _tokenizers[model] = tokenizer
+
+
+def get_tokenizer(model):
+    """Cached Hugging Face tokenizer for *model*, or None (also while it is still loading)."""
+    with _lock:
+        if model in _tokenizers:
+            return _tokenizers[model]
+        if "/" not in model:    # Hub ids; Ollama names ("llama3:8b") have no HF tokenizer
+            _tokenizers[model] = None
+            return None
+    _load_in_background(("tokenizer", model), lambda: _load_tokenizer(model))
+    return None
+
+
+def count_tokens(text, model):
+    """(tokens, exact) for *text* under *model*'s tokenizer, or a byte-length estimate."""
+    tokenizer = get_tokenizer(model)
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False)), True
+    return int(len(text.encode("utf-8")) / CHARS_PER_TOKEN) + 1, False
+
+
+def trim_to(text, model, tokens):
+    """Keep the last *tokens* tokens of *text* (the most recent context)."""
+    tokenizer = get_tokenizer(model)
+    if tokenizer is not None:
+        ids = tokenizer.encode(text, add_special_tokens=False)
+        return tokenizer.decode(ids[-tokens:]) if tokens > 0 else ""
+    # Cut on the conservative side of the estimate, at a UTF-8 boundary
+    keep = int(tokens * CHARS_PER_TOKEN / (1 + ESTIMATE_SLACK))
+    data = text.encode("utf-8")
+    if keep <= 0:
+        return ""
+    tail = data[-keep:].decode("utf-8", "ignore")
+    space = tail.find(" ", 0, 32)
+    if len(data) > keep and space >= 0:
+        tail = tail[space + 1:]     # start at a word boundary
+    return tail
+
+
+def _load_ollama_context(key, base_url, model):
+    try:
+        resp = requests.post(f"{base_url}/api/show", json={"model": model}, timeout=(5, 10))
+        resp.raise_for_status()
+        info = resp.json()
+    except Exception as e:
+        logger.debug(f"/api/show failed for {model}: {e}")
+        with _lock:
+            _show_failed[key] = time.monotonic()
+        return
+    trained = next((v for k, v in (info.get("model_info") or {}).items()
+                    if k.endswith(".context_length")), None)
+    num_ctx = None
+    for line in (info.get("parameters") or "").splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[0] == "num_ctx":
+            num_ctx = int(parts[1])
+    length = num_ctx or OLLAMA_CONTEXT_LENGTH
+    if length and trained:
+        length = min(length, int(trained))
+    with _lock:
+        _contexts[key] = length
+        _show_failed.pop(key, None)
+
+
+def _load_config_context(key, model):
+    length = DISTRIBUTED_CONTEXT_LENGTH
+    try:
+        from transformers import AutoConfig
+        length = AutoConfig.from_pretrained(model).max_position_embeddings
+    except Exception:
+        pass
+    with _lock:
+        _contexts[key] = length
+
+
+def context_length(backend, model, base_url=None):
+    """Context window in tokens for *model* on *backend*, or None while it is unknown."""
+    key = (backend, base_url, model)
+    with _lock:
+        if key in _contexts:
+            return _contexts[key]
+        failed_at = _show_failed.get(key)
+    if backend == "ollama":
+        if failed_at is None or time.monotonic() - failed_at >= SHOW_RETRY:
+            _load_in_background(("show",) + key, lambda: _load_ollama_context(key, base_url, model))
+        return None
+    _load_in_background(("config", model), lambda: _load_config_context(key, model))
+    return DISTRIBUTED_CONTEXT_LENGTH   # until the model config is loaded
+
+
+def predicted_cost(prompt_tokens, max_tokens):
+    """Relative cost of a request in decode-token equivalents."""
+    return round(prompt_tokens / PREFILL_DISCOUNT + max_tokens, 1)
+
+
+def plan(prompt, model, max_tokens, context, policy=None, used_tokens=0):
+    """
+    Check *prompt* + *max_tokens* (+ *used_tokens* already in a session)
+    against *context* and apply *policy*.
+
+    Returns {"action": "ok"|"trimmed"|"rejected"|"unchecked", "prompt",
+    "max_tokens", "prompt_tokens", "context_length", "estimated", "cost"}
+    plus "error" when rejected.
+    """
+    policy = policy or DEFAULT_POLICY
+    if policy not in POLICIES:
+        raise ValueError(f"Invalid token policy: {policy}. Valid: {list(POLICIES)}")
+    prompt_tokens, exact = count_tokens(prompt, model)
+    result = {
+        "action": "ok",
+        "prompt": prompt,
+        "max_tokens": max_tokens,
+        "prompt_tokens": prompt_tokens,
+        "context_length": context,
+        "estimated": not exact,
+        "cost": predicted_cost(prompt_tokens + used_tokens, max_tokens),
+    }
+    if policy == "off" or not context:
+        result["action"] = "unchecked"
+        return result
+
+    # Estimates only count as over-length when they are clearly over
+    low = prompt_tokens if exact else int(prompt_tokens * (1 - ESTIMATE_SLACK))
+    high = prompt_tokens if exact else int(prompt_tokens * (1 + ESTIMATE_SLACK)) + 1
+    with _lock:
+        _stats["checked"] += 1
+        _stats["estimated"] += not exact
+    if used_tokens + low + max_tokens <= context:
+        return result
+
+    if policy == "trim":
+        room = context - used_tokens - high
+        floor = min(max_tokens, MIN_COMPLETION_TOKENS)
+        if room >= floor:
+            result.update(action="trimmed", max_tokens=room)
+        else:
+            keep = context - used_tokens - floor
+            if keep > 0:
+                trimmed = trim_to(prompt, model, keep)
+                result.update(action="trimmed", prompt=trimmed, max_tokens=floor,
+                              prompt_tokens=count_tokens(trimmed, model)[0])
+        if result["action"] == "trimmed":
+            result["cost"] = predicted_cost(result["prompt_tokens"] + used_tokens, result["max_tokens"])
+            with _lock:
+                _stats["trimmed"] += 1
+            return result
+
+    with _lock:
+        _stats["rejected"] += 1
+    result["action"] = "rejected"
+    result["error"] = (f"Prompt too long for {model}: {'~' if not exact else ''}{prompt_tokens} tokens"
+                       f"{f' + {used_tokens} in session' if used_tokens else ''}"
+                       f" + max_tokens {max_tokens} > context {context}")
+    return result
+
+
+def set_token_policy(policy):
+    """Change the default policy (e.g. from the node config)."""
+    global DEFAULT_POLICY
+    if policy not in POLICIES:
+        raise ValueError(f"Invalid token policy: {policy}. Valid: {list(POLICIES)}")
+    DEFAULT_POLICY = policy
+
+
+def get_budget_stats():
+    with _lock:
+        return dict(_stats, policy=DEFAULT_POLICY)
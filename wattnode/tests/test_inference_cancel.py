@@ -0,0 +1,92 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.inference import OllamaBackend, DistributedBackend
+
+
+class StallingServer:
+    """Accepts generate requests and sends nothing for *stall* seconds (model load / prefill)."""
+
+    def __init__(self, stall=10):
+        self.disconnected = threading.Event()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                data = b'{"models": []}'
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                self.connection.settimeout(stall)
+                try:
+                    if self.rfile.read(1) == b"":    # the client hung up
+                        server.disconnected.set()
+                except OSError:
+                    return
+                self.close_connection = True
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+            def handle_error(self, request, client_address):
+                pass
+
+        self.httpd = Server(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def stalling():
+    server = StallingServer()
+    yield server
+    server.close()
+
+
+def _run_and_cancel(stream, cancel_event, after=0.3):
+    threading.Timer(after, cancel_event.set).start()
+    started = time.monotonic()
+    events = list(stream)
+    return events, time.monotonic() - started
+
+
+def test_ollama_cancel_before_first_token_closes_connection(stalling):
+    cancel = threading.Event()
+    stream = OllamaBackend(base_url=stalling.url).generate_stream(
+        "hello", model="m", cancel_event=cancel, session_id=None)
+
+    events, elapsed = _run_and_cancel(stream, cancel)
+
+    assert events[-1]["cancelled"] and not events[-1]["success"]
+    assert "unavailable" not in events[-1]      # an abort does not count against health
+    assert elapsed < 2
+    assert stalling.disconnected.wait(2)
+
+
+def test_gateway_cancel_before_first_token_closes_connection(stalling):
+    cancel = threading.Event()
+    stream = DistributedBackend(gateway_url=stalling.url).generate_stream(
+        "hello", model="m", cancel_event=cancel)
+
+    events, elapsed = _run_and_cancel(stream, cancel)
+
+    assert events[-1]["cancelled"]
+    assert elapsed < 2
+    assert stalling.disconnected.wait(2)
@@ -0,0 +1,52 @@
+from services.inference_telemetry import Telemetry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def ok(model, ttft_ms=120, backend="ollama"):
+    return {"done": True, "success": True, "backend": backend, "model": model, "ttft_ms": ttft_ms,
+            "latency_ms": 900, "tokens_per_second": 30.0, "eval_count": 10, "prompt_eval_count": 5}
+
+
+def test_histograms_and_totals_per_series():
+    telemetry = Telemetry(clock=FakeClock())
+    telemetry.observe(ok("llama2"))
+    telemetry.observe(ok("llama2", ttft_ms=400))
+    telemetry.observe({"done": True, "success": False, "backend": "ollama", "model": "llama2"})
+    telemetry.observe({"done": True, "success": False, "cancelled": True, "backend": "ollama"})
+
+    series = telemetry.snapshot()["ollama llama2"]
+    assert series["totals"] == {"requests": 3, "errors": 1, "prompt_tokens": 10, "completion_tokens": 20}
+    assert series["ttft_ms"]["count"] == 2
+    assert series["ttft_ms"]["p50"] == 250
+    assert series["ttft_ms"]["p95"] == 500
+
+
+def test_window_ages_out_old_samples():
+    clock = FakeClock()
+    telemetry = Telemetry(window=60, slices=6, clock=clock)
+    telemetry.observe(ok("m"))
+    clock.now += 61
+    series = telemetry.snapshot()["ollama m"]
+    assert series["ttft_ms"]["count"] == 0
+    assert series["totals"]["requests"] == 1
+
+
+def test_unbounded_model_names_fold_into_other():
+    telemetry = Telemetry(max_series=3, clock=FakeClock())
+    for i in range(10):
+        telemetry.observe(ok(f"job-model-{i}"))
+    telemetry.observe(ok("job-model-0"))
+    telemetry.observe(ok("x", backend="distributed"))
+
+    snapshot = telemetry.snapshot()
+    assert sorted(snapshot) == ["distributed other", "ollama job-model-0", "ollama job-model-1",
+                                "ollama job-model-2", "ollama other"]
+    assert snapshot["ollama job-model-0"]["totals"]["requests"] == 2
+    assert snapshot["ollama other"]["totals"]["requests"] == 7
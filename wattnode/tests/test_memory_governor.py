@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+
+from services.memory_governor import ByteBudget, BudgetTimeout
+
+
+def test_sole_holder_may_exceed_budget():
+    budget = ByteBudget(100)
+    with budget.reserve(500) as reservation:
+        assert reservation.nbytes == 500
+    assert budget.stats()["in_use_bytes"] == 0
+
+
+def test_admission_times_out_when_full():
+    budget = ByteBudget(100)
+    with budget.reserve(80):
+        with pytest.raises(BudgetTimeout):
+            budget.reserve(50, timeout=0.05)
+    assert budget.stats()["timeouts"] == 1
+
+
+def test_only_one_grower_overcommits_when_all_holders_wait():
+    budget = ByteBudget(300, admission_timeout=0.5)
+    reservations = [budget.reserve(100) for _ in range(3)]
+    outcomes = []
+
+    def grow(reservation):
+        try:
+            reservation.grow_to(200)
+            outcomes.append("grown")
+        except BudgetTimeout:
+            outcomes.append("timeout")
+
+    threads = [threading.Thread(target=grow, args=(r,)) for r in reservations]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == ["grown", "timeout", "timeout"]
+    assert budget.stats()["overcommits"] == 1
+    assert budget.stats()["in_use_bytes"] == 400
+
+
+def test_release_lets_waiting_grower_continue():
+    budget = ByteBudget(200, admission_timeout=2)
+    first, second = budget.reserve(100), budget.reserve(100)
+    grown = threading.Event()
+
+    def grow():
+        second.grow_to(200)
+        grown.set()
+
+    threading.Thread(target=grow).start()
+    assert not grown.wait(0.1)      # first is not waiting to grow, so no overcommit
+    first.release()
+    assert grown.wait(1)
+    assert budget.stats()["overcommits"] == 0
@@ -0,0 +1,173 @@
+import json
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services import inference
+from services.inference import OllamaPool
+
+
+class FakeOllama:
+    """Minimal Ollama: /api/tags, /api/ps and a chunked NDJSON /api/generate."""
+
+    def __init__(self, loaded=(), status=200):
+        self.loaded = list(loaded)
+        self.status = status
+        self.generated = 0
+        self.release = threading.Event()     # cleared: hold streams after the first token
+        self.release.set()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, body, status=200):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _chunk(self, body):
+                data = json.dumps(body).encode() + b"\n"
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._json({"models": [{"name": m} for m in fake.loaded]})
+                elif self.path == "/api/ps":
+                    self._json({"models": [{"name": m} for m in fake.loaded]})
+                else:
+                    self._json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if fake.status != 200:
+                    self._json({"error": "boom"}, fake.status)
+                    return
+                fake.generated += 1
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                self._chunk({"model": body["model"], "response": "hi", "done": False})
+                fake.release.wait(10)
+                self._chunk({"model": body["model"], "response": "", "done": True, "eval_count": 1})
+                self.wfile.write(b"0\r\n\r\n")
+
+        class Server(ThreadingHTTPServer):
+            daemon_threads = True
+
+            def handle_error(self, request, client_address):
+                pass    # clients that close a held stream early reset the connection
+
+        self.server = Server(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.release.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def ollama():
+    servers = []
+
+    def start(**kwargs):
+        server = FakeOllama(**kwargs)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def closed_port_url():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def held_stream(pool, model="llama2"):
+    """Start a request and read its first token, keeping it outstanding."""
+    stream = pool.generate_stream("hello", model=model)
+    assert next(stream) == {"token": "hi"}
+    return stream
+
+
+def test_places_on_instance_with_model_loaded(ollama):
+    cold, warm = ollama(), ollama(loaded=["mistral:latest"])
+    pool = OllamaPool([cold.url, warm.url])
+
+    result = pool.generate("hello", model="mistral")
+
+    assert result["success"] and result["instance"] == warm.url
+    assert (cold.generated, warm.generated) == (0, 1)
+    assert pool.stats()[warm.url]["placed_loaded"] == 1
+
+
+def test_least_outstanding_without_loaded_model(ollama):
+    a, b = ollama(), ollama()
+    a.release.clear()
+    pool = OllamaPool([a.url, b.url])
+
+    stream = held_stream(pool)
+    assert pool.stats()[a.url]["outstanding"] == 1
+
+    result = pool.generate("hello")
+    assert result["instance"] == b.url
+
+    a.release.set()
+    final = list(stream)[-1]
+    assert final["success"] and final["instance"] == a.url
+    assert pool.stats()[a.url]["outstanding"] == 0
+
+
+def test_saturated_warm_instance_is_skipped(ollama, monkeypatch):
+    monkeypatch.setattr(inference, "OLLAMA_PARALLEL", 1)
+    cold, warm = ollama(), ollama(loaded=["llama2:latest"])
+    warm.release.clear()
+    pool = OllamaPool([cold.url, warm.url])
+
+    stream = held_stream(pool)
+    assert pool.stats()[warm.url]["outstanding"] == 1
+
+    assert pool.generate("hello")["instance"] == cold.url
+    warm.release.set()
+    stream.close()
+
+
+def test_fails_over_before_first_token(ollama):
+    broken, healthy = ollama(status=500), ollama()
+    pool = OllamaPool([broken.url, healthy.url])
+
+    result = pool.generate("hello")
+
+    assert result["success"] and result["instance"] == healthy.url
+    assert pool.stats()[broken.url]["failovers"] == 1
+
+
+def test_skips_unreachable_instance(ollama):
+    down, up = closed_port_url(), ollama()
+    pool = OllamaPool([down, up.url])
+
+    assert pool.generate("hello")["instance"] == up.url
+    assert pool.stats()[down]["requests"] == 0
+
+
+def test_no_instance_available():
+    pool = OllamaPool([closed_port_url(), closed_port_url()])
+
+    result = pool.generate("hello")
+
+    assert not result["success"] and result["unavailable"]
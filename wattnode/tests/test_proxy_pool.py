@@ -0,0 +1,240 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.request import urlopen
+
+import pytest
+
+from services.proxy_pool import ProxyPool
+from services.scraper import local_scrape, RetryPolicy
+
+A = "http://10.0.0.2:3128"
+B = "http://10.0.0.3:3128"
+URL = "https://example.com/page"
+OTHER_URL = "https://other.org/"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+def make_pool(clock, proxies=(A, B), **kwargs):
+    kwargs.setdefault("explore_rate", 0)
+    kwargs.setdefault("failure_threshold", 2)
+    return ProxyPool(list(proxies), cooldown=30, max_cooldown=120, clock=clock, **kwargs)
+
+
+def test_requires_a_proxy():
+    with pytest.raises(ValueError):
+        ProxyPool(["", "  "])
+
+
+def test_prefers_faster_proxy(clock):
+    pool = make_pool(clock)
+    pool.report(A, URL, ok=True, latency=2.0)
+    pool.report(B, URL, ok=True, latency=0.2)
+    assert pool.choose(URL) == B
+
+
+def test_scores_per_domain(clock):
+    pool = make_pool(clock)
+    for _ in range(5):
+        pool.report(A, URL, ok=True, latency=0.5)
+        pool.report(B, URL, ok=False)
+        pool.report(A, OTHER_URL, ok=False)
+        pool.report(B, OTHER_URL, ok=True, latency=0.5)
+        clock.now += 1000       # outlast cooldowns; only the success rates matter here
+    assert pool.choose(URL) == A
+    assert pool.choose(OTHER_URL) == B
+
+
+def test_cooldown_after_threshold_then_reset_on_success(clock):
+    pool = make_pool(clock)
+    pool.report(A, URL, ok=True, latency=0.1)
+    pool.report(B, URL, ok=True, latency=1.0)
+
+    pool.report(A, URL, ok=False)
+    assert pool.choose(URL) == A            # one failure is below the threshold
+    pool.report(A, URL, ok=False)
+    assert pool.choose(URL) == B
+    assert pool.choose(OTHER_URL) == A      # only cooled down for this domain
+
+    clock.now += 31
+    assert pool.choose(URL) == A
+    pool.report(A, URL, ok=True, latency=0.1)
+    pool.report(A, URL, ok=False)
+    assert pool.choose(URL) == A            # the success reset the failure streak
+
+
+def test_cooldown_doubles_up_to_max(clock):
+    pool = make_pool(clock, proxies=(A,))
+    cooldowns = []
+    for _ in range(5):
+        pool.report(A, URL, ok=False)
+        cooldowns.append(pool.metrics()[A]["domains"]["example.com"]["cooldown_remaining"])
+    assert cooldowns == [0, 30, 60, 120, 120]
+
+
+def test_proxy_failure_cools_proxy_for_every_domain(clock):
+    pool = make_pool(clock)
+    pool.report(A, URL, ok=False, proxy_failure=True)
+    pool.report(A, URL, ok=False, proxy_failure=True)
+    assert pool.choose(URL) == B
+    assert pool.choose(OTHER_URL) == B
+    assert pool.metrics()[A]["cooling_down"]
+    assert pool.metrics()[A]["domains"] == {}
+
+
+def test_all_cooling_falls_back_to_soonest_ready(clock):
+    pool = make_pool(clock)
+    for _ in range(3):
+        pool.report(A, URL, ok=False)       # 60s
+    for _ in range(2):
+        pool.report(B, URL, ok=False)       # 30s
+    assert pool.choose(URL) == B
+
+
+def test_explores_other_ready_proxies(clock):
+    class AlwaysExplore:
+        def random(self):
+            return 0.0
+
+        def choice(self, items):
+            return items[-1]
+
+    pool = make_pool(clock, explore_rate=0.5, rng=AlwaysExplore())
+    pool.report(A, URL, ok=True, latency=0.1)
+    assert pool.choose(URL) == B
+
+
+def test_metrics_redact_credentials(clock):
+    secret = "http://user:pw@10.0.0.4:3128"
+    pool = make_pool(clock, proxies=(secret,))
+    pool.report(secret, URL, ok=True, latency=0.25)
+    metrics = pool.metrics()
+    assert list(metrics) == ["http://***@10.0.0.4:3128"]
+    assert metrics["http://***@10.0.0.4:3128"]["avg_latency_ms"] == 250
+
+
+def test_domain_state_is_bounded_lru(clock):
+    pool = make_pool(clock, max_domains=3)
+    for i in range(5):
+        pool.report(A, f"https://site{i}.example/", ok=True, latency=0.1)
+    pool.report(A, "https://site2.example/", ok=True, latency=0.1)     # refresh
+    pool.report(A, "https://site5.example/", ok=True, latency=0.1)
+    assert sorted(pool.metrics(top_domains=None)[A]["domains"]) == [
+        "site2.example", "site4.example", "site5.example"]
+
+
+def test_metrics_report_top_domains_only(clock):
+    pool = make_pool(clock)
+    for i in range(20):
+        for _ in range(i + 1):
+            pool.report(A, f"https://site{i}.example/", ok=True, latency=0.1)
+    entry = pool.metrics(top_domains=3)[A]
+    assert entry["requests"] == 210
+    assert entry["domains_tracked"] == 20
+    assert list(entry["domains"]) == ["site19.example", "site18.example", "site17.example"]
+
+
+def test_ignores_unknown_proxy(clock):
+    pool = make_pool(clock)
+    pool.report("http://10.9.9.9:1", URL, ok=False)
+    assert len(pool.metrics()) == 2
+
+
+# --- local_scrape through local stand-in proxies ----------------------------
+
+PAGE = b"<html><body><p>hello through the proxy</p></body></html>"
+
+
+def _serve(handle):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            status, body = handle(self.path)
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture
+def servers(monkeypatch):
+    for name in ("NO_PROXY", "no_proxy"):
+        monkeypatch.delenv(name, raising=False)
+    started = []
+
+    def start(handle):
+        server, url = _serve(handle)
+        started.append(server)
+        return url
+
+    yield start
+    for server in started:
+        server.shutdown()
+        server.server_close()
+
+
+def _forward(path):
+    # A plain HTTP proxy receives the absolute target URL as the request path
+    with urlopen(path, timeout=5) as resp:
+        return resp.status, resp.read()
+
+
+def _dead_proxy():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{s.getsockname()[1]}"
+
+
+def _retry_policy():
+    return RetryPolicy(max_attempts=3, base_delay=0, sleep=lambda seconds: None)
+
+
+def test_scrape_fails_over_from_blocked_proxy_and_cools_it_down(clock, servers):
+    target = servers(lambda path: (200, PAGE)) + "/page"
+    blocked = servers(lambda path: (429, b"slow down"))
+    good = servers(_forward)
+    pool = make_pool(clock, proxies=(blocked, good), failure_threshold=1)
+
+    text = local_scrape(target, "text", proxy_pool=pool, retry_policy=_retry_policy())
+
+    assert text == "hello through the proxy"
+    metrics = pool.metrics()
+    assert metrics[blocked]["domains"]["127.0.0.1"]["cooling_down"]
+    assert not metrics[blocked]["cooling_down"]         # the proxy itself answered
+    assert metrics[good]["successes"] == 1
+
+    # While the block cools down, the next scrape goes straight to the good proxy
+    local_scrape(target, "text", proxy_pool=pool, retry_policy=_retry_policy())
+    assert pool.metrics()[blocked]["requests"] == 1
+    clock.now += 31
+    assert not pool.metrics()[blocked]["domains"]["127.0.0.1"]["cooling_down"]
+
+
+def test_unreachable_proxy_cools_down_for_every_domain(clock, servers):
+    target = servers(lambda path: (200, PAGE)) + "/page"
+    dead, good = _dead_proxy(), servers(_forward)
+    pool = make_pool(clock, proxies=(dead, good), failure_threshold=1)
+
+    assert local_scrape(target, "text", proxy_pool=pool, retry_policy=_retry_policy()) == "hello through the proxy"
+    assert pool.metrics()[dead]["cooling_down"]
+    assert pool.choose("https://elsewhere.example/") == good
@@ -0,0 +1,28 @@
+import os
+
+from services.result_store import ResultStore
+
+KEY = "ab" + "0" * 62
+
+
+def test_put_get_and_lru_eviction(tmp_path):
+    store = ResultStore(str(tmp_path), max_bytes=50)     # room for two 21-byte entries
+    store.put(KEY, {"text": "x" * 10})
+    store.put("cd" + "0" * 62, {"text": "y" * 10})
+    assert store.get(KEY) == {"text": "x" * 10}
+    store.put("ef" + "0" * 62, {"text": "z" * 10})    # evicts the least recently used entry
+    assert KEY in store
+    assert store.get("cd" + "0" * 62) is None
+    assert store.stats()["evictions"] == 1
+
+
+def test_index_survives_restart_and_orphaned_temp_files_are_removed(tmp_path):
+    ResultStore(str(tmp_path)).put(KEY, {"text": "kept"})
+    orphan = tmp_path / "ab" / "tmpx1y2z3.tmp"
+    orphan.write_bytes(b'{"partial"')
+
+    store = ResultStore(str(tmp_path))
+
+    assert store.get(KEY) == {"text": "kept"}
+    assert not orphan.exists()
+    assert sorted(os.listdir(tmp_path / "ab")) == [KEY + ".json"]
@@ -0,0 +1,47 @@
+from services.scraper import extract_content, normalize_link, result_hash
+
+BASE = "https://example.com/dir/page.html"
+
+
+def structured(body):
+    return extract_content(f"<html><head><title>T</title></head><body>{body}</body></html>",
+                           "structured", BASE)
+
+
+def test_links_resolved_normalized_and_deduplicated():
+    result = structured('<a href="a#x">1</a><a href="/dir/a">2</a><a href="HTTPS://Example.com:443/b">3</a>'
+                        '<a href="mailto:x@example.com">m</a><a href="http://example.com:8080/c">4</a>')
+    assert result["title"] == "T"
+    assert result["links"] == ["https://example.com/dir/a", "https://example.com/b",
+                               "http://example.com:8080/c"]
+
+
+def test_bad_port_skips_only_that_link():
+    result = structured('<a href="http://x.com:abc/">bad</a><a href="http://x.com:99999/">big</a>'
+                        '<a href="/ok">ok</a>')
+    assert result["links"] == ["https://example.com/ok"]
+
+
+def test_ipv6_host_keeps_brackets():
+    result = structured('<a href="http://[::1]/p">v6</a><a href="http://[2001:DB8::1]:8080/q">v6 port</a>')
+    assert result["links"] == ["http://[::1]/p", "http://[2001:db8::1]:8080/q"]
+
+
+def test_base_href_and_canonical():
+    page = ('<html><head><base href="https://cdn.example.org/root/">'
+            '<link rel="canonical" href="/canon"></head><body><a href="x">x</a></body></html>')
+    result = extract_content(page, "structured", BASE)
+    assert result["canonical_url"] == "https://cdn.example.org/canon"
+    assert result["links"] == ["https://cdn.example.org/root/x"]
+
+
+def test_normalize_link_rejects_non_http():
+    assert normalize_link("javascript:void(0)", BASE) is None
+    assert normalize_link("  ", BASE) is None
+
+
+def test_result_hash_depends_on_format_and_select():
+    body = "0" * 64
+    assert result_hash(body, "text") == result_hash(body, "text", None)
+    assert result_hash(body, "text") != result_hash(body, "html")
+    assert result_hash(body, "json", ["/a"]) != result_hash(body, "json", ["/b"])
@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 """
 WattNode - Light Node Daemon for WattCoin Network
-Earn WATT by completing scrape/inference jobs
+Earn WATT by completing scrape/inference/embed jobs
 
 Usage:
     python wattnode.py register    # One-time registration
@@ -15,12 +15,36 @@ import sys
 import time
 import json
 import argparse
+import threading
 import requests
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 from node_config import load_config, validate_config
-from services.scraper import local_scrape
-from services.inference import local_inference
+from services.scraper import (
+    local_scrape, result_hash, set_proxy_pool, get_proxy_pool,
+    RetryPolicy, set_retry_policy, get_retry_stats,
+    set_memory_budget, get_memory_stats, set_result_store, get_result_store,
+    set_parse_pool
+)
+from services.proxy_pool import ProxyPool, DEFAULT_COOLDOWN
+from services.memory_governor import ByteBudget, DEFAULT_BUDGET_MB
+from services.result_store import ResultStore, DEFAULT_DIR as RESULT_STORE_DIR, DEFAULT_MAX_MB
+from services.parse_pool import ParsePool, default_workers, DEFAULT_CPU_ALLOCATION
+from services.crawler import iter_crawl
+from services.scrape_diff import local_scrape_diff
+from services.inference import (
+    generate, generate_many, budget, get_telemetry, set_response_cache, get_response_cache,
+    set_residency_manager, get_residency_manager, get_residency_stats,
+    get_ollama_pool_stats, OLLAMA_URLS, set_session_store, get_session_store
+)
+from services.inference_cache import ResponseCache, DEFAULT_MAX_MB as CACHE_MAX_MB, DEFAULT_TTL
+from services.inference_sessions import (
+    SessionStore, DEFAULT_MAX_SESSIONS, DEFAULT_MAX_MB as SESSION_MAX_MB, DEFAULT_TTL as SESSION_TTL
+)
+from services.token_budget import set_token_policy, get_budget_stats
+from services.embeddings import embed, encode_vectors, get_batcher
+from services.ollama_residency import ResidencyManager, DEFAULT_KEEP_ALIVE, HOT_KEEP_ALIVE
 
 API_BASE = os.environ.get("WATTCOIN_API_URL", "")
 HEARTBEAT_INTERVAL = 60  # seconds
@@ -41,6 +65,74 @@ class WattNode:
         self.total_earned = 0
         self.running = False
     
+    def _configure_inference(self):
+        """Apply inference settings (token policy, Ollama residency, sessions, response cache) from config"""
+        if self.config.get("inference_token_policy"):
+            set_token_policy(self.config["inference_token_policy"])
+        if "inference" in self.capabilities:
+            session_cfg = self.config.get("inference_sessions") or {}
+            session_mb = session_cfg.get("memory_mb", SESSION_MAX_MB)
+            if session_mb:
+                set_session_store(SessionStore(
+                    max_sessions=session_cfg.get("max_sessions", DEFAULT_MAX_SESSIONS),
+                    max_bytes=int(session_mb * 1024 * 1024),
+                    ttl=session_cfg.get("ttl", SESSION_TTL)
+                ))
+            ollama_cfg = self.config.get("ollama") or {}
+            budget_mb = ollama_cfg.get("memory_budget_mb")
+            # One manager per Ollama instance (the budget applies to each)
+            for url in OLLAMA_URLS:
+                set_residency_manager(ResidencyManager(
+                    url,
+                    budget_bytes=int(budget_mb * 1024 * 1024) if budget_mb else None,
+                    warm_models=ollama_cfg.get("warm_models") or [],
+                    keep_alive=ollama_cfg.get("keep_alive", DEFAULT_KEEP_ALIVE),
+                    hot_keep_alive=ollama_cfg.get("hot_keep_alive", HOT_KEEP_ALIVE)
+                ))
+        cache_cfg = self.config.get("inference_cache") or {}
+        memory_mb = cache_cfg.get("memory_mb", CACHE_MAX_MB)
+        if not memory_mb:
+            return
+        disk = None
+        if cache_cfg.get("disk_mb"):
+            disk = ResultStore(
+                cache_cfg.get("dir", "~/.wattnode/inference_cache"),
+                max_bytes=int(cache_cfg["disk_mb"] * 1024 * 1024)
+            )
+        set_response_cache(ResponseCache(
+            max_bytes=int(memory_mb * 1024 * 1024),
+            ttl=cache_cfg.get("ttl", DEFAULT_TTL),
+            disk=disk
+        ))
+    
+    def _configure_scraper(self):
+        """Apply scraper settings (proxies, retries, memory budget, result cache, parse pool) from config"""
+        scraper_cfg = self.config.get("scraper") or {}
+        budget_mb = scraper_cfg.get("memory_budget_mb", DEFAULT_BUDGET_MB)
+        if budget_mb:
+            set_memory_budget(ByteBudget(int(budget_mb * 1024 * 1024)))
+        cache_mb = scraper_cfg.get("result_cache_mb", DEFAULT_MAX_MB)
+        if cache_mb:
+            set_result_store(ResultStore(
+                scraper_cfg.get("result_cache_dir", RESULT_STORE_DIR),
+                max_bytes=int(cache_mb * 1024 * 1024)
+            ))
+        # Parse in worker processes sized from the CPU allocation (single core: inline)
+        workers = scraper_cfg.get("parse_workers")
+        if workers is None and (os.cpu_count() or 1) > 1:
+            workers = default_workers(self.config.get("cpu_allocation", DEFAULT_CPU_ALLOCATION))
+        if workers:
+            set_parse_pool(ParsePool(int(workers)))
+        retry_cfg = scraper_cfg.get("retry")
+        if retry_cfg is not None:
+            set_retry_policy(RetryPolicy(**retry_cfg))
+        proxies = scraper_cfg.get("proxies") or []
+        if proxies:
+            set_proxy_pool(ProxyPool(
+                proxies,
+                cooldown=scraper_cfg.get("proxy_cooldown", DEFAULT_COOLDOWN)
+            ))
+    
     def _api_call(self, method: str, endpoint: str, data: dict = None) -> dict:
         """Make API call to WattCoin backend"""
         url = f"{API_BASE}{endpoint}"
@@ -97,9 +189,37 @@ class WattNode:
         if not self.node_id:
             return False
         
-        result = self._api_call("POST", "/api/v1/nodes/heartbeat", {
-            "node_id": self.node_id
-        })
+        payload = {"node_id": self.node_id, "scraper_stats": get_retry_stats()}
+        pool = get_proxy_pool()
+        if pool:
+            payload["proxy_metrics"] = pool.metrics()
+        memory = get_memory_stats()
+        if memory:
+            payload["memory_budget"] = memory
+        store = get_result_store()
+        if store:
+            payload["result_cache"] = store.stats()
+        response_cache = get_response_cache()
+        if response_cache:
+            payload["inference_cache"] = response_cache.stats()
+        telemetry = get_telemetry()
+        if telemetry:
+            payload["inference_telemetry"] = telemetry
+        if "inference" in self.capabilities:
+            payload["token_budget"] = get_budget_stats()
+        sessions = get_session_store()
+        if sessions:
+            payload["inference_sessions"] = sessions.stats()
+        residency = get_residency_stats()
+        if residency:
+            payload["ollama_residency"] = residency
+        ollama_pool = get_ollama_pool_stats()
+        if ollama_pool:
+            payload["ollama_pool"] = ollama_pool
+        if "embed" in self.capabilities:
+            payload["embed_batcher"] = get_batcher().stats()
+        
+        result = self._api_call("POST", "/api/v1/nodes/heartbeat", payload)
         
         if result.get("success"):
             self.last_heartbeat = time.time()
@@ -138,21 +258,83 @@ class WattNode:
                 url = payload.get("url")
                 fmt = payload.get("format", "text")
                 print(f"   📄 Scraping: {url[:50]}...")
-                content = local_scrape(url, fmt)
+                if payload.get("diff"):
+                    # Recurring scrape: "unchanged", a diff vs the named snapshot, or full content
+                    since = payload["diff"] if isinstance(payload["diff"], str) else None
+                    result = local_scrape_diff(url, since, fmt)
+                    result.update({"success": True, "status_code": 200})
+                    return result
+                select = payload.get("select")
+                content, content_hash = local_scrape(url, fmt, select=select, with_hash=True)
+                # Backend already holds this result (same body, format and select): send the hash only
+                key = result_hash(content_hash, fmt, select)
+                if key in (payload.get("known_hashes") or []):
+                    return {
+                        "success": True,
+                        "content_hash": content_hash,
+                        "result_hash": key,
+                        "content_ref": True,
+                        "status_code": 200
+                    }
                 return {
                     "success": True,
                     "content": content,
+                    "content_hash": content_hash,
+                    "result_hash": key,
                     "status_code": 200
                 }
             
+            elif job_type == "crawl":
+                return self._execute_crawl(job)
+            
+            elif job_type == "inference" and payload.get("prompts"):
+                # Batch job: many prompts, run concurrently, results in order
+                prompts = payload["prompts"]
+                print(f"   🧠 Running inference batch: {len(prompts)} prompts...")
+                batch = generate_many(
+                    prompts,
+                    model=payload.get("model", "llama2"),
+                    max_tokens=payload.get("max_tokens", 500),
+                    temperature=payload.get("temperature", 0.7),
+                    seed=payload.get("seed")
+                )
+                return {"success": True, **batch}
+            
             elif job_type == "inference":
                 prompt = payload.get("prompt")
                 model = payload.get("model", "llama2")
                 print(f"   🧠 Running inference: {prompt[:30]}...")
-                response = local_inference(prompt, model)
+                result = generate(
+                    prompt,
+                    model=model,
+                    max_tokens=payload.get("max_tokens", 500),
+                    temperature=payload.get("temperature", 0.7),
+                    seed=payload.get("seed"),
+                    session_id=payload.get("session_id"),
+                    history=payload.get("history")
+                )
+                if not result.get("success"):
+                    return {"success": False, "error": result.get("error")}
+                response = {
+                    "success": True,
+                    "response": result.get("response"),
+                    "cached": result.get("cached", False)
+                }
+                if result.get("session"):
+                    response["session"] = result["session"]
+                return response
+            
+            elif job_type == "embed":
+                texts = payload.get("texts") or []
+                print(f"   🔢 Embedding: {len(texts)} texts...")
+                result = embed(texts, model=payload.get("model"))
+                if not result.get("success"):
+                    return {"success": False, "error": result.get("error")}
                 return {
                     "success": True,
-                    "response": response
+                    "model": result.get("model"),
+                    "backend": result.get("backend"),
+                    "embeddings": encode_vectors(result["embeddings"])
                 }
             
             else:
@@ -161,6 +343,107 @@ class WattNode:
         except Exception as e:
             return {"success": False, "error": str(e)}
     
+    def schedule_jobs(self, jobs: list) -> list:
+        """Skip inference jobs that cannot fit the model context; run cheaper jobs first"""
+        planned = []
+        for job in jobs:
+            payload = job.get("payload") or {}
+            cost = 0
+            if job.get("type") == "inference" and payload.get("prompt"):
+                plan = budget(payload["prompt"], payload.get("model", "llama2"), payload.get("max_tokens", 500),
+                              session_id=payload.get("session_id"), history=payload.get("history"))
+                if plan["action"] == "rejected":
+                    # Left unclaimed for a node with a larger context window
+                    print(f"\n⏭️  Skipping job {job.get('job_id')}: {plan['error']}")
+                    continue
+                cost = plan["cost"]
+            planned.append((cost, job))
+        planned.sort(key=lambda item: item[0])
+        return [job for _, job in planned]
+    
+    def process_job(self, job: dict):
+        """Claim, execute and submit one job"""
+        job_id = job.get("job_id")
+        job_type = job.get("type")
+        reward = job.get("reward", 0)
+        
+        print(f"\n📥 Job received: {job_id}")
+        print(f"   Type: {job_type}")
+        print(f"   Reward: {reward} WATT")
+        
+        # Claim job
+        if not self.claim_job(job_id):
+            print(f"   ⚠️  Could not claim job (already taken?)")
+            return
+        
+        # Execute
+        result = self.execute_job(job)
+        
+        if result.get("success"):
+            # Submit result
+            submit_resp = self.submit_result(job_id, result)
+            
+            if submit_resp.get("success"):
+                self.jobs_completed += 1
+                self.total_earned += reward
+                print(f"   ✅ Completed! Earned: {reward} WATT")
+                print(f"   📊 Total: {self.jobs_completed} jobs, {self.total_earned} WATT")
+            else:
+                print(f"   ❌ Submit failed: {submit_resp.get('error')}")
+        else:
+            print(f"   ❌ Job failed: {result.get('error')}")
+    
+    def _execute_crawl(self, job: dict) -> dict:
+        """Run a crawl job, streaming page batches to the backend as they finish"""
+        job_id = job.get("job_id")
+        payload = job.get("payload", {})
+        seed = payload.get("url")
+        print(f"   🕸️  Crawling: {(seed or '')[:50]}...")
+        
+        pages_ok = 0
+        pages_failed = 0
+        unsent = []  # batches the backend did not accept; returned in the final result
+        batches = 0
+        
+        for batch in iter_crawl(
+            seed,
+            max_depth=payload.get("max_depth", 2),
+            max_pages=payload.get("max_pages", 50),
+            same_origin=payload.get("same_origin", True),
+            path_prefix=payload.get("path_prefix"),
+            format=payload.get("format", "text"),
+            concurrency=payload.get("concurrency", 4),
+            batch_size=payload.get("batch_size", 10),
+        ):
+            ok = sum(1 for page in batch if page.get("success"))
+            pages_ok += ok
+            pages_failed += len(batch) - ok
+            resp = self.submit_partial(job_id, batches, batch)
+            if not resp.get("success"):
+                unsent.extend(batch)
+            batches += 1
+            print(f"   📦 Batch {batches}: {len(batch)} pages ({pages_ok + pages_failed} total)")
+        
+        result = {
+            "success": pages_ok > 0,
+            "pages_crawled": pages_ok,
+            "pages_failed": pages_failed,
+            "batches": batches,
+            "pages": unsent
+        }
+        if not pages_ok:
+            # Nothing was fetched: don't claim credit for an empty crawl
+            result["error"] = f"Crawl fetched no pages ({pages_failed} failed)"
+        return result
+    
+    def submit_partial(self, job_id: str, seq: int, pages: list) -> dict:
+        """Stream one batch of a multi-part (crawl) job result"""
+        return self._api_call("POST", f"/api/v1/nodes/jobs/{job_id}/partial", {
+            "node_id": self.node_id,
+            "seq": seq,
+            "pages": pages
+        })
+    
     def submit_result(self, job_id: str, result: dict) -> dict:
         """Submit completed job result"""
         response = self._api_call("POST", f"/api/v1/nodes/jobs/{job_id}/complete", {
@@ -211,8 +494,17 @@ class WattNode:
         print("🟢 Listening for jobs... (Ctrl+C to stop)")
         print("-" * 50)
         
+        # Only the daemon needs these: they start worker processes and scan the result cache
+        self._configure_scraper()
+        self._configure_inference()
         self.running = True
         
+        # Load configured Ollama models in the background so the first job does not pay for it
+        for url in OLLAMA_URLS:
+            residency = get_residency_manager(url)
+            if residency and residency.warm_models:
+                threading.Thread(target=residency.warm, name="ollama-warmup", daemon=True).start()
+        
         try:
             while self.running:
                 # Heartbeat if needed
@@ -220,38 +512,17 @@ class WattNode:
                     self.heartbeat()
                 
                 # Poll for jobs
-                jobs = self.poll_jobs()
+                jobs = self.schedule_jobs(self.poll_jobs())
+                
+                # Embed jobs run together so the batcher can coalesce them
+                embed_jobs = [job for job in jobs if job.get("type") == "embed"]
+                if len(embed_jobs) > 1:
+                    with ThreadPoolExecutor(max_workers=len(embed_jobs)) as pool:
+                        list(pool.map(self.process_job, embed_jobs))
+                    jobs = [job for job in jobs if job.get("type") != "embed"]
                 
                 for job in jobs:
-                    job_id = job.get("job_id")
-                    job_type = job.get("type")
-                    reward = job.get("reward", 0)
-                    
-                    print(f"\n📥 Job received: {job_id}")
-                    print(f"   Type: {job_type}")
-                    print(f"   Reward: {reward} WATT")
-                    
-                    # Claim job
-                    if not self.claim_job(job_id):
-                        print(f"   ⚠️  Could not claim job (already taken?)")
-                        continue
-                    
-                    # Execute
-                    result = self.execute_job(job)
-                    
-                    if result.get("success"):
-                        # Submit result
-                        submit_resp = self.submit_result(job_id, result)
-                        
-                        if submit_resp.get("success"):
-                            self.jobs_completed += 1
-                            self.total_earned += reward
-                            print(f"   ✅ Completed! Earned: {reward} WATT")
-                            print(f"   📊 Total: {self.jobs_completed} jobs, {self.total_earned} WATT")
-                        else:
-                            print(f"   ❌ Submit failed: {submit_resp.get('error')}")
-                    else:
-                        print(f"   ❌ Job failed: {result.get('error')}")
+                    self.process_job(job)
                 
                 time.sleep(POLL_INTERVAL)
         